@@ -0,0 +1,22 @@
+"""Command line entry point: ``python -m crunevo worker``."""
+
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="crunevo")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run the background task worker")
+    worker.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    from crunevo.app import create_app
+    from crunevo import tasks
+
+    app = create_app()
+    if args.command == "worker":
+        tasks.run_worker(app, poll_interval=args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
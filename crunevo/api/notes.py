@@ -11,8 +11,10 @@ notes_api_bp = Blueprint("notes_api", __name__, url_prefix="/api")
 def list_notes():
     page = int(request.args.get("page", 1))
     per_page = 10
-    pagination = Note.query.order_by(Note.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    pagination = (
+        Note.query.filter(Note.processing_status == "ready")
+        .order_by(Note.created_at.desc())
+        .paginate(page=page, per_page=per_page, error_out=False)
     )
     notes = [
         {"id": n.id, "title": n.title, "created_at": n.created_at.isoformat()}
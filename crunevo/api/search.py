@@ -1,20 +1,29 @@
 from flask import Blueprint, jsonify, request
+from flask_limiter.util import get_remote_address
+from flask_login import current_user
+
+from crunevo.extensions import limiter
+from crunevo.services import autocomplete
+from crunevo.utils.helpers import activated_required
 
 search_api_bp = Blueprint("search_api", __name__, url_prefix="/api/search")
 
+MIN_PREFIX = 2
+
+
+def _user_key():
+    return current_user.get_id() or get_remote_address()
+
 
 @search_api_bp.get("/suggest")
+@activated_required
+@limiter.limit("60 per minute", key_func=_user_key)
 def suggest():
     q = (request.args.get("q") or "").strip()
-    if not q:
+    if len(q) < MIN_PREFIX:
         return jsonify({"query": q, "results": []})
-    # TODO: Reemplazar con consultas reales (posts/notas/productos)
-    # Ejemplo mínimo seguro para integrar rápido:
-    results = []
-    # posts = Post.query.filter(Post.title.ilike(f"%{q}%")).limit(3).all()
-    # for p in posts:
-    #     results.append({"type": "post", "title": p.title, "url": url_for("posts.detail", id=p.id)})
-    # notes = Note.query.filter(Note.title.ilike(f"%{q}%")).limit(3).all()
-    # for n in notes:
-    #     results.append({"type": "note", "title": n.title, "url": url_for("notes.detail", id=n.id)})
+    results = [
+        {"type": s["type"], "title": s["text"], "url": s["url"]}
+        for s in autocomplete.suggest(q)
+    ]
     return jsonify({"query": q, "results": results})
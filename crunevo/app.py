@@ -5,7 +5,6 @@ from flask import (
     url_for,
     flash,
     current_app,
-    g,
     render_template,
 )
 from flask_login import current_user
@@ -95,16 +94,13 @@ def create_app():
 
     @app.context_processor
     def inject_globals():
+        from .cache import template_globals
         from .constants import ACHIEVEMENT_DETAILS
-        from .models import Note, Notification, AchievementPopup
+        from .models import Notification, AchievementPopup
         from flask import session
 
         try:
-            latest_sidebar_notes = (
-                Note.query.order_by(Note.created_at.desc()).limit(3).all()
-                if db.session
-                else []
-            )
+            latest_sidebar_notes = template_globals.sidebar_notes()
         except Exception:
             latest_sidebar_notes = []
 
@@ -116,30 +112,22 @@ def create_app():
             "moderator",
         ]:
             try:
-                from .models import Report
-                from .models import SystemErrorLog
-
-                counts = {}
-                for r in Report.query.filter_by(status="open").all():
-                    if r.description.startswith("Post "):
-                        try:
-                            pid = int(r.description.split()[1].split(":")[0])
-                            counts[pid] = counts.get(pid, 0) + 1
-                        except Exception:
-                            app.logger.exception("Error processing urgent report")
-                urgent_count = sum(1 for c in counts.values() if c >= 3)
-                unresolved_errors = SystemErrorLog.query.filter_by(
-                    resuelto=False
-                ).count()
+                urgent_count = template_globals.urgent_reports()
+                unresolved_errors = template_globals.unresolved_errors()
             except Exception:
+                app.logger.exception("Error loading admin counters")
                 urgent_count = 0
                 unresolved_errors = 0
 
         if current_user.is_authenticated:
             try:
-                popups = AchievementPopup.query.filter_by(
-                    user_id=current_user.id, shown=False
-                ).all()
+                popups = (
+                    AchievementPopup.query.filter_by(
+                        user_id=current_user.id, shown=False
+                    ).all()
+                    if template_globals.has_pending_popups(current_user.id)
+                    else []
+                )
                 if popups:
                     new_achievements = [
                         {
@@ -259,6 +247,67 @@ def create_app():
     migrate.init_app(app, db)
     socketio.init_app(app)
 
+    from . import tasks
+    from .cache import feed_cache, template_globals
+    from .services import (
+        analytics_service,
+        autocomplete,
+        badge_rules,
+        leaderboard,
+        mission_progress,
+        pageviews,
+        search_index,
+    )
+    from .utils import notify
+
+    tasks.init_app(app)
+    feed_cache.init_app(app)
+    template_globals.init_app(app)
+    notify.init_app(app)
+    analytics_service.init_app(app)
+    badge_rules.init_app(app)
+    leaderboard.init_app(app)
+    mission_progress.init_app(app)
+    search_index.init_app(app)
+    autocomplete.init_app(app)
+
+    @app.cli.command("worker")
+    def worker_command():
+        """Run the background task worker."""
+        tasks.run_worker(app)
+
+    @app.cli.command("search-reindex")
+    def search_reindex_command():
+        """Rebuild the full-text search index."""
+        for entity, indexed in search_index.rebuild().items():
+            print(f"{entity}: {indexed}")
+
+    @app.cli.command("badges-backfill")
+    def badges_backfill_command():
+        """Award forum badges to every user who already qualifies."""
+        for badge_id, awarded in badge_rules.backfill().items():
+            print(f"badge {badge_id}: {awarded}")
+
+    @app.cli.command("leaderboards-rebuild")
+    def leaderboards_rebuild_command():
+        """Rebuild the leaderboards from the users table."""
+        for board, ranked in leaderboard.rebuild().items():
+            print(f"{board}: {ranked}")
+
+    @app.cli.command("missions-reconcile")
+    def missions_reconcile_command():
+        """Recount the mission progress counters from their source tables."""
+        from .jobs.mission_progress import reconcile_mission_progress
+
+        for key, value in reconcile_mission_progress().items():
+            print(f"{key}: {value}")
+
+    @app.cli.command("autocomplete-rebuild")
+    def autocomplete_rebuild_command():
+        """Rebuild the autocomplete index and write its snapshot."""
+        for kind, items in autocomplete.rebuild(app).stats()["items"].items():
+            print(f"{kind}: {items}")
+
     @app.before_request
     def enforce_https():
         if app.testing or not app.config.get("FORCE_HTTPS", True):
@@ -291,28 +340,12 @@ def create_app():
         ):
             return
         try:
-            from .models import PageView
-
-            if not hasattr(g, "page_views"):
-                g.page_views = []
-            g.page_views.append(PageView(path=request.path))
+            pageviews.record(request.path)
         except Exception as e:  # pragma: no cover - avoid crashing on log error
             app.logger.error(f"PageView error: {e}")
 
     testing_env = os.environ.get("PYTEST_CURRENT_TEST") is not None
 
-    @app.after_request
-    def commit_page_view(response):
-        page_views = getattr(g, "page_views", None)
-        if page_views:
-            try:
-                db.session.add_all(page_views)
-                db.session.commit()
-            except Exception as e:  # pragma: no cover - avoid crashing on log error
-                app.logger.error(f"PageView error: {e}")
-                db.session.rollback()
-        return response
-
     @app.after_request
     def apply_security_headers(response):
         health_paths = {
@@ -377,6 +410,31 @@ def create_app():
                         text("ALTER TABLE note ADD COLUMN file_type VARCHAR(20)")
                     )
                     db.session.commit()
+                if "processing_status" not in cols:
+                    app.logger.info("Adding missing note processing columns")
+                    db.session.execute(
+                        text(
+                            "ALTER TABLE note ADD COLUMN processing_status"
+                            " VARCHAR(20) NOT NULL DEFAULT 'ready'"
+                        )
+                    )
+                    db.session.execute(
+                        text("ALTER TABLE note ADD COLUMN processing_state JSON")
+                    )
+                    db.session.commit()
+                user_cols = [c["name"] for c in inspector.get_columns("user")]
+                if "unread_notifications" not in user_cols:
+                    app.logger.info("Adding missing user.unread_notifications column")
+                    db.session.execute(
+                        text(
+                            'ALTER TABLE "user" ADD COLUMN unread_notifications'
+                            " INTEGER NOT NULL DEFAULT 0"
+                        )
+                    )
+                    db.session.execute(text(notify.UNREAD_BACKFILL))
+                    db.session.commit()
+                # creates and fills the SQLite full-text index when missing
+                search_index.prepare()
             except Exception as e:
                 app.logger.error(f"Database initialization error: {e}")
         elif is_serverless:
@@ -700,6 +758,8 @@ def create_app():
         from .jobs.backup_db import backup_database
         from .jobs.cleanup_stories import cleanup_stories
         from .jobs.cleanup_inactive_posts import cleanup_inactive_posts
+        from .jobs.achievement_digest import publish_achievement_digests
+        from .jobs.mission_progress import reconcile_mission_progress
 
         scheduler = BackgroundScheduler()
         scheduler.add_job(decay_scores, IntervalTrigger(hours=1))
@@ -707,6 +767,8 @@ def create_app():
         scheduler.add_job(backup_database, IntervalTrigger(weeks=1))
         scheduler.add_job(cleanup_stories, IntervalTrigger(hours=1))
         scheduler.add_job(cleanup_inactive_posts, IntervalTrigger(hours=24))
+        scheduler.add_job(publish_achievement_digests, IntervalTrigger(minutes=10))
+        scheduler.add_job(reconcile_mission_progress, IntervalTrigger(hours=24))
         scheduler.start()
         app.scheduler = scheduler
 
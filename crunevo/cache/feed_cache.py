@@ -1,34 +1,359 @@
-from collections import defaultdict
+import json
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from heapq import merge
+from itertools import count, islice
+from operator import itemgetter
+from typing import Iterable, Iterator, Optional
 
 log = __import__("logging").getLogger(__name__)
-# simple in-memory cache keyed by user_id
-_cache: dict[int, list[dict]] = defaultdict(list)
+
+# key of the shared stream holding broadcast items (FeedItem.owner_id is NULL)
+GLOBAL_STREAM = None
 
 MAX_CACHE = 500  # keep most recent items
 CACHE_TTL = 600  # expire items after 10 minutes
+MAX_TOTAL_ITEMS = 50_000  # across all users; least recently used streams go first
+L1_TTL = 30  # local copy lifetime when a shared backend is configured
+
+
+class _Timeline:
+    """Items of one stream ordered by rank and deduplicated by item key.
+
+    ``order`` is a sorted list of ``(-rank, seq, key)`` tuples, so lookups and
+    insert positions are found by bisection; ``expiry`` keeps keys in the order
+    they were cached so TTL expiry only touches the oldest entries.
+    """
+
+    __slots__ = ("order", "entries", "expiry")
+
+    def __init__(self):
+        self.order: list[tuple] = []
+        self.entries: dict[tuple, tuple[tuple, dict]] = {}
+        self.expiry: OrderedDict[tuple, datetime] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def put(self, key: tuple, sort_key: tuple, item: dict) -> bool:
+        """Insert or replace ``key``; return True when it was not cached yet."""
+        old = self.entries.get(key)
+        if old:
+            self._unlink(old[0])
+        insort(self.order, sort_key)
+        self.entries[key] = (sort_key, item)
+        self.expiry[key] = item["cached_at"]
+        self.expiry.move_to_end(key)
+        return old is None
+
+    def discard(self, key: tuple) -> bool:
+        old = self.entries.pop(key, None)
+        if old is None:
+            return False
+        self._unlink(old[0])
+        del self.expiry[key]
+        return True
+
+    def expire(self, cutoff: datetime) -> int:
+        expired = 0
+        while self.expiry:
+            key, cached_at = next(iter(self.expiry.items()))
+            if cached_at >= cutoff:
+                break
+            self.discard(key)
+            expired += 1
+        return expired
+
+    def trim(self, limit: int) -> int:
+        dropped = 0
+        while len(self.entries) > limit:
+            self.discard(self.order[-1][2])
+            dropped += 1
+        return dropped
+
+    def iter_ranked(self) -> Iterator[tuple[tuple, dict]]:
+        for sort_key in self.order:
+            yield self.entries[sort_key[2]]
+
+    def _unlink(self, sort_key: tuple) -> None:
+        del self.order[bisect_left(self.order, sort_key)]
+
+
+class RedisFeedBackend:
+    """Feed streams shared between processes through Redis sorted sets.
+
+    Each stream is a ZSET of ``item_type:ref_id`` members scored by rank plus
+    a HASH holding the serialized entries; both expire ``ttl`` seconds after
+    the last push to that stream.
+    """
+
+    def __init__(self, client, prefix: str = "feed", ttl: int = CACHE_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _keys(self, user_id: Optional[int]) -> tuple[str, str]:
+        base = f"{self.prefix}:{'global' if user_id is GLOBAL_STREAM else user_id}"
+        return base, f"{base}:items"
+
+    @staticmethod
+    def _member(payload: dict, seq: int) -> str:
+        return ":".join(str(part) for part in _item_key(payload, seq))
+
+    def push(self, user_id: Optional[int], items: list[dict]) -> None:
+        if not items:
+            return
+        zkey, hkey = self._keys(user_id)
+        ranks, entries = {}, {}
+        for it in items:
+            member = self._member(it["payload"], next(_seq))
+            ranks[member] = _rank(it)
+            entries[member] = json.dumps(
+                {
+                    "score": it["score"],
+                    "created_at": it["created_at"].isoformat(),
+                    "payload": it["payload"],
+                }
+            )
+        pipe = self.client.pipeline()
+        pipe.zadd(zkey, ranks)
+        pipe.hset(hkey, mapping=entries)
+        pipe.expire(zkey, self.ttl)
+        pipe.expire(hkey, self.ttl)
+        pipe.zrange(zkey, 0, -(MAX_CACHE + 1))
+        overflow = pipe.execute()[-1]
+        if overflow:
+            # trim the entries together with their ranks, or the hash grows
+            pipe = self.client.pipeline()
+            pipe.zrem(zkey, *overflow)
+            pipe.hdel(hkey, *overflow)
+            pipe.execute()
+
+    def load(self, user_id: Optional[int], stop: int) -> dict:
+        """Return the top ``stop + 1`` entries of each stream the user reads."""
+        streams = list(dict.fromkeys((user_id, GLOBAL_STREAM)))
+        pipe = self.client.pipeline()
+        for uid in streams:
+            pipe.zrevrange(self._keys(uid)[0], 0, stop)
+        members = pipe.execute()
+        pipe = self.client.pipeline()
+        for uid, names in zip(streams, members):
+            pipe.hmget(self._keys(uid)[1], names)
+        raw = pipe.execute() if any(members) else [[] for _ in streams]
+        loaded = {}
+        for uid, values in zip(streams, raw):
+            entries = []
+            for value in values:
+                if not value:
+                    continue
+                entry = json.loads(value)
+                entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+                entries.append(entry)
+            loaded[uid] = entries
+        return loaded
+
+    def mark_warm(self, user_id: int) -> None:
+        self.client.set(f"{self._keys(user_id)[0]}:warm", 1, ex=self.ttl)
+
+    def warm_users(self, user_ids: list[int]) -> set[int]:
+        pipe = self.client.pipeline()
+        for uid in user_ids:
+            pipe.exists(f"{self._keys(uid)[0]}:warm")
+        return {uid for uid, found in zip(user_ids, pipe.execute()) if found}
+
+    def remove(self, user_id: Optional[int], item_type: str, ref_id: int) -> None:
+        zkey, hkey = self._keys(user_id)
+        member = f"{item_type}:{ref_id}"
+        pipe = self.client.pipeline()
+        pipe.zrem(zkey, member)
+        pipe.hdel(hkey, member)
+        pipe.execute()
+
+
+# in-memory cache keyed by user_id, least recently used first
+_cache: OrderedDict[Optional[int], _Timeline] = OrderedDict()
+_lock = threading.RLock()
+_seq = count()
+_total = 0
+# when each user's own stream was last loaded from the database
+_warm: dict[int, datetime] = {}
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "expired": 0,
+    "backend_hits": 0,
+    "backend_misses": 0,
+}
+# shared store behind the in-process cache, None when running memory-only
+_backend: Optional[RedisFeedBackend] = None
+
+
+def init_app(app) -> None:
+    """Enable the Redis backend when ``FEED_CACHE_BACKEND`` is ``redis``."""
+    global _backend
+    if app.config.get("FEED_CACHE_BACKEND", "memory") == "redis":
+        from crunevo.extensions import redis_client
+
+        _backend = RedisFeedBackend(redis_client)
+    else:
+        _backend = None
+
+
+def _local_ttl() -> int:
+    return min(L1_TTL, CACHE_TTL) if _backend is not None else CACHE_TTL
+
 
-# TODO: consider using Redis with per-user TTL for distributed environments.
+def _rank(it: dict) -> float:
+    return it["score"] + it["created_at"].timestamp() / 1e6
 
 
-def push_items(user_id: int, items: list[dict]) -> None:
-    """Store feed items for a user in memory sorted by score and timestamp."""
+def _item_key(payload: dict, seq: int) -> tuple:
+    item_type = payload.get("item_type")
+    ref_id = payload.get("ref_id")
+    if item_type is None or ref_id is None:
+        return ("", seq)
+    return (item_type, ref_id)
+
+
+def _drop_stream(user_id: Optional[int]) -> int:
+    global _total
+    _warm.pop(user_id, None)
+    timeline = _cache.pop(user_id, None)
+    if timeline is None:
+        return 0
+    _total -= len(timeline)
+    return len(timeline)
+
+
+def _expire(user_id: Optional[int], now: datetime) -> None:
+    global _total
+    timeline = _cache.get(user_id)
+    if timeline is None:
+        return
+    expired = timeline.expire(now - timedelta(seconds=_local_ttl()))
+    _total -= expired
+    _stats["expired"] += expired
+    if not timeline:
+        _cache.pop(user_id, None)
+
+
+def push_items(user_id: Optional[int], items: list[dict]) -> None:
+    """Store feed items for a user in memory sorted by score and timestamp.
+
+    ``user_id`` ``None`` stores the items in the shared broadcast stream.
+    Items already cached for the same ``(item_type, ref_id)`` are replaced.
+    With a shared backend the items are written through to it as well.
+    """
+    if _backend is not None:
+        try:
+            _backend.push(user_id, items)
+        except Exception:
+            log.exception("feed cache backend push failed")
+    _push_local(user_id, items)
+
+
+def _push_local(user_id: Optional[int], items: list[dict]) -> None:
+    global _total
+    now = datetime.utcnow()
+    with _lock:
+        timeline = _cache.get(user_id)
+        if timeline is None:
+            timeline = _cache[user_id] = _Timeline()
+        _cache.move_to_end(user_id)
+        for it in items:
+            seq = next(_seq)
+            key = _item_key(it["payload"], seq)
+            if timeline.put(key, (-_rank(it), seq, key), {**it, "cached_at": now}):
+                _total += 1
+        _total -= timeline.trim(MAX_CACHE)
+        _expire(user_id, now)
+        while _total > MAX_TOTAL_ITEMS and len(_cache) > 1:
+            victim = next(iter(_cache))
+            if victim == user_id:
+                _cache.move_to_end(victim)
+                continue
+            _stats["evictions"] += _drop_stream(victim)
+
+
+def mark_warm(user_id: int) -> None:
+    """Record that the user's own stream was just reloaded from the database.
+
+    The broadcast stream is nearly never empty, so a non-empty ``fetch`` does
+    not tell whether the user's targeted items are still cached.
+    """
+    if _backend is not None:
+        try:
+            _backend.mark_warm(user_id)
+        except Exception:
+            log.exception("feed cache backend mark failed")
+    with _lock:
+        _warm[user_id] = datetime.utcnow()
+
+
+def warm_users(user_ids: Iterable[int]) -> set[int]:
+    """Return the users whose own stream was loaded within the cache TTL."""
+    user_ids = list(user_ids)
     now = datetime.utcnow()
-    entries = _cache[user_id]
-    entries.extend({**it, "cached_at": now} for it in items)
-    entries.sort(
-        key=lambda it: it["score"] + it["created_at"].timestamp() / 1e6,
-        reverse=True,
-    )
-    cleanup_user(user_id, now)
-    del entries[MAX_CACHE:]
+    cutoff = now - timedelta(seconds=_local_ttl())
+    with _lock:
+        found = {uid for uid in user_ids if _warm.get(uid, datetime.min) >= cutoff}
+    rest = [uid for uid in user_ids if uid not in found]
+    if _backend is not None and rest:
+        try:
+            shared = _backend.warm_users(rest)
+        except Exception:
+            log.exception("feed cache backend warm check failed")
+            shared = set()
+        with _lock:
+            for uid in shared:
+                _warm[uid] = now
+        found |= shared
+    return found
+
+
+def is_warm(user_id: int) -> bool:
+    return user_id in warm_users([user_id])
 
 
 def fetch(user_id: int, start: int = 0, stop: int = 19) -> list[dict]:
-    cleanup_user(user_id)
-    entries = _cache.get(user_id, [])
-    sliced = entries[start : stop + 1]
+    """Return the user's timeline merged with the broadcast stream.
+
+    Short local reads fall back to the shared backend, whose entries are then
+    kept locally for ``L1_TTL`` seconds.
+    """
+    sliced = _fetch_local(user_id, start, stop)
+    if _backend is not None and len(sliced) <= stop - start:
+        try:
+            loaded = _backend.load(user_id, stop)
+        except Exception:
+            log.exception("feed cache backend fetch failed")
+            loaded = {}
+        found = any(loaded.values())
+        with _lock:
+            _stats["backend_hits" if found else "backend_misses"] += 1
+        if found:
+            for uid, entries in loaded.items():
+                _push_local(uid, entries)
+            sliced = _fetch_local(user_id, start, stop)
+    return [it["payload"] for it in sliced]
+
+
+def _fetch_local(user_id: int, start: int, stop: int) -> list[dict]:
+    now = datetime.utcnow()
+    with _lock:
+        streams = []
+        for key in dict.fromkeys((user_id, GLOBAL_STREAM)):
+            _expire(key, now)
+            timeline = _cache.get(key)
+            if timeline is not None:
+                _cache.move_to_end(key)
+                streams.append(timeline.iter_ranked())
+        ranked = merge(*streams, key=itemgetter(0))
+        sliced = [item for _, item in islice(ranked, start, stop + 1)]
+        _stats["hits" if sliced else "misses"] += 1
     if log.isEnabledFor(__import__("logging").DEBUG):
         log.debug(
             "feed cache %s %s-%s %s",
@@ -37,32 +362,62 @@ def fetch(user_id: int, start: int = 0, stop: int = 19) -> list[dict]:
             start,
             stop,
         )
-    return [it["payload"] for it in sliced]
+    return sliced
 
 
-def cleanup_user(user_id: int, now: Optional[datetime] = None) -> None:
+def cleanup_user(user_id: Optional[int], now: Optional[datetime] = None) -> None:
     now = now or datetime.utcnow()
-    cutoff = now - timedelta(seconds=CACHE_TTL)
-    entries = _cache.get(user_id, [])
-    _cache[user_id] = [it for it in entries if it["cached_at"] >= cutoff]
-    if not _cache[user_id]:
-        _cache.pop(user_id, None)
+    with _lock:
+        _expire(user_id, now)
+        if _warm.get(user_id, now) < now - timedelta(seconds=_local_ttl()):
+            del _warm[user_id]
 
 
 def cleanup(now: Optional[datetime] = None) -> None:
     """Clean up expired items for all users."""
     now = now or datetime.utcnow()
-    for uid in list(_cache.keys()):
-        cleanup_user(uid, now)
-
-
-def remove_item(user_id: int, item_type: str, ref_id: int) -> None:
-    entries = _cache.get(user_id, [])
-    _cache[user_id] = [
-        it
-        for it in entries
-        if not (
-            it["payload"].get("item_type") == item_type
-            and it["payload"].get("ref_id") == ref_id
-        )
-    ]
+    cutoff = now - timedelta(seconds=_local_ttl())
+    with _lock:
+        for uid in list(_cache.keys()):
+            _expire(uid, now)
+        for uid in [uid for uid, at in _warm.items() if at < cutoff]:
+            del _warm[uid]
+
+
+def remove_item(user_id: Optional[int], item_type: str, ref_id: int) -> None:
+    global _total
+    if _backend is not None:
+        try:
+            _backend.remove(user_id, item_type, ref_id)
+        except Exception:
+            log.exception("feed cache backend remove failed")
+    with _lock:
+        timeline = _cache.get(user_id)
+        if timeline is not None and timeline.discard((item_type, ref_id)):
+            _total -= 1
+            if not timeline:
+                _cache.pop(user_id, None)
+
+
+def clear() -> None:
+    """Drop every locally cached stream and reset the counters."""
+    global _total
+    with _lock:
+        _cache.clear()
+        _warm.clear()
+        _total = 0
+        for key in _stats:
+            _stats[key] = 0
+
+
+def get_cache_stats() -> dict:
+    """Return hit/miss/eviction counters and current cache size."""
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+            "streams": len(_cache),
+            "items": _total,
+            "max_items": MAX_TOTAL_ITEMS,
+        }
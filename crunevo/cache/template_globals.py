@@ -0,0 +1,287 @@
+"""Cached values for the ``inject_globals`` context processor.
+
+Every template render used to query the latest notes, the open reports, the
+unresolved error count and the user's pending achievement popups. These
+values now live in Redis and are kept current by the session hooks below,
+which act only once the change is committed:
+
+* the sidebar notes are shared by all users and dropped when a note is
+  created, renamed or deleted;
+* open reports are counted per post (``post_reports``) together with the
+  number of posts with ``URGENT_THRESHOLD`` or more open reports, and both
+  counters move as reports are filed, resolved or deleted;
+* the unresolved error count is dropped when an error is logged or resolved;
+* each user has a "has pending popups" flag, so the popup query only runs
+  for users that have something to show.
+
+A missing key is recomputed from the database, so Redis can be flushed at any
+time. The report counters are also rebuilt every ``REBUILD_INTERVAL`` seconds
+to correct any drift.
+"""
+
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from crunevo.extensions import db, redis_client
+
+log = logging.getLogger(__name__)
+
+PREFIX = "globals"
+SIDEBAR_KEY = f"{PREFIX}:sidebar_notes"
+REPORTS_KEY = f"{PREFIX}:post_reports"
+URGENT_KEY = f"{PREFIX}:urgent_reports"
+REPORTS_READY_KEY = f"{PREFIX}:post_reports:ready"
+ERRORS_KEY = f"{PREFIX}:unresolved_errors"
+
+SIDEBAR_NOTES = 3
+URGENT_THRESHOLD = 3
+TTL = 3600  # safety net for values invalidated by the hooks
+REBUILD_INTERVAL = 3600
+
+
+def _popups_key(user_id: int) -> str:
+    return f"{PREFIX}:popups:{user_id}"
+
+
+def report_post_id(description: Optional[str]) -> Optional[int]:
+    """Return the post id of a ``"Post <id>: reason"`` report, if it is one."""
+    if not description or not description.startswith("Post "):
+        return None
+    try:
+        return int(description.split()[1].split(":")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+# -- readers ------------------------------------------------------------------
+
+
+def sidebar_notes() -> list[dict]:
+    """Latest notes as ``{"id", "title", "created_at"}`` dicts."""
+    try:
+        cached = redis_client.get(SIDEBAR_KEY)
+        if cached is not None:
+            return json.loads(cached)
+    except Exception:
+        log.warning("sidebar notes cache unavailable", exc_info=True)
+    from crunevo.models import Note
+
+    notes = [
+        {
+            "id": note.id,
+            "title": note.title,
+            "created_at": note.created_at.isoformat() if note.created_at else None,
+        }
+        for note in Note.query.filter(Note.processing_status == "ready")
+        .order_by(Note.created_at.desc())
+        .limit(SIDEBAR_NOTES)
+        .all()
+    ]
+    _store(SIDEBAR_KEY, json.dumps(notes))
+    return notes
+
+
+def urgent_reports() -> int:
+    """Posts with at least ``URGENT_THRESHOLD`` open reports."""
+    try:
+        if redis_client.exists(REPORTS_READY_KEY):
+            return max(int(redis_client.get(URGENT_KEY) or 0), 0)
+    except Exception:
+        log.warning("report counters unavailable", exc_info=True)
+    return rebuild_report_counts()
+
+
+def rebuild_report_counts() -> int:
+    from crunevo.models import Report
+
+    counts: dict[int, int] = {}
+    for (description,) in db.session.query(Report.description).filter(
+        Report.status == "open", Report.description.like("Post %")
+    ):
+        post_id = report_post_id(description)
+        if post_id is not None:
+            counts[post_id] = counts.get(post_id, 0) + 1
+    urgent = sum(1 for c in counts.values() if c >= URGENT_THRESHOLD)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.delete(REPORTS_KEY)
+        if counts:
+            pipe.hset(REPORTS_KEY, mapping={str(k): v for k, v in counts.items()})
+        pipe.set(URGENT_KEY, urgent)
+        pipe.setex(REPORTS_READY_KEY, REBUILD_INTERVAL, 1)
+        pipe.execute()
+    except Exception:
+        log.warning("could not store report counters", exc_info=True)
+    return urgent
+
+
+def unresolved_errors() -> int:
+    try:
+        cached = redis_client.get(ERRORS_KEY)
+        if cached is not None:
+            return int(cached)
+    except Exception:
+        log.warning("error count cache unavailable", exc_info=True)
+    from crunevo.models import SystemErrorLog
+
+    count = SystemErrorLog.query.filter_by(resuelto=False).count()
+    _store(ERRORS_KEY, count)
+    return count
+
+
+def has_pending_popups(user_id: int) -> bool:
+    """Cheap check before loading the user's unshown achievement popups."""
+    try:
+        cached = redis_client.get(_popups_key(user_id))
+        if cached is not None:
+            return str(cached) == "1"
+    except Exception:
+        log.warning("popup flag cache unavailable", exc_info=True)
+    from crunevo.models import AchievementPopup
+
+    pending = (
+        db.session.query(AchievementPopup.id)
+        .filter_by(user_id=user_id, shown=False)
+        .first()
+        is not None
+    )
+    _store(_popups_key(user_id), int(pending))
+    return pending
+
+
+def popups_changed(user_id: int) -> None:
+    """Drop the popup flag; needed after bulk updates that skip the hooks."""
+    _delete(_popups_key(user_id))
+
+
+def _store(key: str, value) -> None:
+    try:
+        redis_client.setex(key, TTL, value)
+    except Exception:
+        log.warning("could not cache %s", key, exc_info=True)
+
+
+def _delete(*keys: str) -> None:
+    try:
+        redis_client.delete(*keys)
+    except Exception:
+        log.warning("could not invalidate %s", keys, exc_info=True)
+
+
+# -- session hooks ------------------------------------------------------------
+
+
+def _stored_status(session, report) -> Optional[str]:
+    from crunevo.models import Report
+
+    history = inspect(report).attrs.status.history
+    if history.deleted:
+        return history.deleted[0]
+    return (
+        session.connection()
+        .execute(select(Report.status).where(Report.id == report.id))
+        .scalar()
+    )
+
+
+def _changes(session) -> list[tuple]:
+    # runs before the flush so a report's previous status can be read back
+    from crunevo.models import AchievementPopup, Note, Report, SystemErrorLog
+
+    ops = []
+    for obj in session.new:
+        if isinstance(obj, Note):
+            ops.append(("drop", SIDEBAR_KEY))
+        elif isinstance(obj, Report):
+            if (obj.status or "open") == "open":
+                ops.append(("report", report_post_id(obj.description), 1))
+        elif isinstance(obj, SystemErrorLog):
+            ops.append(("drop", ERRORS_KEY))
+        elif isinstance(obj, AchievementPopup):
+            ops.append(("drop", _popups_key(obj.user_id)))
+    for obj in session.dirty:
+        if isinstance(obj, Note):
+            attrs = inspect(obj).attrs
+            if (
+                attrs.title.history.has_changes()
+                or attrs.processing_status.history.has_changes()
+            ):
+                ops.append(("drop", SIDEBAR_KEY))
+        elif isinstance(obj, Report):
+            if inspect(obj).attrs.status.history.has_changes():
+                was_open = _stored_status(session, obj) == "open"
+                is_open = obj.status == "open"
+                if was_open != is_open:
+                    delta = 1 if is_open else -1
+                    ops.append(("report", report_post_id(obj.description), delta))
+        elif isinstance(obj, SystemErrorLog):
+            ops.append(("drop", ERRORS_KEY))
+        elif isinstance(obj, AchievementPopup):
+            ops.append(("drop", _popups_key(obj.user_id)))
+    for obj in session.deleted:
+        if isinstance(obj, Note):
+            ops.append(("drop", SIDEBAR_KEY))
+        elif isinstance(obj, Report):
+            if _stored_status(session, obj) == "open":
+                ops.append(("report", report_post_id(obj.description), -1))
+        elif isinstance(obj, SystemErrorLog):
+            ops.append(("drop", ERRORS_KEY))
+        elif isinstance(obj, AchievementPopup):
+            ops.append(("drop", _popups_key(obj.user_id)))
+    return [op for op in ops if op[0] != "report" or op[1] is not None]
+
+
+def _count_report(post_id: int, delta: int) -> None:
+    if not redis_client.exists(REPORTS_READY_KEY):
+        return  # rebuilt from the database on the next read
+    count = int(redis_client.hincrby(REPORTS_KEY, str(post_id), delta))
+    before = count - delta
+    if before < URGENT_THRESHOLD <= count:
+        redis_client.incrby(URGENT_KEY, 1)
+    elif count < URGENT_THRESHOLD <= before:
+        redis_client.incrby(URGENT_KEY, -1)
+    if count <= 0:
+        redis_client.hdel(REPORTS_KEY, str(post_id))
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    ops = _changes(session)
+    if ops:
+        session.info.setdefault("template_globals_ops", []).extend(ops)
+
+
+def _after_commit(session) -> None:
+    ops = session.info.pop("template_globals_ops", None)
+    if not ops:
+        return
+    drops = {op[1] for op in ops if op[0] == "drop"}
+    try:
+        if drops:
+            redis_client.delete(*drops)
+        for op, post_id, delta in (op for op in ops if op[0] == "report"):
+            _count_report(post_id, delta)
+    except Exception:
+        log.warning("could not update template globals", exc_info=True)
+        _delete(REPORTS_READY_KEY)
+
+
+def _after_rollback(session, previous_transaction) -> None:
+    session.info.pop("template_globals_ops", None)
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Register the session hooks that keep the cached values current."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -42,6 +42,16 @@ class Config:
     INVOICE_FOLDER = os.getenv("INVOICE_FOLDER", "static/invoices")
     TRANSLATIONS_FOLDER = os.getenv("TRANSLATIONS_FOLDER", "static/translations")
     NOTE_TRANSLATION_LANGS = os.getenv("NOTE_TRANSLATION_LANGS", "en").split(",")
+    # raw uploads wait here until the ingestion stages have processed them
+    INGEST_FOLDER = os.getenv("INGEST_FOLDER", "instance/ingest")
+    # files written by background admin CSV exports
+    EXPORT_FOLDER = os.getenv("EXPORT_FOLDER", "instance/exports")
+    # long-lived LibreOffice converters (unoserver when installed)
+    OFFICE_POOL_SIZE = int(os.getenv("OFFICE_POOL_SIZE", 2))
+    # 0 picks free ports per process; fixed ports only suit a single process
+    OFFICE_BASE_PORT = int(os.getenv("OFFICE_BASE_PORT", 0))
+    OFFICE_PROFILE_DIR = os.getenv("OFFICE_PROFILE_DIR")
+    OFFICE_CONVERT_TIMEOUT = int(os.getenv("OFFICE_CONVERT_TIMEOUT", 120))
 
     CLOUDINARY_URL = os.getenv("CLOUDINARY_URL")
     if CLOUDINARY_URL:
@@ -51,6 +61,8 @@ class Config:
     FEED_DL_W = float(os.getenv("FEED_DL_W", 2))
     FEED_COM_W = float(os.getenv("FEED_COM_W", 1))
     FEED_HALF_LIFE_H = float(os.getenv("FEED_HALF_LIFE_H", 24))
+    # "redis" shares feed timelines between workers through REDIS_URL
+    FEED_CACHE_BACKEND = os.getenv("FEED_CACHE_BACKEND", "memory")
 
     MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
@@ -165,6 +177,40 @@ class Config:
 
     POST_RETENTION_DAYS = int(os.getenv("POST_RETENTION_DAYS", 30))
 
+    # "sync" runs background tasks inline; "sqlite" hands them to `crunevo worker`
+    TASK_QUEUE_BACKEND = os.getenv("TASK_QUEUE_BACKEND", "sync")
+    TASK_QUEUE_PATH = os.getenv("TASK_QUEUE_PATH", "instance/tasks.db")
+    TASK_MAX_RETRIES = int(os.getenv("TASK_MAX_RETRIES", 3))
+    TASK_RETRY_DELAY = float(os.getenv("TASK_RETRY_DELAY", 5))
+
+    # run /search/api categories concurrently, each on its own DB connection
+    SEARCH_PARALLEL = os.getenv("SEARCH_PARALLEL", "0") == "1"
+    SEARCH_POOL_SIZE = int(os.getenv("SEARCH_POOL_SIZE", 4))
+    # seconds a category may take before it is returned as partial
+    SEARCH_CATEGORY_BUDGET = float(os.getenv("SEARCH_CATEGORY_BUDGET", 2))
+    # in-memory autocomplete: rebuilt in the background after MAX_AGE seconds,
+    # cold-started from the `flask autocomplete-rebuild` snapshot when fresh
+    AUTOCOMPLETE_MAX_AGE = int(os.getenv("AUTOCOMPLETE_MAX_AGE", 900))
+    AUTOCOMPLETE_MAX_ITEMS = int(os.getenv("AUTOCOMPLETE_MAX_ITEMS", 50_000))
+    AUTOCOMPLETE_SNAPSHOT = os.getenv(
+        "AUTOCOMPLETE_SNAPSHOT", "instance/autocomplete.json"
+    )
+    # trending searches: sliding window and how often counts are persisted
+    TRENDING_WINDOW_HOURS = float(os.getenv("TRENDING_WINDOW_HOURS", 24))
+    TRENDING_FLUSH_INTERVAL = float(os.getenv("TRENDING_FLUSH_INTERVAL", 60))
+    # page views are buffered in memory and written in batches
+    PAGEVIEW_BUFFER_SIZE = int(os.getenv("PAGEVIEW_BUFFER_SIZE", 10_000))
+    PAGEVIEW_BATCH_SIZE = int(os.getenv("PAGEVIEW_BATCH_SIZE", 500))
+    PAGEVIEW_FLUSH_INTERVAL = float(os.getenv("PAGEVIEW_FLUSH_INTERVAL", 5))
+    # achievement unlocks are announced in per-window digests per career
+    ACHIEVEMENT_DIGEST_WINDOW = int(os.getenv("ACHIEVEMENT_DIGEST_WINDOW", 3600))
+    ACHIEVEMENT_DIGEST_AUDIENCE = int(os.getenv("ACHIEVEMENT_DIGEST_AUDIENCE", 1000))
+    # per-process LRU in front of Redis for @cached/get_or_set_cache
+    CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", 1024))
+    CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", 5))
+    CACHE_XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", 1))
+    CACHE_SERIALIZER = os.getenv("CACHE_SERIALIZER", "json")  # or "orjson"
+
     SENTRY_DSN = os.getenv("SENTRY_DSN")
     SENTRY_ENVIRONMENT = os.getenv("SENTRY_ENVIRONMENT", "production")
     SENTRY_TRACES_RATE = float(os.getenv("SENTRY_TRACES_RATE", 0))
@@ -10,6 +10,7 @@ from flask_socketio import SocketIO
 from authlib.integrations.flask_client import OAuth
 
 import errno
+import fnmatch
 import os
 
 
@@ -21,10 +22,32 @@ class MockRedis:
     def get(self, key):
         return self._data.get(key)
 
-    def set(self, key, value, ex=None):
+    def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self._data:
+            return None
         self._data[key] = value
         return True
 
+    def setex(self, key, time, value):
+        self._data[key] = value
+        return True
+
+    def incrby(self, key, amount=1):
+        self._data[key] = int(self._data.get(key, 0)) + amount
+        return self._data[key]
+
+    def incr(self, key, amount=1):
+        return self.incrby(key, amount)
+
+    def mget(self, keys, *args):
+        keys = [keys, *args] if isinstance(keys, str) else list(keys)
+        return [self._data.get(key) for key in keys]
+
+    def scan_iter(self, match=None, count=None):
+        for key in list(self._data):
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key
+
     def delete(self, *keys):
         for key in keys:
             self._data.pop(key, None)
@@ -40,6 +63,148 @@ class MockRedis:
     def ping(self):
         return True
 
+    def expire(self, key, seconds):
+        return key in self._data
+
+    # Sorted sets are stored as {member: score} dicts
+    def zadd(self, key, mapping):
+        zset = self._data.setdefault(key, {})
+        added = sum(1 for member in mapping if member not in zset)
+        zset.update({member: float(score) for member, score in mapping.items()})
+        return added
+
+    def _zsorted(self, key, reverse=False):
+        zset = self._data.get(key, {})
+        return sorted(zset.items(), key=lambda it: (it[1], it[0]), reverse=reverse)
+
+    @staticmethod
+    def _slice(items, start, stop):
+        stop = len(items) + stop if stop < 0 else stop
+        start = max(len(items) + start if start < 0 else start, 0)
+        if stop < 0 or start > stop:
+            return []
+        return items[start : stop + 1]
+
+    def zrange(self, key, start, stop, withscores=False):
+        items = self._slice(self._zsorted(key), start, stop)
+        return items if withscores else [member for member, _ in items]
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        items = self._slice(self._zsorted(key, reverse=True), start, stop)
+        return items if withscores else [member for member, _ in items]
+
+    def zrem(self, key, *members):
+        zset = self._data.get(key, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def zremrangebyrank(self, key, start, stop):
+        doomed = self.zrange(key, start, stop)
+        return self.zrem(key, *doomed)
+
+    def zcard(self, key):
+        return len(self._data.get(key, {}))
+
+    def zincrby(self, key, amount, member):
+        zset = self._data.setdefault(key, {})
+        zset[member] = zset.get(member, 0.0) + float(amount)
+        return zset[member]
+
+    def zscore(self, key, member):
+        return self._data.get(key, {}).get(member)
+
+    @staticmethod
+    def _bound(value):
+        value = str(value)
+        if value.startswith("("):
+            return float(value[1:]), True
+        return float(value), False
+
+    def zcount(self, key, min, max):
+        lo, lo_open = self._bound(min)
+        hi, hi_open = self._bound(max)
+        return sum(
+            1
+            for score in self._data.get(key, {}).values()
+            if (score > lo if lo_open else score >= lo)
+            and (score < hi if hi_open else score <= hi)
+        )
+
+    def rename(self, src, dst):
+        self._data[dst] = self._data.pop(src)
+        return True
+
+    # Hashes are stored as plain dicts
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        data = self._data.setdefault(key, {})
+        added = sum(1 for f in fields if f not in data)
+        data.update(fields)
+        return added
+
+    def hget(self, key, field):
+        return self._data.get(key, {}).get(field)
+
+    def hmget(self, key, fields):
+        data = self._data.get(key, {})
+        return [data.get(f) for f in fields]
+
+    def hincrby(self, key, field, amount=1):
+        data = self._data.setdefault(key, {})
+        data[field] = int(data.get(field, 0)) + amount
+        return data[field]
+
+    def hdel(self, key, *fields):
+        data = self._data.get(key, {})
+        return sum(1 for f in fields if data.pop(f, None) is not None)
+
+    # Sets are stored as Python sets
+    def sadd(self, key, *members):
+        data = self._data.setdefault(key, set())
+        added = sum(1 for m in members if m not in data)
+        data.update(members)
+        return added
+
+    def smembers(self, key):
+        return set(self._data.get(key, set()))
+
+    def srem(self, key, *members):
+        data = self._data.get(key, set())
+        removed = sum(1 for m in members if m in data)
+        data.difference_update(members)
+        return removed
+
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+
+
+class MockPipeline:
+    """Queue MockRedis calls and run them on ``execute`` like redis-py."""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._calls = []
+
 
 try:
     import redis
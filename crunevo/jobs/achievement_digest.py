@@ -0,0 +1,195 @@
+"""Coalesced achievement announcements.
+
+``unlock_achievement`` no longer writes a feed item per unlock. The
+``UserAchievement`` rows are the event stream: this job reads the unlocks of
+each closed ``ACHIEVEMENT_DIGEST_WINDOW`` and publishes one "logro" item per
+badge and career ("12 estudiantes de Medicina desbloquearon TOP_3"). Each
+digest goes to the unlockers and to at most ``ACHIEVEMENT_DIGEST_AUDIENCE``
+active students of that career, written with a single ``INSERT ... SELECT``,
+so the cost follows the number of digests, not the number of users. Once
+committed, each digest is pushed to the owners whose timeline is already
+cached; everyone else reads the rows when ``/api/feed`` reloads their stream.
+"""
+
+from datetime import datetime, timedelta
+import json
+import logging
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import and_, case, insert, literal, or_, select, true
+
+from crunevo.cache.feed_cache import push_items, warm_users
+from crunevo.extensions import db
+from crunevo.models import Achievement, FeedItem, SiteConfig, User, UserAchievement
+
+log = logging.getLogger(__name__)
+
+WATERMARK_KEY = "achievement_digest_until"
+SAMPLE_USERNAMES = 3
+
+
+def _window_start(moment: datetime, window: int) -> datetime:
+    epoch = datetime(1970, 1, 1)
+    seconds = int((moment - epoch).total_seconds())
+    return epoch + timedelta(seconds=seconds - seconds % window)
+
+
+def _watermark() -> Optional[SiteConfig]:
+    return SiteConfig.query.filter_by(key=WATERMARK_KEY).first()
+
+
+def _summary(group: dict, title: str) -> str:
+    if group["count"] == 1:
+        return f"{group['usernames'][0]} desbloqueó {title}"
+    audience = f" de {group['career']}" if group["career"] else ""
+    return f"{group['count']} estudiantes{audience} desbloquearon {title}"
+
+
+def _publish(group: dict, title: str, audience_limit: int) -> tuple[dict, list]:
+    """Insert the digest's feed rows; return its cache entry and owners."""
+    meta = {
+        "badge_code": group["badge_code"],
+        "username": group["usernames"][0],
+        "usernames": group["usernames"],
+        "count": group["count"],
+        "career": group["career"],
+        "window_start": group["window_start"].isoformat(),
+        "summary": _summary(group, title),
+    }
+    owners = group["user_ids"][:audience_limit]
+    audience = User.id.in_(owners)
+    if group["career"]:
+        audience = or_(
+            audience, and_(User.career == group["career"], User.activated == true())
+        )
+    rows = (
+        select(
+            User.id,
+            literal("logro"),
+            literal(group["ref_id"]),
+            literal(json.dumps(meta)),
+            true(),
+            literal(0.0),
+            literal(group["published_at"]),
+        )
+        .where(audience)
+        # unlockers first so the cap never leaves them out
+        .order_by(case((User.id.in_(owners), 0), else_=1), User.id)
+        .limit(audience_limit)
+    )
+    inserted = db.session.scalars(
+        insert(FeedItem)
+        .from_select(
+            [
+                "owner_id",
+                "item_type",
+                "ref_id",
+                "metadata",
+                "is_highlight",
+                "score",
+                "created_at",
+            ],
+            rows,
+        )
+        .returning(FeedItem.owner_id)
+    ).all()
+    item = FeedItem(
+        item_type="logro",
+        ref_id=group["ref_id"],
+        metadata=json.dumps(meta),
+        is_highlight=True,
+    )
+    entry = {
+        "score": 0.0,
+        "created_at": group["published_at"],
+        "payload": item.to_dict(),
+    }
+    return entry, inserted
+
+
+def publish_achievement_digests(now: Optional[datetime] = None) -> dict:
+    """Publish the digests of every window closed since the last run."""
+    config = current_app.config
+    window = int(config.get("ACHIEVEMENT_DIGEST_WINDOW", 3600))
+    audience_limit = int(config.get("ACHIEVEMENT_DIGEST_AUDIENCE", 1000))
+    now = now or datetime.utcnow()
+    until = _window_start(now, window)
+
+    mark = _watermark()
+    since = (
+        datetime.fromisoformat(mark.value)
+        if mark and mark.value
+        else until - timedelta(seconds=window)
+    )
+    stats = {"unlocks": 0, "digests": 0, "rows": 0}
+    if since >= until:
+        return stats
+
+    groups: dict[tuple, dict] = {}
+    unlocks = (
+        db.session.query(
+            UserAchievement.id,
+            UserAchievement.user_id,
+            UserAchievement.badge_code,
+            UserAchievement.timestamp,
+            User.username,
+            User.career,
+        )
+        .join(User, User.id == UserAchievement.user_id)
+        .filter(UserAchievement.timestamp >= since, UserAchievement.timestamp < until)
+        .order_by(UserAchievement.timestamp, UserAchievement.id)
+    )
+    for ua_id, user_id, badge_code, moment, username, career in unlocks:
+        start = _window_start(moment, window)
+        group = groups.setdefault(
+            (start, badge_code, career),
+            {
+                "badge_code": badge_code,
+                "career": career,
+                "window_start": start,
+                "published_at": start + timedelta(seconds=window),
+                "ref_id": ua_id,
+                "count": 0,
+                "user_ids": [],
+                "usernames": [],
+            },
+        )
+        group["count"] += 1
+        group["user_ids"].append(user_id)
+        if len(group["usernames"]) < SAMPLE_USERNAMES:
+            group["usernames"].append(username)
+        stats["unlocks"] += 1
+
+    titles = dict(
+        db.session.query(Achievement.code, Achievement.title).filter(
+            Achievement.code.in_({g["badge_code"] for g in groups.values()})
+        )
+    )
+    published = []
+    for group in groups.values():
+        title = titles.get(group["badge_code"], group["badge_code"])
+        entry, owners = _publish(group, title, audience_limit)
+        published.append((entry, owners))
+        stats["rows"] += len(owners)
+        stats["digests"] += 1
+
+    if mark is None:
+        mark = SiteConfig(key=WATERMARK_KEY)
+        db.session.add(mark)
+    mark.value = until.isoformat()
+    db.session.commit()
+    # cold timelines would only get a one-item stream evicting warm ones
+    warm = warm_users({owner_id for _, owners in published for owner_id in owners})
+    for entry, owners in published:
+        for owner_id in owners:
+            if owner_id in warm:
+                push_items(owner_id, [entry])
+    if stats["digests"]:
+        log.info(
+            "achievement digests: %d unlocks -> %d digests, %d feed rows",
+            stats["unlocks"],
+            stats["digests"],
+            stats["rows"],
+        )
+    return stats
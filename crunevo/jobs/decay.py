@@ -1,51 +1,160 @@
 from datetime import datetime, timedelta
 import logging
+import time
+
+from sqlalchemy import bindparam, text
 
 from crunevo.extensions import db
-from crunevo.models import FeedItem, Note
+from crunevo.models import FeedItem, Note, User
 from crunevo.cache.feed_cache import push_items
 from crunevo.utils.scoring import compute_score
 
 
 BATCH = 1000
 
+log = logging.getLogger(__name__)
 
-def decay_scores(batch_size: int = BATCH) -> None:
-    """Recalculate score for older feed items based on freshness."""
-    log = logging.getLogger(__name__)
-    cutoff = datetime.utcnow() - timedelta(hours=1)
-    base_q = FeedItem.query.filter(
-        FeedItem.item_type == "apunte",
-        FeedItem.created_at <= cutoff,
-    ).order_by(FeedItem.created_at)
 
-    offset = 0
-    processed = 0
+def _bulk_update_scores(scores: dict[int, float]) -> int:
+    """Write ``scores`` (note id -> score) to every 'apunte' feed item at once."""
+    if db.engine.dialect.name == "postgresql":
+        rows = []
+        params = {}
+        for i, (note_id, score) in enumerate(scores.items()):
+            rows.append(f"(CAST(:n{i} AS INTEGER), CAST(:s{i} AS DOUBLE PRECISION))")
+            params[f"n{i}"] = note_id
+            params[f"s{i}"] = score
+        result = db.session.execute(
+            text(
+                "UPDATE feed_item SET score = v.score"
+                f" FROM (VALUES {', '.join(rows)}) AS v(ref_id, score)"
+                " WHERE feed_item.item_type = 'apunte'"
+                " AND feed_item.ref_id = v.ref_id"
+            ),
+            params,
+        )
+        return result.rowcount
+    table = FeedItem.__table__
+    result = db.session.execute(
+        table.update()
+        .where(table.c.item_type == "apunte", table.c.ref_id == bindparam("note_id"))
+        .values(score=bindparam("new_score")),
+        [{"note_id": nid, "new_score": score} for nid, score in scores.items()],
+    )
+    return result.rowcount
+
+
+def _refresh_cache(notes: list, scores: dict[int, float]) -> None:
+    """Push the new scores to every stream holding the batch's notes."""
+    payloads = {
+        n.id: {
+            "item_type": "apunte",
+            "ref_id": n.id,
+            "title": n.title,
+            "summary": n.description,
+            "author_username": n.username,
+            "downloads": n.downloads,
+        }
+        for n in notes
+    }
+    by_owner: dict = {}
+    rows = db.session.query(
+        FeedItem.owner_id, FeedItem.ref_id, FeedItem.is_highlight, FeedItem.created_at
+    ).filter(FeedItem.item_type == "apunte", FeedItem.ref_id.in_(list(scores)))
+    for owner_id, ref_id, is_highlight, created_at in rows:
+        by_owner.setdefault(owner_id, []).append(
+            {
+                "score": scores[ref_id],
+                "created_at": created_at,
+                "payload": {**payloads[ref_id], "is_highlight": is_highlight},
+            }
+        )
+    for owner_id, entries in by_owner.items():
+        push_items(owner_id, entries)
+
+
+def decay_scores(batch_size: int = BATCH) -> dict:
+    """Recalculate score for older feed items based on freshness.
+
+    Every 'apunte' feed item of a note shares the same score, so the job walks
+    the distinct notes with keyset pagination, computes each score once and
+    writes a batch with a single bulk UPDATE. Returns the run statistics.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=1)
+    started = time.perf_counter()
+    last_id = 0
+    batches = notes_done = rows_done = 0
     while True:
-        items = base_q.offset(offset).limit(batch_size).all()
-        if not items:
+        batch_start = time.perf_counter()
+        note_ids = [
+            rid
+            for (rid,) in db.session.query(FeedItem.ref_id)
+            .filter(
+                FeedItem.item_type == "apunte",
+                FeedItem.created_at <= cutoff,
+                FeedItem.ref_id > last_id,
+            )
+            .distinct()
+            .order_by(FeedItem.ref_id)
+            .limit(batch_size)
+        ]
+        if not note_ids:
             break
-        for it in items:
-            note = Note.query.get(it.ref_id)
-            if not note:
-                continue
-            it.score = compute_score(
-                note.likes, note.downloads, note.comments_count, note.created_at
+        last_id = note_ids[-1]
+
+        notes = (
+            db.session.query(
+                Note.id,
+                Note.title,
+                Note.description,
+                Note.likes,
+                Note.downloads,
+                Note.comments_count,
+                Note.created_at,
+                User.username,
             )
-        db.session.commit()
-        for it in items:
-            push_items(
-                it.owner_id,
-                [
-                    {
-                        "score": it.score,
-                        "created_at": it.created_at,
-                        "payload": it.to_dict(),
-                    }
-                ],
+            .join(User, Note.user_id == User.id)
+            .filter(Note.id.in_(note_ids))
+            .all()
+        )
+        scores = {
+            n.id: compute_score(
+                n.likes or 0, n.downloads or 0, n.comments_count or 0, n.created_at
             )
-        processed += len(items)
-        offset += batch_size
+            for n in notes
+        }
+        rows = _bulk_update_scores(scores) if scores else 0
+        db.session.commit()
+        if scores:
+            _refresh_cache(notes, scores)
+
+        batches += 1
+        notes_done += len(scores)
+        rows_done += rows
+        elapsed = time.perf_counter() - batch_start
+        log.info(
+            "decay_scores: batch %d notes=%d rows=%d in %.2fs (%.0f rows/s)",
+            batches,
+            len(scores),
+            rows,
+            elapsed,
+            rows / elapsed if elapsed else 0,
+        )
 
-    if processed:
-        log.info("decay_scores: processed %d items", processed)
+    total = time.perf_counter() - started
+    stats = {
+        "batches": batches,
+        "notes": notes_done,
+        "rows": rows_done,
+        "seconds": total,
+        "rows_per_second": rows_done / total if total else 0,
+    }
+    if rows_done:
+        log.info(
+            "decay_scores: processed %d items for %d notes in %.1fs (%.0f rows/s)",
+            rows_done,
+            notes_done,
+            total,
+            stats["rows_per_second"],
+        )
+    return stats
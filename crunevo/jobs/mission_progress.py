@@ -0,0 +1,101 @@
+"""Reconciliation of the mission progress counters.
+
+The counters in ``mission_progress`` are maintained incrementally by mapper
+hooks (see ``crunevo.services.mission_progress``), so bulk statements, raw
+SQL and cascades that skip the ORM leave them behind. This job recounts every
+metric from its source table, ``batch`` users at a time, rewrites the
+counters that differ and drops day buckets older than the window.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+import logging
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, func, select
+
+from crunevo.extensions import db
+from crunevo.models import MissionProgress, User
+from crunevo.services.mission_progress import METRICS, TOTAL, WINDOW_DAYS, upsert
+
+log = logging.getLogger(__name__)
+
+RECONCILE_BATCH = 1000
+
+
+def _as_date(value) -> date:
+    # SQLite's date() returns text
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _recount(spec, lo: int, hi: int, since: datetime):
+    def query(*columns):
+        stmt = select(spec.owner, *columns, func.count()).select_from(spec.model)
+        if spec.join is not None:
+            stmt = stmt.join(*spec.join)
+        return stmt.where(spec.owner.between(lo, hi), *spec.where)
+
+    for owner, count in db.session.execute(query().group_by(spec.owner)):
+        yield owner, TOTAL, count
+    day = func.date(spec.timestamp)
+    recent = query(day).where(spec.timestamp >= since).group_by(spec.owner, day)
+    for owner, value, count in db.session.execute(recent):
+        yield owner, _as_date(value), count
+
+
+def reconcile_mission_progress(
+    today: Optional[date] = None, batch: int = RECONCILE_BATCH
+) -> dict:
+    """Recount the counters from the source tables and repair any drift."""
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=WINDOW_DAYS - 1)
+    table = MissionProgress.__table__
+    stats = {"repaired": 0, "pruned": 0}
+
+    stats["pruned"] = db.session.execute(
+        delete(table).where(table.c.bucket != TOTAL, table.c.bucket < since)
+    ).rowcount
+    db.session.commit()
+
+    last_id = db.session.query(func.max(User.id)).scalar() or 0
+    for lo in range(0, last_id + 1, batch):
+        hi = lo + batch - 1
+        expected = defaultdict(int)
+        for metric, spec in METRICS.items():
+            for owner, bucket, count in _recount(
+                spec, lo, hi, datetime.combine(since, time.min)
+            ):
+                expected[owner, metric, bucket] += count
+        current = {
+            (user_id, metric, bucket): count
+            for user_id, metric, bucket, count in db.session.execute(
+                select(table).where(table.c.user_id.between(lo, hi))
+            )
+        }
+        changed = [
+            {"user_id": user_id, "metric": metric, "bucket": bucket, "count": count}
+            for (user_id, metric, bucket), count in expected.items()
+            if current.get((user_id, metric, bucket)) != count
+        ]
+        stale = [
+            {"b_user": user_id, "b_metric": metric, "b_bucket": bucket}
+            for (user_id, metric, bucket) in current
+            if (user_id, metric, bucket) not in expected
+        ]
+        if changed:
+            upsert(db.session.connection(), changed, increment=False)
+        if stale:
+            db.session.execute(
+                delete(table).where(
+                    table.c.user_id == bindparam("b_user"),
+                    table.c.metric == bindparam("b_metric"),
+                    table.c.bucket == bindparam("b_bucket"),
+                ),
+                stale,
+            )
+        stats["repaired"] += len(changed) + len(stale)
+        db.session.commit()
+
+    if stats["repaired"]:
+        log.warning("mission progress: repaired %d counters", stats["repaired"])
+    return stats
@@ -27,7 +27,7 @@ from .answer import Answer  # noqa: F401
 from .saved_post import SavedPost  # noqa: F401
 from .course import Course, SavedCourse  # noqa: F401
 from .notification import Notification  # noqa: F401
-from .mission import Mission, UserMission  # noqa: F401
+from .mission import Mission, MissionProgress, UserMission  # noqa: F401
 from .post_reaction import PostReaction  # noqa: F401
 from .referido import Referral  # noqa: F401
 from .device_claim import DeviceClaim  # noqa: F401
@@ -39,7 +39,9 @@ from .two_factor_token import TwoFactorToken  # noqa: F401
 from .verification_request import VerificationRequest  # noqa: F401
 from .user_activity import UserActivity  # noqa: F401
 from .site_config import SiteConfig  # noqa: F401
-from .page_view import PageView  # noqa: F401
+from .page_view import PageView, PageViewHourly  # noqa: F401
+from .search_trend import SearchTrend  # noqa: F401
+from .note_hash import NoteHash, NotePageHash  # noqa: F401
 from .story import Story  # noqa: F401
 from .group_mission import GroupMission, GroupMissionParticipant  # noqa: F401
 from .user_block import UserBlock  # noqa: F401
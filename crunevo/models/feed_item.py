@@ -1,14 +1,17 @@
 from datetime import datetime
 from crunevo.extensions import db
-from sqlalchemy import Enum as SAEnum, desc
+from sqlalchemy import Enum as SAEnum, desc, or_
 import json
 
 
 class FeedItem(db.Model):
     __tablename__ = "feed_item"
 
+    # owner_id used by broadcast rows shared by every timeline
+    BROADCAST = None
+
     id = db.Column(db.Integer, primary_key=True)
-    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     item_type = db.Column(
         SAEnum(
             "apunte",
@@ -54,6 +57,11 @@ class FeedItem(db.Model):
         db.Index("idx_feed_type_ref", "item_type", "ref_id"),
     )
 
+    @classmethod
+    def visible_to(cls, user_id):
+        """Filter for a user's timeline: own rows plus broadcast rows."""
+        return or_(cls.owner_id == user_id, cls.owner_id.is_(None))
+
     def to_dict(self):
         """Return minimal data per item type for API.
 
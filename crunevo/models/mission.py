@@ -21,3 +21,18 @@ class UserMission(db.Model):
 
     user = db.relationship("User", backref="missions")
     mission = db.relationship("Mission")
+
+
+class MissionProgress(db.Model):
+    """Per-user event counters behind mission progress.
+
+    ``bucket`` is the UTC day the events happened on; the all-time total of a
+    metric is kept in the ``crunevo.services.mission_progress.TOTAL`` bucket.
+    """
+
+    __tablename__ = "mission_progress"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), primary_key=True)
+    metric = db.Column(db.String(20), primary_key=True)
+    bucket = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
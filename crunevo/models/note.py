@@ -23,6 +23,11 @@ class Note(db.Model):
     likes = db.Column(db.Integer, default=0)
     comments_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # upload pipeline progress, see crunevo.services.note_ingest
+    processing_status = db.Column(
+        db.String(20), default="ready", server_default="ready", nullable=False
+    )
+    processing_state = db.Column(db.JSON)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     comments = db.relationship("Comment", backref="note", lazy=True)
 
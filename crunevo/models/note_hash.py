@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from crunevo.extensions import db
+
+
+class NoteHash(db.Model):
+    """SHA-256 of an uploaded note file; the unique index rejects copies."""
+
+    __tablename__ = "note_hash"
+
+    note_id = db.Column(
+        db.Integer, db.ForeignKey("note.id", ondelete="CASCADE"), primary_key=True
+    )
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class NotePageHash(db.Model):
+    """Perceptual hash of one rendered page, split into four 16-bit bands.
+
+    Hashes within ``plagiarism.NEAR_DISTANCE`` bits of each other share at
+    least one band, so candidates are found through the band indexes.
+    """
+
+    __tablename__ = "note_page_hash"
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(
+        db.Integer,
+        db.ForeignKey("note.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    page = db.Column(db.Integer, nullable=False)
+    phash = db.Column(db.BigInteger, nullable=False)
+    band0 = db.Column(db.Integer, nullable=False, index=True)
+    band1 = db.Column(db.Integer, nullable=False, index=True)
+    band2 = db.Column(db.Integer, nullable=False, index=True)
+    band3 = db.Column(db.Integer, nullable=False, index=True)
@@ -6,3 +6,13 @@ class PageView(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     path = db.Column(db.String(300), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PageViewHourly(db.Model):
+    """Page views per path and hour, kept up to date by the PageView flusher."""
+
+    __tablename__ = "page_view_hourly"
+
+    path = db.Column(db.String(300), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,11 @@
+from crunevo.extensions import db
+
+
+class SearchTrend(db.Model):
+    """Search counts per normalized term and time bucket."""
+
+    __tablename__ = "search_trend"
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    term = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
@@ -24,6 +24,10 @@ class User(UserMixin, db.Model):
     career = db.Column(db.String(120))
     interests = db.Column(db.Text)
     mostrar_tienda_perfil = db.Column(db.Boolean, default=False)
+    # kept in step with the notifications table by crunevo.utils.notify
+    unread_notifications = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
     
     # Forum gamification fields
     forum_level = db.Column(db.Integer, default=1)
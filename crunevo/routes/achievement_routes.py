@@ -1,5 +1,6 @@
 from flask import Blueprint, session, jsonify, current_app
 from flask_login import login_required, current_user
+from crunevo.cache import template_globals
 from crunevo.extensions import db
 from crunevo.models import AchievementPopup
 
@@ -18,10 +19,7 @@ def clear_session_new_achievements():
                 current_app.logger.debug(
                     "🔥 Revisando sesión de logros… %s", current_value
                 )
-            has_pending = AchievementPopup.query.filter_by(
-                user_id=current_user.id, shown=False
-            ).count()
-            if not has_pending:
+            if not template_globals.has_pending_popups(current_user.id):
                 session.pop("new_achievements", None)
     except Exception:
         # Silently handle any errors during app initialization
@@ -40,6 +38,7 @@ def mark_shown():
             return jsonify({"success": True, "message": "No hay logros pendientes"})
         q.update({"shown": True}, synchronize_session=False)
         db.session.commit()
+        template_globals.popups_changed(current_user.id)
         session.pop("new_achievements", None)
         return jsonify({"success": True})
     except Exception as e:
@@ -8,6 +8,7 @@ from flask import (
     jsonify,
     abort,
     current_app,
+    send_from_directory,
 )
 from flask_login import login_required, current_user
 from crunevo.extensions import db
@@ -34,7 +35,7 @@ from crunevo.models import (
     PostReaction,
     SavedPost,
     PostImage,
-    PageView,
+    PageViewHourly,
     PrintRequest,
     ProductRequest,
     SystemErrorLog,
@@ -44,11 +45,12 @@ from crunevo.utils.credits import add_credit
 from crunevo.utils.ranking import calculate_weekly_ranking
 from crunevo.constants.credit_reasons import CreditReasons
 from crunevo.utils.image_optimizer import upload_optimized_image
+from crunevo.utils import csv_export
+from crunevo.services import mission_progress
 from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError
-import csv
-import io
-from flask import make_response
+from werkzeug.utils import secure_filename
+import os
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -308,97 +310,125 @@ def manage_credits():
     return render_template("admin/manage_credits.html", credits=credits)
 
 
-@admin_bp.route("/credits/export")
-def export_credits():
-    """Export credit history to CSV."""
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["ID", "Usuario", "Email", "Monto", "Razón", "Fecha"])
+def _export_response(name):
+    if request.args.get("background"):
+        filename = csv_export.start_background(name)
+        return (
+            jsonify(
+                {
+                    "status": "queued",
+                    "url": url_for("admin.download_export", filename=filename),
+                }
+            ),
+            202,
+        )
+    return csv_export.stream(name, gzip=bool(request.args.get("gzip")))
+
 
-    credits = (
-        db.session.query(Credit, User)
+def _timestamp(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+@csv_export.exporter(
+    "credits",
+    "credits_export.csv",
+    ["ID", "Usuario", "Email", "Monto", "Razón", "Fecha"],
+)
+def _credit_rows():
+    rows = db.session.execute(
+        db.select(
+            Credit.id,
+            User.username,
+            User.email,
+            Credit.amount,
+            Credit.reason,
+            Credit.timestamp,
+        )
         .join(User, Credit.user_id == User.id)
         .order_by(Credit.timestamp.desc())
-        .all()
+        .execution_options(yield_per=csv_export.YIELD_PER)
     )
-    for credit, user in credits:
-        writer.writerow(
-            [
-                credit.id,
-                user.username,
-                user.email,
-                credit.amount,
-                credit.reason,
-                credit.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            ]
-        )
+    for credit_id, username, email, amount, reason, timestamp in rows:
+        yield [credit_id, username, email, amount, reason, _timestamp(timestamp)]
+
 
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers["Content-Type"] = "text/csv"
-    response.headers["Content-Disposition"] = "attachment; filename=credits_export.csv"
-    return response
+@admin_bp.route("/credits/export")
+def export_credits():
+    """Export credit history to CSV."""
+    return _export_response("credits")
+
+
+@csv_export.exporter(
+    "users",
+    "users_export.csv",
+    ["ID", "Username", "Email", "Credits", "Points", "Verified", "Created"],
+)
+def _user_rows():
+    rows = db.session.execute(
+        db.select(
+            User.id,
+            User.username,
+            User.email,
+            User.credits,
+            User.points,
+            User.verification_level,
+        )
+        .order_by(User.id)
+        .execution_options(yield_per=csv_export.YIELD_PER)
+    )
+    for user_id, username, email, credits, points, verification in rows:
+        yield [
+            user_id,
+            username,
+            email,
+            credits or 0,
+            points or 0,
+            (verification or 0) > 0,
+            user_id,  # We don't have created_at, using ID as proxy
+        ]
 
 
 @admin_bp.route("/export/users")
 def export_users():
     """Export users to CSV"""
-    users = User.query.all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow(
-        ["ID", "Username", "Email", "Credits", "Points", "Verified", "Created"]
-    )
-
-    # Data
-    for user in users:
-        writer.writerow(
-            [
-                user.id,
-                user.username,
-                user.email,
-                user.credits or 0,
-                user.points or 0,
-                user.verification_level > 0,
-                user.id,  # We don't have created_at, using ID as proxy
-            ]
-        )
+    return _export_response("users")
 
-    output.seek(0)
 
-    response = make_response(output.getvalue())
-    response.headers["Content-Type"] = "text/csv"
-    response.headers["Content-Disposition"] = "attachment; filename=users_export.csv"
-
-    return response
+@csv_export.exporter(
+    "products",
+    "products_export.csv",
+    ["ID", "Nombre", "Precio", "Crolars", "Stock"],
+)
+def _product_rows():
+    rows = db.session.execute(
+        db.select(
+            Product.id,
+            Product.name,
+            Product.price,
+            Product.price_credits,
+            Product.stock,
+        )
+        .order_by(Product.id)
+        .execution_options(yield_per=csv_export.YIELD_PER)
+    )
+    for product_id, name, price, price_credits, stock in rows:
+        yield [product_id, name, f"{price:.2f}", price_credits or "", stock]
 
 
 @admin_bp.route("/export/products")
 def export_products():
     """Export products to CSV"""
-    products = Product.query.all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["ID", "Nombre", "Precio", "Crolars", "Stock"])
-    for p in products:
-        writer.writerow(
-            [
-                p.id,
-                p.name,
-                f"{p.price:.2f}",
-                p.price_credits or "",
-                p.stock,
-            ]
-        )
+    return _export_response("products")
+
 
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers["Content-Type"] = "text/csv"
-    response.headers["Content-Disposition"] = "attachment; filename=products_export.csv"
-    return response
+@admin_bp.route("/exports/<path:filename>")
+def download_export(filename):
+    """Download a file written by a background export."""
+    filename = secure_filename(filename)
+    folder = csv_export.export_folder()
+    if not os.path.exists(os.path.join(folder, filename)):
+        abort(404)
+    return send_from_directory(folder, filename, as_attachment=True)
 
 
 @admin_bp.route("/store/history")
@@ -433,34 +463,42 @@ def manage_notes():
     return render_template("admin/manage_notes.html", notes=notes)
 
 
+@csv_export.exporter(
+    "notes",
+    "notes_export.csv",
+    ["ID", "Título", "Autor", "Vistas", "Descargas", "Likes", "Fecha"],
+)
+def _note_rows():
+    rows = db.session.execute(
+        db.select(
+            Note.id,
+            Note.title,
+            User.username,
+            Note.views,
+            Note.downloads,
+            Note.likes,
+            Note.created_at,
+        )
+        .join(User, Note.user_id == User.id)
+        .order_by(Note.id)
+        .execution_options(yield_per=csv_export.YIELD_PER)
+    )
+    for note_id, title, username, views, downloads, likes, created_at in rows:
+        yield [
+            note_id,
+            title,
+            username,
+            views,
+            downloads,
+            likes,
+            _timestamp(created_at),
+        ]
+
+
 @admin_bp.route("/export/notes")
 def export_notes():
     """Export notes to CSV"""
-    notes = db.session.query(Note, User).join(User, Note.user_id == User.id).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["ID", "Título", "Autor", "Vistas", "Descargas", "Likes", "Fecha"])
-    for note, user in notes:
-        writer.writerow(
-            [
-                note.id,
-                note.title,
-                user.username,
-                note.views,
-                note.downloads,
-                note.likes,
-                (
-                    note.created_at.strftime("%Y-%m-%d %H:%M:%S")
-                    if note.created_at
-                    else ""
-                ),
-            ]
-        )
-    output.seek(0)
-    response = make_response(output.getvalue())
-    response.headers["Content-Type"] = "text/csv"
-    response.headers["Content-Disposition"] = "attachment; filename=notes_export.csv"
-    return response
+    return _export_response("notes")
 
 
 @admin_bp.route("/verificaciones")
@@ -669,7 +707,7 @@ def resolver_error(error_id):
 @admin_bp.route("/run-ranking")
 def run_ranking():
     """Manually recalculate the weekly ranking."""
-    calculate_weekly_ranking()
+    calculate_weekly_ranking(incremental=request.args.get("incremental") == "1")
     log_admin_action("Recalcul\u00f3 ranking semanal")
     flash("Ranking recalculado", "success")
     return redirect(url_for("admin.dashboard"))
@@ -733,6 +771,13 @@ def delete_post_admin(post_id):
     """Allow admins to delete any post."""
     post = Post.query.get_or_404(post_id)
     FeedItem.query.filter_by(item_type="post", ref_id=post.id).delete()
+    # the bulk deletes skip the hooks that keep mission counters current
+    mission_progress.retract(
+        db.session.connection(), "likes", PostReaction.post_id == post.id
+    )
+    mission_progress.retract(
+        db.session.connection(), "comments", PostComment.post_id == post.id
+    )
     PostReaction.query.filter_by(post_id=post.id).delete()
     PostComment.query.filter_by(post_id=post.id).delete()
     PostImage.query.filter_by(post_id=post.id).delete()
@@ -817,14 +862,15 @@ def stats_api():
 def pageviews():
     """Display heatmap of page views."""
     week_ago = datetime.utcnow() - timedelta(days=6)
+    day = db.func.date(PageViewHourly.hour)
     rows = (
         db.session.query(
-            PageView.path,
-            db.func.date(PageView.timestamp).label("d"),
-            db.func.count().label("c"),
+            PageViewHourly.path,
+            day.label("d"),
+            db.func.sum(PageViewHourly.count).label("c"),
         )
-        .filter(PageView.timestamp >= week_ago)
-        .group_by(PageView.path, db.func.date(PageView.timestamp))
+        .filter(PageViewHourly.hour >= week_ago)
+        .group_by(PageViewHourly.path, day)
         .all()
     )
     totals = {}
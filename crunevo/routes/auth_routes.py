@@ -268,6 +268,7 @@ def view_profile(username):
     try:
         for note in (
             Note.query.filter_by(user_id=user.id)
+            .filter(Note.processing_status == "ready")
             .order_by(Note.created_at.desc())
             .limit(5)
         ):
@@ -449,7 +450,10 @@ def view_profile(username):
     # Obtener datos adicionales para las pestañas
     try:
         user_notes = (
-            Note.query.filter_by(user_id=user.id).order_by(Note.created_at.desc()).all()
+            Note.query.filter_by(user_id=user.id)
+            .filter(Note.processing_status == "ready")
+            .order_by(Note.created_at.desc())
+            .all()
         )
     except (ProgrammingError, OperationalError):
         current_app.logger.exception("Failed to load notes for %s", username)
@@ -744,10 +748,18 @@ def delete_account():
         Credit,
     )
     from crunevo.constants import CreditReasons
+    from crunevo.services import mission_progress
 
-    # Remove posts and related objects
+    # Remove posts and related objects; the bulk deletes skip the mission
+    # counter hooks, so uncount reactions and comments first
     for post in list(current_user.posts):
         FeedItem.query.filter_by(item_type="post", ref_id=post.id).delete()
+        mission_progress.retract(
+            db.session.connection(), "likes", PostReaction.post_id == post.id
+        )
+        mission_progress.retract(
+            db.session.connection(), "comments", PostComment.post_id == post.id
+        )
         PostReaction.query.filter_by(post_id=post.id).delete()
         PostComment.query.filter_by(post_id=post.id).delete()
         PostImage.query.filter_by(post_id=post.id).delete()
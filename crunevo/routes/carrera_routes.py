@@ -99,7 +99,11 @@ def get_apuntes():
     page = request.args.get("page", 1, type=int)
     course_filter = request.args.get("course", "")
 
-    query = Note.query.join(User).filter(User.career == current_user.career)
+    query = (
+        Note.query.join(User)
+        .filter(User.career == current_user.career)
+        .filter(Note.processing_status == "ready")
+    )
 
     if course_filter:
         query = query.filter(Note.course.ilike(f"%{course_filter}%"))
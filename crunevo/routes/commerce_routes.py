@@ -13,6 +13,7 @@ from datetime import datetime, timedelta
 from flask_login import current_user, login_required
 
 from crunevo.utils.helpers import activated_required
+from crunevo.services.checkout import load_cart, place_order
 from crunevo.extensions import db
 from crunevo.models import (
     Product,
@@ -440,14 +441,9 @@ def checkout():
         flash("Tu carrito está vacío", "warning")
         return redirect(url_for("commerce.view_cart"))
 
-    cart_items = []
-    total_soles = 0
-    for pid_str, qty in cart.items():
-        pid = int(pid_str)
-        product = Product.query.filter_by(id=pid).first()
-        if product:
-            cart_items.append({"product": product, "quantity": qty})
-            total_soles += float(product.price) * qty
+    items = load_cart(cart)
+    cart_items = [{"product": product, "quantity": qty} for product, qty in items]
+    total_soles = sum(float(product.price) * qty for product, qty in items)
 
     if request.method == "GET":
         return render_template(
@@ -456,41 +452,37 @@ def checkout():
             total_soles=total_soles,
         )
 
-    download_url = None
     shipping_option = request.form.get("shipping_option")
     shipping_address = None
     if shipping_option == "delivery":
         shipping_address = request.form.get("shipping_address")
     shipping_message = request.form.get("shipping_message")
-    purchases_created = []
-    for item in cart_items:
-        product = item["product"]
-        qty = item["quantity"]
-        if product.stock < qty:
-            flash(f"Stock insuficiente para {product.name}", "danger")
-            continue
-        purchase = Purchase(
-            user_id=current_user.id,
-            product_id=product.id,
-            quantity=qty,
-            price_soles=product.price,
-            shipping_address=shipping_address,
-            shipping_message=shipping_message,
-            timestamp=datetime.utcnow(),
-        )
-        db.session.add(purchase)
-        purchases_created.append(purchase)
-        product.stock -= qty
-        if qty == 1 and product.download_url and not download_url:
-            download_url = product.download_url
-
-    db.session.commit()
-    from crunevo.utils.invoice import generate_invoice
-
-    for purchase in purchases_created:
-        generate_invoice(purchase)
+    result = place_order(current_user.id, items, shipping_address, shipping_message)
+    for name in result.out_of_stock:
+        flash(f"Stock insuficiente para {name}", "danger")
     session.pop("cart", None)
-    return render_template("tienda/checkout_success.html", download_url=download_url)
+
+    # the commit expired the cart's products: reload the sold ones at once
+    if result.sold:
+        Product.query.filter(Product.id.in_(list(result.sold))).all()
+    order_items = [
+        {"product": product, "quantity": qty, "price": float(product.price)}
+        for product, qty in items
+        if product.id in result.sold
+    ]
+    order = {
+        "id": result.purchase_ids[0] if result.purchase_ids else None,
+        "created_at": datetime.utcnow(),
+        "total_amount": result.total,
+        "shipping_option": shipping_option,
+        "shipping_address": shipping_address,
+    }
+    return render_template(
+        "tienda/checkout_success.html",
+        order=order,
+        order_items=order_items,
+        download_url=result.download_url,
+    )
 
 
 @commerce_bp.route("/compras")
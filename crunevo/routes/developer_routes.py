@@ -51,7 +51,12 @@ def recent_posts():
 @developer_bp.route("/popular-notes")
 @api_key_required
 def popular_notes():
-    notes = Note.query.order_by(Note.likes.desc()).limit(10).all()
+    notes = (
+        Note.query.filter(Note.processing_status == "ready")
+        .order_by(Note.likes.desc())
+        .limit(10)
+        .all()
+    )
     return jsonify([{"id": n.id, "title": n.title, "likes": n.likes} for n in notes])
 
 
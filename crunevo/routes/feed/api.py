@@ -17,7 +17,13 @@ from crunevo.utils.helpers import activated_required
 from crunevo.utils import send_notification, record_activity
 from crunevo.utils.credits import add_credit, spend_credit
 from crunevo.constants import CreditReasons
-from crunevo.cache.feed_cache import fetch as cache_fetch, push_items as cache_push
+from crunevo.cache.feed_cache import (
+    MAX_CACHE,
+    fetch as cache_fetch,
+    is_warm,
+    mark_warm,
+    push_items as cache_push,
+)
 from sqlalchemy.exc import IntegrityError
 
 from . import feed_bp
@@ -294,6 +300,26 @@ def api_feed():
     fmt = request.args.get("format")
     start = (page - 1) * 10
     stop = start + 9
+    if not is_warm(current_user.id):
+        # targeted rows (e.g. "movimiento") live only in the user's own stream
+        own = (
+            FeedItem.query.filter(FeedItem.owner_id == current_user.id)
+            .order_by(FeedItem.score.desc(), FeedItem.created_at.desc())
+            .limit(MAX_CACHE)
+            .all()
+        )
+        cache_push(
+            current_user.id,
+            [
+                {
+                    "score": fi.score,
+                    "created_at": fi.created_at,
+                    "payload": fi.to_dict(),
+                }
+                for fi in own
+            ],
+        )
+        mark_warm(current_user.id)
     items = [
         i
         for i in cache_fetch(current_user.id, start, stop)
@@ -301,7 +327,7 @@ def api_feed():
     ]
     if not items:
         q = (
-            FeedItem.query.filter_by(owner_id=current_user.id)
+            FeedItem.query.filter(FeedItem.visible_to(current_user.id))
             .filter(FeedItem.item_type != "apunte")
             .order_by(FeedItem.score.desc(), FeedItem.created_at.desc())
             .offset(start)
@@ -309,13 +335,14 @@ def api_feed():
             .all()
         )
         items = [fi.to_dict() for fi in q]
-        cache_push(
-            current_user.id,
-            [
+        # broadcast rows go back to the shared stream, not the user's copy
+        by_owner = {}
+        for fi, item in zip(q, items):
+            by_owner.setdefault(fi.owner_id, []).append(
                 {"score": fi.score, "created_at": fi.created_at, "payload": item}
-                for fi, item in zip(q, items)
-            ],
-        )
+            )
+        for owner_id, entries in by_owner.items():
+            cache_push(owner_id, entries)
 
     seen = set()
     unique_items = []
@@ -382,7 +409,12 @@ def api_quickfeed():
     """Return feed items filtered for quick toggles."""
     filter_opt = request.args.get("filter", "recientes")
     if filter_opt == "apuntes":
-        notes = Note.query.order_by(Note.created_at.desc()).limit(20).all()
+        notes = (
+            Note.query.filter(Note.processing_status == "ready")
+            .order_by(Note.created_at.desc())
+            .limit(20)
+            .all()
+        )
         html = render_template("feed/_notes.html", notes=notes)
         return jsonify({"html": html, "count": len(notes)})
 
@@ -480,8 +512,8 @@ def load_feed():
     page = int(request.args.get("page", 1))
     categoria = request.args.get("categoria")
 
-    query = FeedItem.query.options(joinedload(FeedItem.post)).filter_by(
-        owner_id=current_user.id
+    query = FeedItem.query.options(joinedload(FeedItem.post)).filter(
+        FeedItem.visible_to(current_user.id)
     )
     if categoria == "apuntes":
         query = query.filter_by(item_type="apunte")
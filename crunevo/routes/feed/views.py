@@ -31,6 +31,7 @@ from crunevo.utils import (
     record_activity,
 )
 from crunevo.cache.feed_cache import remove_item
+from crunevo.services import mission_progress
 from sqlalchemy.exc import IntegrityError
 from crunevo.services.feed_service import (
     fetch_feed_data,
@@ -343,6 +344,7 @@ def user_notes(user_id: int):
     page = request.args.get("page", 1, type=int)
     pagination = (
         Note.query.filter_by(user_id=user.id)
+        .filter(Note.processing_status == "ready")
         .order_by(Note.created_at.desc())
         .paginate(page=page, per_page=10)
     )
@@ -394,6 +396,13 @@ def eliminar_post(post_id):
     feed_items = FeedItem.query.filter_by(item_type="post", ref_id=post.id).all()
     owner_ids = [fi.owner_id for fi in feed_items]
     FeedItem.query.filter_by(item_type="post", ref_id=post.id).delete()
+    # the bulk deletes skip the hooks that keep mission counters current
+    mission_progress.retract(
+        db.session.connection(), "likes", PostReaction.post_id == post.id
+    )
+    mission_progress.retract(
+        db.session.connection(), "comments", PostComment.post_id == post.id
+    )
     PostReaction.query.filter_by(post_id=post.id).delete()
     PostComment.query.filter_by(post_id=post.id).delete()
     PostImage.query.filter_by(post_id=post.id).delete()
@@ -32,6 +32,7 @@ from crunevo.models.badge import ForumBadge
 from crunevo.models.user import User
 from crunevo.utils.credits import add_credit
 from crunevo.constants.credit_reasons import CreditReasons
+from crunevo.services import leaderboard as leaderboards
 from crunevo.services.gamification import GamificationService
 from crunevo.services.moderation import ModerationService
 from crunevo.services.learning_tools import LearningToolsService
@@ -814,10 +815,8 @@ def dashboard():
 
     # Get user's rank in leaderboard
     user_rank = None
-    for i, user in enumerate(leaderboard):
-        if user.id == current_user.id:
-            user_rank = i + 1
-            break
+    if current_user.reputation_score:
+        user_rank = leaderboards.rank("reputation", current_user.id)
 
     # Get recent activity stats
     recent_questions = (
@@ -890,26 +889,9 @@ def leaderboard():
     # Get different leaderboards
     top_reputation = GamificationService.get_leaderboard(20)
 
-    top_questions = (
-        User.query.filter(User.questions_asked > 0)
-        .order_by(desc(User.questions_asked))
-        .limit(10)
-        .all()
-    )
-
-    top_answers = (
-        User.query.filter(User.answers_given > 0)
-        .order_by(desc(User.answers_given))
-        .limit(10)
-        .all()
-    )
-
-    top_best_answers = (
-        User.query.filter(User.best_answers > 0)
-        .order_by(desc(User.best_answers))
-        .limit(10)
-        .all()
-    )
+    top_questions = leaderboards.top("questions", 10)
+    top_answers = leaderboards.top("answers", 10)
+    top_best_answers = leaderboards.top("best_answers", 10)
 
     return render_template(
         "forum/leaderboard.html",
@@ -1,21 +1,16 @@
 from datetime import datetime, timedelta
 from flask import Blueprint, redirect, url_for, flash, request
 from flask_login import current_user, login_required
-from sqlalchemy import func
 from crunevo.models import (
     Mission,
     UserMission,
     GroupMission,
     GroupMissionParticipant,
-    Note,
-    PostComment,
-    Post,
-    Purchase,
-    Referral,
     DeviceClaim,
     Event,
 )
 from crunevo.extensions import db
+from crunevo.services import mission_progress
 from crunevo.utils.credits import add_credit
 from crunevo.constants import CreditReasons
 
@@ -24,58 +19,8 @@ missions_bp = Blueprint("missions", __name__, url_prefix="/misiones")
 
 def progress_for_code(user, code, category=None):
     """Calculate progress for a mission code."""
-    now = datetime.utcnow()
-    one_day_ago = now - timedelta(days=1)
-    progress = 0
-
-    if code.startswith("subir_apuntes_") or code == "primer_apunte":
-        progress = Note.query.filter_by(user_id=user.id).count()
-        if category == "diaria":
-            progress = (
-                Note.query.filter_by(user_id=user.id)
-                .filter(Note.created_at >= one_day_ago)
-                .count()
-            )
-    elif code.startswith("comentar_"):
-        progress = (
-            PostComment.query.filter_by(author_id=user.id)
-            .filter(PostComment.timestamp >= one_day_ago)
-            .count()
-        )
-    elif code.startswith("likes_") or code == "primer_like":
-        progress = (
-            db.session.query(func.coalesce(func.sum(Post.likes), 0))
-            .filter_by(author_id=user.id)
-            .scalar()
-            or 0
-        )
-    elif code.startswith("comprar_producto_"):
-        progress = Purchase.query.filter_by(user_id=user.id).count()
-    elif code.startswith("referido_"):
-        try:
-            completed_refs = Referral.query.filter_by(
-                invitador_id=user.id, completado=True
-            ).count()
-            if code == "referido_maraton":
-                week_ago = datetime.utcnow() - timedelta(days=7)
-                progress = (
-                    Referral.query.filter_by(invitador_id=user.id, completado=True)
-                    .filter(Referral.fecha_creacion >= week_ago)
-                    .count()
-                )
-            else:
-                progress = completed_refs
-        except Exception:
-            db.session.rollback()
-            progress = 0
-    elif code == "maraton_apuntes":
-        progress = (
-            Note.query.filter_by(user_id=user.id)
-            .filter(Note.created_at >= one_day_ago)
-            .count()
-        )
-
-    return progress
+    counters = mission_progress.load([user.id])[user.id]
+    return mission_progress.progress(counters, code, category)
 
 
 def compute_mission_states(user):
@@ -87,9 +32,15 @@ def compute_mission_states(user):
     upcoming_window = now + timedelta(days=7)
     changes = False
 
+    event_ids = {m.event_id for m in missions if m.event_id}
+    events = (
+        {e.id: e for e in Event.query.filter(Event.id.in_(event_ids))}
+        if event_ids
+        else {}
+    )
     for m in missions:
         if m.event_id:
-            event = Event.query.get(m.event_id)
+            event = events.get(m.event_id)
             should_activate = False
             if event:
                 should_activate = (
@@ -102,6 +53,8 @@ def compute_mission_states(user):
     if changes:
         db.session.commit()
 
+    counters = mission_progress.load([user.id])[user.id]
+    records = {r.mission_id: r for r in UserMission.query.filter_by(user_id=user.id)}
     for m in missions:
         if m.event_id and not m.is_active:
             progress_dict[m.id] = {
@@ -111,10 +64,12 @@ def compute_mission_states(user):
                 "id": None,
             }
             continue
-        progress = progress_for_code(user, m.code, getattr(m, "category", None))
+        progress = mission_progress.progress(
+            counters, m.code, getattr(m, "category", None)
+        )
 
         completed = progress >= m.goal
-        record = UserMission.query.filter_by(user_id=user.id, mission_id=m.id).first()
+        record = records.get(m.id)
 
         progress_dict[m.id] = {
             "progreso": progress,
@@ -133,12 +88,15 @@ def compute_group_mission_states(user):
         .filter(GroupMissionParticipant.user_id == user.id)
         .all()
     )
+    counters = mission_progress.load(
+        {part.user_id for gm in groups for part in gm.participants}
+    )
     result = {}
     for gm in groups:
         # update individual progress records
         for part in gm.participants:
-            part.progress = progress_for_code(
-                part.user, gm.code, getattr(gm, "category", None)
+            part.progress = mission_progress.progress(
+                counters[part.user_id], gm.code, getattr(gm, "category", None)
             )
         total = sum(p.progress for p in gm.participants)
         entry = next((p for p in gm.participants if p.user_id == user.id), None)
@@ -1,8 +1,5 @@
 import os
 import json
-import subprocess
-import tempfile
-from pdf2image import convert_from_path
 from urllib.parse import urlparse
 from flask import (
     Blueprint,
@@ -29,7 +26,6 @@ from crunevo.models import (
     Credit,
     Report,
     User,
-    Referral,
     PrintRequest,
 )
 from crunevo.utils.credits import add_credit
@@ -38,11 +34,11 @@ from crunevo.utils import (
     send_notification,
     record_activity,
     suggest_categories,
-    translate_fields,
 )
-from crunevo.utils.scoring import update_feed_score
+from crunevo.utils.scoring import schedule_feed_score_update
 from crunevo.cache.feed_cache import remove_item
 from crunevo.constants import CreditReasons, AchievementCodes
+from crunevo.services import note_ingest
 from crunevo.app import DEFAULT_CSP
 import cloudinary.uploader
 
@@ -67,7 +63,7 @@ def list_notes():
     filter_opt = request.args.get("filter", "recientes")
     tag = request.args.get("tag")
 
-    query = Note.query
+    query = Note.query.filter(Note.processing_status == "ready")
     if tag:
         query = query.filter(Note.tags.ilike(f"%{tag}%"))
 
@@ -103,7 +99,8 @@ def list_notes():
 def search_notes():
     q = request.args.get("q", "")
     results = Note.query.filter(
-        (Note.title.ilike(f"%{q}%")) | (Note.tags.ilike(f"%{q}%"))
+        Note.processing_status == "ready",
+        (Note.title.ilike(f"%{q}%")) | (Note.tags.ilike(f"%{q}%")),
     ).all()
     return jsonify(
         [
@@ -168,17 +165,11 @@ def upload_note():
         file_hash = plagiarism.compute_hash(f.stream)
         duplicate_id = plagiarism.get_duplicate(file_hash)
         if duplicate_id:
-            report = Report(
-                user_id=current_user.id,
-                description=f"Duplicate note attempt matches {duplicate_id}",
+            plagiarism.report_duplicate(
+                current_user.id,
+                duplicate_id,
+                f"Duplicate note attempt matches {duplicate_id}",
             )
-            db.session.add(report)
-            admin = User.query.filter_by(role="admin").first()
-            if admin:
-                send_notification(
-                    admin.id,
-                    f"Posible plagio al subir nota coincidente con {duplicate_id}",
-                )
             db.session.commit()
             flash(
                 "El archivo parece ser una copia de otro apunte y se revisará.",
@@ -186,193 +177,21 @@ def upload_note():
             )
             return redirect(url_for("notes.upload_note"))
 
-        cloud_url = current_app.config.get("CLOUDINARY_URL")
-        original_url = ""
-        thumbnail_url = ""
         try:
-            filename = secure_filename(f.filename)
-            public_id = os.path.splitext(filename)[0]
-            pdf_for_thumb = None
-            if cloud_url:
-                tmpdir = tempfile.mkdtemp()
-                tmp_path = os.path.join(tmpdir, filename)
-                f.save(tmp_path)
-                if ext == ".pdf":
-                    result = cloudinary.uploader.upload(
-                        tmp_path,
-                        resource_type="auto",
-                        public_id=f"notes/{public_id}",
-                        format="pdf",
-                    )
-                    view_url, _ = cloudinary.utils.cloudinary_url(
-                        f"notes/{public_id}.pdf",
-                        resource_type="image",
-                        secure=True,
-                    )
-                    filepath = view_url
-                    original_url = result["secure_url"]
-                    pdf_for_thumb = tmp_path
-                elif ext == ".docx":
-                    orig = cloudinary.uploader.upload(
-                        tmp_path,
-                        resource_type="raw",
-                        public_id=f"notes/{public_id}",
-                        format="docx",
-                    )
-                    original_url = orig["secure_url"]
-                    filepath = original_url
-                    subprocess.run(
-                        [
-                            "soffice",
-                            "--headless",
-                            "--convert-to",
-                            "pdf",
-                            "--outdir",
-                            tmpdir,
-                            tmp_path,
-                        ],
-                        check=True,
-                        shell=False,
-                    )
-                    pdf_for_thumb = os.path.join(tmpdir, f"{public_id}.pdf")
-                elif ext == ".pptx":
-                    orig = cloudinary.uploader.upload(
-                        tmp_path,
-                        resource_type="raw",
-                        public_id=f"notes/{public_id}",
-                        format="pptx",
-                    )
-                    subprocess.run(
-                        [
-                            "soffice",
-                            "--headless",
-                            "--convert-to",
-                            "pdf",
-                            "--outdir",
-                            tmpdir,
-                            tmp_path,
-                        ],
-                        check=True,
-                        shell=False,
-                    )
-                    pdf_for_thumb = os.path.join(tmpdir, f"{public_id}.pdf")
-                    _ = cloudinary.uploader.upload(
-                        pdf_for_thumb,
-                        resource_type="auto",
-                        public_id=f"notes/{public_id}",
-                        format="pdf",
-                    )
-                    view_url, _ = cloudinary.utils.cloudinary_url(
-                        f"notes/{public_id}.pdf",
-                        resource_type="image",
-                        secure=True,
-                    )
-                    filepath = view_url
-                    original_url = orig["secure_url"]
-                else:
-                    result = cloudinary.uploader.upload(
-                        tmp_path,
-                        resource_type="image",
-                        public_id=f"notes/{public_id}",
-                    )
-                    filepath = result["secure_url"]
-                    original_url = filepath
-                    pdf_for_thumb = None
-
-                if ext in {".pdf", ".pptx", ".docx"} and pdf_for_thumb:
-                    try:
-                        images = convert_from_path(
-                            pdf_for_thumb, first_page=1, last_page=1, fmt="png"
-                        )
-                        thumb_path = os.path.join(tmpdir, f"{public_id}_thumb.png")
-                        images[0].save(thumb_path, "PNG")
-                        up = cloudinary.uploader.upload(
-                            thumb_path,
-                            resource_type="image",
-                            public_id=f"notes/{public_id}_thumb",
-                        )
-                        thumbnail_url = up["secure_url"]
-                    except Exception:
-                        current_app.logger.exception("Error generando miniatura")
-                elif ext in {".jpg", ".jpeg", ".png", ".webp"}:
-                    thumbnail_url = filepath
-            else:
-                upload_folder = current_app.config["UPLOAD_FOLDER"]
-                os.makedirs(upload_folder, exist_ok=True)
-                filepath = os.path.join(upload_folder, filename)
-                f.save(filepath)
-                original_url = filepath
-                pdf_for_thumb = None
-                if ext == ".pptx":
-                    subprocess.run(
-                        [
-                            "soffice",
-                            "--headless",
-                            "--convert-to",
-                            "pdf",
-                            "--outdir",
-                            upload_folder,
-                            filepath,
-                        ],
-                        check=True,
-                        shell=False,
-                    )
-                    filepath = os.path.join(
-                        upload_folder, os.path.splitext(filename)[0] + ".pdf"
-                    )
-                    pdf_for_thumb = filepath
-                elif ext == ".docx":
-                    tmpdir = tempfile.mkdtemp()
-                    subprocess.run(
-                        [
-                            "soffice",
-                            "--headless",
-                            "--convert-to",
-                            "pdf",
-                            "--outdir",
-                            tmpdir,
-                            filepath,
-                        ],
-                        check=True,
-                        shell=False,
-                    )
-                    pdf_for_thumb = os.path.join(tmpdir, f"{public_id}.pdf")
-                elif ext == ".pdf":
-                    pdf_for_thumb = filepath
-                if ext in {".pdf", ".pptx", ".docx"} and pdf_for_thumb:
-                    try:
-                        images = convert_from_path(
-                            pdf_for_thumb, first_page=1, last_page=1, fmt="png"
-                        )
-                        thumb_path = os.path.join(
-                            upload_folder, os.path.splitext(filename)[0] + "_thumb.png"
-                        )
-                        images[0].save(thumb_path, "PNG")
-                        thumbnail_url = thumb_path
-                    except Exception:
-                        current_app.logger.exception("Error generando miniatura")
-                elif ext in {".jpg", ".jpeg", ".png", ".webp"}:
-                    thumbnail_url = filepath
+            raw_path = note_ingest.store_upload(f)
         except Exception:
             current_app.logger.exception("Error al subir el archivo")
             flash("Ocurrió un problema al subir el archivo", "danger")
             return redirect(url_for("notes.upload_note"))
 
-        if not category:
-            cats = current_app.config.get("NOTE_CATEGORIES", [])
-            suggested = suggest_categories(f"{title} {description}", cats)
-            if suggested:
-                category = suggested[0]
-
         rt_val = request.form.get("reading_time", "").strip()
         rt = int(rt_val) if rt_val else None
 
+        # conversion, thumbnail, upload, categorization, translation and
+        # feed fan-out run as background stages (crunevo.services.note_ingest)
         note = Note(
             title=title,
             description=description,
-            filename=filepath,
-            original_file_url=original_url,
-            thumbnail_url=thumbnail_url,
             file_type=ftype,
             tags=request.form.get("tags"),
             category=category,
@@ -383,28 +202,25 @@ def upload_note():
             course=request.form.get("course"),
             career=request.form.get("career"),
             author=current_user,
+            processing_status="pending",
+            processing_state=note_ingest.initial_state(raw_path, file_hash),
         )
         db.session.add(note)
-        current_user.points += 10
         db.session.commit()
-        plagiarism.record_hash(note.id, file_hash)
-        from crunevo.utils import create_feed_item_for_all
-
-        create_feed_item_for_all("apunte", note.id)
-        trans_folder = os.path.join(current_app.config["TRANSLATIONS_FOLDER"], "notes")
-        langs = current_app.config.get("NOTE_TRANSLATION_LANGS", ["en"])
-        translate_fields(note.id, note.title, note.description, langs, trans_folder)
-        add_credit(current_user, 5, CreditReasons.APUNTE_SUBIDO, related_id=note.id)
-        unlock_achievement(current_user, AchievementCodes.PRIMER_APUNTE)
-        ref = None
+        note_id = note.id
+        # the hash is recorded and the upload rewarded once the note is ready
         try:
-            ref = Referral.query.filter_by(
-                invitado_id=current_user.id, completado=True
-            ).first()
+            note_ingest.start(note_id)
         except Exception:
+            current_app.logger.exception("Error al procesar el apunte")
             db.session.rollback()
-        if ref:
-            unlock_achievement(ref.invitador, AchievementCodes.ALIADO_EDUCATIVO)
+            note_ingest.discard(note_id)
+            flash("Ocurrió un problema al procesar el archivo", "danger")
+            return redirect(url_for("notes.upload_note"))
+        db.session.refresh(note)
+        if note.processing_status != "ready":
+            flash("Apunte recibido; se publicará cuando termine de procesarse")
+            return redirect(url_for("notes.list_notes"))
         flash("Apunte subido correctamente")
         return redirect(url_for("notes.list_notes"))
 
@@ -545,6 +361,11 @@ def note_translation(note_id, lang):
 @activated_required
 def detail(note_id):
     note = Note.query.get_or_404(note_id)
+    if note.processing_status != "ready":
+        if note.user_id != current_user.id:
+            abort(404)
+        flash("Tu apunte se publicará cuando termine de procesarse")
+        return redirect(url_for("notes.list_notes"))
     note.views += 1
     db.session.commit()
 
@@ -593,7 +414,7 @@ def detail(note_id):
     frame_options="ALLOWALL",
 )
 def embed_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = Note.query.filter_by(id=note_id, processing_status="ready").first_or_404()
     note.views += 1
     db.session.commit()
 
@@ -641,7 +462,7 @@ def add_comment(note_id):
                 f"{current_user.username} comentó tu apunte",
                 url_for("notes.view_note", id=note.id),
             )
-        update_feed_score(note.id)
+        schedule_feed_score_update(note.id)
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return jsonify(
                 {
@@ -685,7 +506,7 @@ def like_note(note_id):
         action = "liked"
 
     db.session.commit()
-    update_feed_score(note.id)
+    schedule_feed_score_update(note.id)
 
     if action == "liked" and note.user_id != current_user.id:
         send_notification(
@@ -709,10 +530,10 @@ def share_note(note_id):
 @notes_bp.route("/<int:note_id>/download")
 @verified_required
 def download_note(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = Note.query.filter_by(id=note_id, processing_status="ready").first_or_404()
     note.downloads += 1
     db.session.commit()
-    update_feed_score(note.id)
+    schedule_feed_score_update(note.id)
 
     if note.downloads >= 100:
         unlock_achievement(note.author, AchievementCodes.DESCARGA_100)
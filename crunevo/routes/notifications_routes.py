@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, jsonify, abort
+from flask import Blueprint, render_template, jsonify, abort, request
 from flask_login import current_user, login_required
+from crunevo.utils import notify
 from crunevo.utils.helpers import activated_required
 from crunevo.extensions import db
 from crunevo.models import Notification
@@ -11,20 +12,19 @@ noti_bp = Blueprint("noti", __name__)
 @noti_bp.route("/notifications")
 @activated_required
 def ver_notificaciones():
-    notificaciones = (
-        Notification.query.filter_by(user_id=current_user.id)
-        .order_by(Notification.timestamp.desc())
-        .all()
+    before = request.args.get("before", type=int)
+    notificaciones, next_before = notify.page(current_user.id, before)
+    return render_template(
+        "notificaciones/lista.html",
+        notificaciones=notificaciones,
+        next_before=next_before,
     )
-    return render_template("notificaciones/lista.html", notificaciones=notificaciones)
 
 
 @noti_bp.route("/notifications/read_all", methods=["POST"])
 @login_required
 def marcar_leidas():
-    Notification.query.filter_by(user_id=current_user.id, is_read=False).update(
-        {"is_read": True}
-    )
+    notify.mark_all_read(current_user.id)
     db.session.commit()
     return jsonify({"status": "ok"})
 
@@ -66,5 +66,4 @@ def api_notifications():
 @login_required
 def api_notifications_count():
     """Return the number of unread notifications for the current user."""
-    count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
-    return jsonify({"count": count})
+    return jsonify({"count": max(current_user.unread_notifications or 0, 0)})
@@ -611,6 +611,15 @@ def update_block_position(block_id):
         return jsonify({"success": False, "error": "Personal space unavailable"}), 503
     try:
         data = request.get_json() or {}
+
+        # Drag and drop sends the new neighbours; only this block is rewritten
+        if "after_id" in data or "before_id" in data:
+            moved = BlockService.move_block(
+                current_user.id, block_id, data.get("after_id"), data.get("before_id")
+            )
+            if not moved:
+                return jsonify({"success": False, "error": "Block not found"}), 404
+            return jsonify({"success": True})
         
         # Build block order data with all provided fields
         block_data = {"id": block_id}
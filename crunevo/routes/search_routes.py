@@ -1,6 +1,11 @@
-from flask import Blueprint, render_template, request, jsonify
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+from flask import Blueprint, current_app, render_template, request, jsonify
 from crunevo.utils.helpers import activated_required
 from crunevo.extensions import db
+from crunevo.services import autocomplete, search_index, trending
 from crunevo.models import (
     User,
     Note,
@@ -11,10 +16,14 @@ from crunevo.models import (
     Review,
     Course,
 )
-from sqlalchemy import or_, desc, func, case
+from sqlalchemy import or_, desc, func, case, text
 
 search_bp = Blueprint("search", __name__, url_prefix="/search")
 
+# shared by all requests; bounded so fan-out can't exhaust the DB pool
+_pool = None
+_pool_lock = threading.Lock()
+
 
 @search_bp.route("/")
 @activated_required
@@ -43,44 +52,31 @@ def search_api():
             }
         )
 
+    if page == 1:
+        trending.record(query)
+
+    if category == "all":
+        names = list(CATEGORY_SEARCHES)
+    else:
+        names = [category] if category in CATEGORY_SEARCHES else []
+
+    if current_app.config.get("SEARCH_PARALLEL") and len(names) > 1:
+        outcomes = _search_parallel(names, query, page, per_page)
+    else:
+        outcomes = _search_sequential(names, query, page, per_page)
+
     results = {}
     total_results = 0
-
-    # Buscar en todas las categorías o en una específica
-    if category == "all" or category == "notes":
-        notes_results = search_notes(query, page, per_page)
-        results["notes"] = notes_results["results"]
-        total_results += notes_results["total"]
-
-    if category == "all" or category == "posts":
-        posts_results = search_posts(query, page, per_page)
-        results["posts"] = posts_results["results"]
-        total_results += posts_results["total"]
-
-    if category == "all" or category == "users":
-        users_results = search_users(query, page, per_page)
-        results["users"] = users_results["results"]
-        total_results += users_results["total"]
-
-    if category == "all" or category == "products":
-        products_results = search_products(query, page, per_page)
-        results["products"] = products_results["results"]
-        total_results += products_results["total"]
-
-    if category == "all" or category == "courses":
-        courses_results = search_courses(query, page, per_page)
-        results["courses"] = courses_results["results"]
-        total_results += courses_results["total"]
-
-    if category == "all" or category == "chats":
-        chats_results = search_chats(query, page, per_page)
-        results["chats"] = chats_results["results"]
-        total_results += chats_results["total"]
-
-    if category == "all" or category == "missions":
-        missions_results = search_missions(query, page, per_page)
-        results["missions"] = missions_results["results"]
-        total_results += missions_results["total"]
+    timings = {}
+    partial = []
+    for name, (found, elapsed) in outcomes.items():
+        timings[name] = round(elapsed * 1000, 1)
+        if found is None:
+            partial.append(name)
+            results[name] = []
+            continue
+        results[name] = found["results"]
+        total_results += found["total"]
 
     # Sugerencias inteligentes
     suggestions = get_smart_suggestions(query)
@@ -94,13 +90,90 @@ def search_api():
             "trending": get_trending_searches(),
             "page": page,
             "per_page": per_page,
+            "timings": timings,
+            "partial": partial,
         }
     )
 
 
+def _search_sequential(names, query, page, per_page):
+    outcomes = {}
+    for name in names:
+        started = time.perf_counter()
+        found = CATEGORY_SEARCHES[name](query, page, per_page)
+        outcomes[name] = (found, time.perf_counter() - started)
+    return outcomes
+
+
+def _search_pool(size):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix="search")
+    return _pool
+
+
+def _timed_search(app, name, query, page, per_page, budget):
+    started = time.perf_counter()
+    # a fresh app context gives the thread its own session and connection
+    with app.app_context():
+        if db.engine.dialect.name == "postgresql":
+            # let the database abandon queries the response no longer waits for
+            db.session.execute(
+                text(f"SET LOCAL statement_timeout = {int(budget * 1000)}")
+            )
+        found = CATEGORY_SEARCHES[name](query, page, per_page)
+    return found, time.perf_counter() - started
+
+
+def _search_parallel(names, query, page, per_page):
+    """Run the category searches concurrently within a shared time budget.
+
+    Categories that fail or miss the ``SEARCH_CATEGORY_BUDGET`` deadline come
+    back as ``None`` so the response can report them as partial.
+    """
+    app = current_app._get_current_object()
+    budget = app.config.get("SEARCH_CATEGORY_BUDGET", 2)
+    pool = _search_pool(app.config.get("SEARCH_POOL_SIZE", 4))
+    started = time.perf_counter()
+    deadline = started + budget
+    futures = {
+        name: pool.submit(_timed_search, app, name, query, page, per_page, budget)
+        for name in names
+    }
+    outcomes = {}
+    for name, future in futures.items():
+        try:
+            outcomes[name] = future.result(
+                timeout=max(0, deadline - time.perf_counter())
+            )
+        except FuturesTimeout:
+            future.cancel()
+            app.logger.warning("search category %s exceeded %ss", name, budget)
+            outcomes[name] = (None, time.perf_counter() - started)
+        except Exception:
+            app.logger.exception("search category %s failed", name)
+            outcomes[name] = (None, time.perf_counter() - started)
+    return outcomes
+
+
+def _ranked(base_query, model, entity, query, fallback, fallback_order, tiebreak):
+    """Filter ``base_query`` to full-text matches ordered by relevance.
+
+    Without a usable index the ``ILIKE`` ``fallback`` filter and its own
+    ordering are applied instead.
+    """
+    hits = search_index.match(entity, query)
+    if hits is None:
+        return base_query.filter(fallback).order_by(*fallback_order)
+    return base_query.join(hits, hits.c.ref_id == model.id).order_by(
+        hits.c.rank.desc(), tiebreak
+    )
+
+
 def search_notes(query, page=1, per_page=20):
     """Búsqueda avanzada en apuntes"""
-    base_query = Note.query
+    base_query = Note.query.filter(Note.processing_status == "ready")
 
     # Búsqueda por contenido, título, tags
     search_filter = or_(
@@ -113,14 +186,15 @@ def search_notes(query, page=1, per_page=20):
     )
 
     # Ordenar por relevancia (título tiene mayor peso)
-    notes = (
-        base_query.filter(search_filter)
-        .order_by(
-            case((Note.title.ilike(f"%{query}%"), 1), else_=2),
-            desc(Note.created_at),
-        )
-        .paginate(page=page, per_page=per_page, error_out=False)
-    )
+    notes = _ranked(
+        base_query,
+        Note,
+        "note",
+        query,
+        search_filter,
+        (case((Note.title.ilike(f"%{query}%"), 1), else_=2), desc(Note.created_at)),
+        desc(Note.created_at),
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for note in notes.items:
@@ -157,11 +231,15 @@ def search_posts(query, page=1, per_page=20):
         Post.title.ilike(f"%{query}%") if hasattr(Post, "title") else False,
     )
 
-    posts = (
-        base_query.filter(search_filter)
-        .order_by(desc(Post.created_at))
-        .paginate(page=page, per_page=per_page, error_out=False)
-    )
+    posts = _ranked(
+        base_query,
+        Post,
+        "post",
+        query,
+        search_filter,
+        (desc(Post.created_at),),
+        desc(Post.created_at),
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for post in posts.items:
@@ -195,13 +273,15 @@ def search_users(query, page=1, per_page=20):
         User.username.ilike(f"%{query}%"), User.email.ilike(f"%{query}%")
     )
 
-    users = (
-        User.query.filter(User.activated.is_(True), search_filter)
-        .order_by(
-            case((User.username.ilike(f"{query}%"), 1), else_=2), desc(User.points)
-        )
-        .paginate(page=page, per_page=per_page, error_out=False)
-    )
+    users = _ranked(
+        User.query.filter(User.activated.is_(True)),
+        User,
+        "user",
+        query,
+        search_filter,
+        (case((User.username.ilike(f"{query}%"), 1), else_=2), desc(User.points)),
+        desc(User.points),
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for user in users.items:
@@ -232,20 +312,20 @@ def search_products(query, page=1, per_page=20):
         Product.name.ilike(f"%{query}%"), Product.description.ilike(f"%{query}%")
     )
 
-    products = (
-        Product.query.filter(
-            Product.is_approved.is_(True), Product.stock > 0, search_filter
-        )
-        .order_by(
-            case((Product.name.ilike(f"{query}%"), 1), else_=2),
-            (
-                desc(Product.popularity_score)
-                if hasattr(Product, "popularity_score")
-                else desc(Product.id)
-            ),
-        )
-        .paginate(page=page, per_page=per_page, error_out=False)
+    popularity = (
+        desc(Product.popularity_score)
+        if hasattr(Product, "popularity_score")
+        else desc(Product.id)
     )
+    products = _ranked(
+        Product.query.filter(Product.is_approved.is_(True), Product.stock > 0),
+        Product,
+        "product",
+        query,
+        search_filter,
+        (case((Product.name.ilike(f"{query}%"), 1), else_=2), popularity),
+        popularity,
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for product in products.items:
@@ -286,11 +366,15 @@ def search_courses(query, page=1, per_page=20):
         Course.category.ilike(f"%{query}%"),
     )
 
-    courses = (
-        Course.query.filter(search_filter)
-        .order_by(desc(Course.created_at))
-        .paginate(page=page, per_page=per_page, error_out=False)
-    )
+    courses = _ranked(
+        Course.query,
+        Course,
+        "course",
+        query,
+        search_filter,
+        (desc(Course.created_at),),
+        desc(Course.created_at),
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for course in courses.items:
@@ -315,15 +399,17 @@ def search_courses(query, page=1, per_page=20):
 
 def search_chats(query, page=1, per_page=20):
     """Búsqueda en mensajes de chat global"""
-    messages = (
+    messages = _ranked(
         Message.query.filter(
-            Message.is_global.is_(True),
-            Message.is_deleted.is_(False),
-            Message.content.ilike(f"%{query}%"),
-        )
-        .order_by(desc(Message.timestamp))
-        .paginate(page=page, per_page=per_page, error_out=False)
-    )
+            Message.is_global.is_(True), Message.is_deleted.is_(False)
+        ),
+        Message,
+        "chat",
+        query,
+        Message.content.ilike(f"%{query}%"),
+        (desc(Message.timestamp),),
+        desc(Message.timestamp),
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for msg in messages.items:
@@ -347,16 +433,18 @@ def search_chats(query, page=1, per_page=20):
 
 def search_missions(query, page=1, per_page=20):
     """Búsqueda en misiones"""
-    missions = (
-        Mission.query.filter(
-            or_(
-                Mission.description.ilike(f"%{query}%"),
-                Mission.code.ilike(f"%{query}%"),
-            )
-        )
-        .order_by(desc(Mission.credit_reward))
-        .paginate(page=page, per_page=per_page, error_out=False)
-    )
+    missions = _ranked(
+        Mission.query,
+        Mission,
+        "mission",
+        query,
+        or_(
+            Mission.description.ilike(f"%{query}%"),
+            Mission.code.ilike(f"%{query}%"),
+        ),
+        (desc(Mission.credit_reward),),
+        desc(Mission.credit_reward),
+    ).paginate(page=page, per_page=per_page, error_out=False)
 
     results = []
     for mission in missions.items:
@@ -375,6 +463,17 @@ def search_missions(query, page=1, per_page=20):
     return {"results": results, "total": missions.total, "pages": missions.pages}
 
 
+CATEGORY_SEARCHES = {
+    "notes": search_notes,
+    "posts": search_posts,
+    "users": search_users,
+    "products": search_products,
+    "courses": search_courses,
+    "chats": search_chats,
+    "missions": search_missions,
+}
+
+
 def get_search_suggestions():
     """Obtener sugerencias de búsqueda populares"""
     return [
@@ -398,7 +497,13 @@ def get_smart_suggestions(query):
     # Sugerencias basadas en tags populares
     if query:
         # Buscar tags similares
-        similar_notes = Note.query.filter(Note.tags.ilike(f"%{query}%")).limit(5).all()
+        similar_notes = (
+            Note.query.filter(
+                Note.processing_status == "ready", Note.tags.ilike(f"%{query}%")
+            )
+            .limit(5)
+            .all()
+        )
 
         for note in similar_notes:
             if note.tags:
@@ -411,14 +516,8 @@ def get_smart_suggestions(query):
 
 
 def get_trending_searches():
-    """Obtener búsquedas trending (simulado)"""
-    return [
-        {"query": "Cálculo diferencial", "count": 145},
-        {"query": "Programación Python", "count": 132},
-        {"query": "Historia del Perú", "count": 98},
-        {"query": "Química orgánica", "count": 87},
-        {"query": "Inglés básico", "count": 76},
-    ]
+    """Obtener las búsquedas más frecuentes de la ventana reciente"""
+    return trending.top(5)
 
 
 @search_bp.route("/suggestions")
@@ -430,70 +529,8 @@ def search_suggestions():
     if not query or len(query) < 2:
         return jsonify([])
 
-    # Combinar sugerencias de múltiples fuentes
-    suggestions = []
-
-    # Usuarios
-    users = (
-        User.query.filter(User.username.ilike(f"{query}%"), User.activated.is_(True))
-        .limit(3)
-        .all()
-    )
-
-    for user in users:
-        suggestions.append(
-            {
-                "text": user.username,
-                "type": "user",
-                "icon": "bi-person",
-                "url": f"/perfil/{user.username}",
-            }
-        )
-
-    # Notas por título
-    notes = Note.query.filter(Note.title.ilike(f"{query}%")).limit(3).all()
-
-    for note in notes:
-        suggestions.append(
-            {
-                "text": note.title,
-                "type": "note",
-                "icon": "bi-file-text",
-                "url": f"/notes/{note.id}",
-            }
-        )
-
-    # Tags populares
-    tags_notes = Note.query.filter(Note.tags.ilike(f"%{query}%")).limit(3).all()
-
-    for note in tags_notes:
-        if note.tags:
-            tags = [tag.strip() for tag in note.tags.split(",")]
-            for tag in tags:
-                if query.lower() in tag.lower() and tag not in [
-                    s["text"] for s in suggestions
-                ]:
-                    suggestions.append(
-                        {
-                            "text": tag,
-                            "type": "tag",
-                            "icon": "bi-tag",
-                            "url": f"/search?q={tag}",
-                        }
-                    )
-
-    # Cursos
-    courses = Course.query.filter(Course.title.ilike(f"{query}%")).limit(3).all()
-
-    for course in courses:
-        suggestions.append(
-            {
-                "text": course.title,
-                "type": "course",
-                "icon": "bi-play-circle",
-                "url": f"/cursos/{course.id}",
-            }
-        )
+    # Usuarios, títulos de apuntes, tags y cursos desde el índice en memoria
+    suggestions = autocomplete.suggest(query)
 
     return jsonify(suggestions[:10])
 
@@ -13,6 +13,7 @@ from crunevo.models.social import (
     MentorshipStatus,
     CompetitionStatus,
 )
+from crunevo.services import leaderboard
 from crunevo.services.crolars_integration import CrolarsIntegrationService
 from sqlalchemy import and_
 
@@ -340,62 +341,23 @@ def claim_challenge_reward(challenge_id):
 @login_required
 def leaderboards():
     """Leaderboards and rankings"""
-    # Get level leaderboard
-    level_leaderboard = (
-        User.query.filter(User.level > 0)
-        .order_by(User.level.desc(), User.forum_experience.desc())
-        .limit(10)
-        .all()
-    )
-
-    # Get reputation leaderboard
-    reputation_leaderboard = (
-        User.query.filter(User.reputation_score > 0)
-        .order_by(User.reputation_score.desc())
-        .limit(10)
-        .all()
-    )
-
-    # Get helpful answers leaderboard
-    helpful_answers_leaderboard = (
-        User.query.filter(User.helpful_answers_count > 0)
-        .order_by(User.helpful_answers_count.desc())
-        .limit(10)
-        .all()
-    )
-
-    # Get Crolars leaderboard
-    crolars_leaderboard = CrolarsIntegrationService.get_crolars_leaderboard(limit=10)
-
-    # Get current user's positions
-    user_level_rank = User.query.filter(User.level > current_user.level).count() + 1
-
-    user_reputation_rank = (
-        User.query.filter(User.reputation_score > current_user.reputation_score).count()
-        + 1
-    )
-
-    user_helpful_rank = (
-        User.query.filter(
-            User.helpful_answers_count > current_user.helpful_answers_count
-        ).count()
-        + 1
-    )
-
-    user_crolars_rank = (
-        User.query.filter(User.credits > current_user.credits).count() + 1
-    )
+    periodo = request.args.get("periodo")
+    window = {"semana": "week", "mes": "month"}.get(periodo)
+    if window is None:
+        periodo = None
 
+    # (user, score) pairs; in a period the score is what was gained in it
     return render_template(
         "social/leaderboards.html",
-        level_leaderboard=level_leaderboard,
-        reputation_leaderboard=reputation_leaderboard,
-        helpful_answers_leaderboard=helpful_answers_leaderboard,
-        crolars_leaderboard=crolars_leaderboard,
-        user_level_rank=user_level_rank,
-        user_reputation_rank=user_reputation_rank,
-        user_helpful_rank=user_helpful_rank,
-        user_crolars_rank=user_crolars_rank,
+        periodo=periodo,
+        level_leaders=leaderboard.top_scored("level", 10, window),
+        reputation_leaders=leaderboard.top_scored("reputation", 10, window),
+        helpful_leaders=leaderboard.top_scored("helpful", 10, window),
+        crolars_leaders=leaderboard.top_scored("credits", 10, window),
+        my_level_rank=leaderboard.rank("level", current_user.id, window),
+        my_reputation_rank=leaderboard.rank("reputation", current_user.id, window),
+        my_helpful_rank=leaderboard.rank("helpful", current_user.id, window),
+        my_crolars_rank=leaderboard.rank("credits", current_user.id, window),
     )
 
 
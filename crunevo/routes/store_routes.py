@@ -15,6 +15,7 @@ from datetime import datetime, timedelta
 from flask_login import current_user
 from flask import current_app
 from crunevo.utils.helpers import activated_required
+from crunevo.services.checkout import load_cart, place_order, reserve_stock
 from crunevo.extensions import db
 from crunevo.models import (
     Product,
@@ -227,28 +228,30 @@ def redeem_product(product_id):
     if product.price_credits is None:
         flash("Este producto no está disponible para canje", "warning")
         return redirect(url_for("store.view_product", product_id=product.id))
-    if product.stock < 1:
+    # take the unit in the database so a concurrent checkout cannot oversell
+    if not reserve_stock(db.session.connection(), {product_id: 1}):
+        db.session.rollback()
         flash("Producto sin stock", "danger")
-        return redirect(url_for("store.view_product", product_id=product.id))
+        return redirect(url_for("store.view_product", product_id=product_id))
     try:
         spend_credit(
             current_user,
             product.price_credits,
             CreditReasons.COMPRA,
-            related_id=product.id,
+            related_id=product_id,
         )
     except ValueError:
+        db.session.rollback()
         flash("Crolars insuficientes", "danger")
-        return redirect(url_for("store.view_product", product_id=product.id))
+        return redirect(url_for("store.view_product", product_id=product_id))
     purchase = Purchase(
         user_id=current_user.id,
-        product_id=product.id,
+        product_id=product_id,
         quantity=1,
         price_credits=product.price_credits,
     )
     db.session.add(purchase)
-    product.stock -= 1
-    db.session.add(ProductLog(product_id=product.id, action="redeem"))
+    db.session.add(ProductLog(product_id=product_id, action="redeem"))
     db.session.commit()
     flash("Producto canjeado", "success")
     return render_template(
@@ -260,23 +263,13 @@ def redeem_product(product_id):
 @activated_required
 def buy_product(product_id):
     product = Product.query.filter_by(id=product_id, is_official=True).first_or_404()
-    if product.stock < 1:
-        flash(f"Stock insuficiente para {product.name}", "danger")
-        return redirect(url_for("store.view_product", product_id=product.id))
-
-    purchase = Purchase(
-        user_id=current_user.id,
-        product_id=product.id,
-        quantity=1,
-        price_soles=product.price,
-        timestamp=datetime.utcnow(),
-    )
-    db.session.add(purchase)
-    product.stock -= 1
-    db.session.commit()
+    result = place_order(current_user.id, [(product, 1)])
+    if result.out_of_stock:
+        flash(f"Stock insuficiente para {result.out_of_stock[0]}", "danger")
+        return redirect(url_for("store.view_product", product_id=product_id))
     flash("Producto comprado exitosamente", "success")
     return render_template(
-        "store/checkout_success.html", download_url=product.download_url
+        "store/checkout_success.html", download_url=result.download_url
     )
 
 
@@ -343,14 +336,9 @@ def checkout():
         flash("Tu carrito está vacío", "warning")
         return redirect(url_for("store.view_cart"))
 
-    cart_items = []
-    total_soles = 0
-    for pid_str, qty in cart.items():
-        pid = int(pid_str)
-        product = Product.query.filter_by(id=pid, is_official=True).first()
-        if product:
-            cart_items.append({"product": product, "quantity": qty})
-            total_soles += float(product.price) * qty
+    items = load_cart(cart, official_only=True)
+    cart_items = [{"product": product, "quantity": qty} for product, qty in items]
+    total_soles = sum(float(product.price) * qty for product, qty in items)
 
     if request.method == "GET":
         return render_template(
@@ -359,41 +347,18 @@ def checkout():
             total_soles=total_soles,
         )
 
-    download_url = None
     shipping_option = request.form.get("shipping_option")
     shipping_address = None
     if shipping_option == "delivery":
         shipping_address = request.form.get("shipping_address")
     shipping_message = request.form.get("shipping_message")
-    purchases_created = []
-    for item in cart_items:
-        product = item["product"]
-        qty = item["quantity"]
-        if product.stock < qty:
-            flash(f"Stock insuficiente para {product.name}", "danger")
-            continue
-        purchase = Purchase(
-            user_id=current_user.id,
-            product_id=product.id,
-            quantity=qty,
-            price_soles=product.price,
-            shipping_address=shipping_address,
-            shipping_message=shipping_message,
-            timestamp=datetime.utcnow(),
-        )
-        db.session.add(purchase)
-        purchases_created.append(purchase)
-        product.stock -= qty
-        if qty == 1 and product.download_url and not download_url:
-            download_url = product.download_url
-
-    db.session.commit()
-    from crunevo.utils.invoice import generate_invoice
-
-    for purchase in purchases_created:
-        generate_invoice(purchase)
+    result = place_order(current_user.id, items, shipping_address, shipping_message)
+    for name in result.out_of_stock:
+        flash(f"Stock insuficiente para {name}", "danger")
     session.pop("cart", None)
-    return render_template("store/checkout_success.html", download_url=download_url)
+    return render_template(
+        "store/checkout_success.html", download_url=result.download_url
+    )
 
 
 @store_bp.route("/favorite/<int:product_id>", methods=["POST"])
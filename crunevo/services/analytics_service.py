@@ -1,29 +1,187 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
-from sqlalchemy import and_
+from sqlalchemy import and_, case, event, func
+from sqlalchemy.orm import Session
+from crunevo.extensions import db
 from crunevo.models import PersonalSpaceBlock
+from crunevo.services.cache_service import (
+    CacheInvalidator,
+    CacheService,
+    get_or_set_cache,
+)
+
+
+def _json_flag(key: str):
+    """``metadata[key]`` as a boolean, NULL when missing."""
+    value = PersonalSpaceBlock.metadata_json[key]
+    if db.engine.dialect.name == "postgresql":
+        return value.as_string().in_(("true", "t", "1", "yes"))
+    return value.as_boolean()
+
+
+def _json_number(key: str):
+    """``metadata[key]`` as a number, NULL when missing or not numeric."""
+    value = PersonalSpaceBlock.metadata_json[key]
+    if db.engine.dialect.name == "postgresql":
+        text = value.as_string()
+        return case(
+            (text.op("~")(r"^-?[0-9]+(\.[0-9]+)?$"), text.cast(db.Float)),
+            else_=None,
+        )
+    return value.as_float()
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
 
 
 class AnalyticsService:
     """Service for generating analytics and productivity metrics."""
 
+    @staticmethod
+    def get_block_summary(user_id: int) -> Dict[str, Any]:
+        """Aggregates behind the dashboard, memoized per user.
+
+        Type counts, completed tasks, objective progress and the weekly
+        activity all come from one GROUP BY over the user's blocks, with
+        ``metadata`` read through JSON path expressions instead of loading
+        every block. The cached value is invalidated, by bumping the user's
+        cache generation, whenever one of their blocks is committed (see
+        ``init_app``).
+        """
+        return get_or_set_cache(
+            CacheService.get_dashboard_cache_key(user_id),
+            lambda: AnalyticsService._build_block_summary(user_id),
+            CacheService.DASHBOARD_TTL,
+            tags=[CacheService.user_tag(user_id)],
+        )
+
+    @staticmethod
+    def blocks_changed(user_id: int) -> None:
+        """Invalidate the summary on commit; for bulk updates that skip the ORM."""
+        db.session.info.setdefault("block_summary_users", set()).add(user_id)
+
+    @staticmethod
+    def _build_block_summary(user_id: int) -> Dict[str, Any]:
+        block = PersonalSpaceBlock
+        now = datetime.utcnow()
+        week_ago = now - timedelta(days=7)
+        two_weeks_ago = now - timedelta(days=14)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+
+        active = block.status == "active"
+        columns = [
+            block.type,
+            _count_if(active).label("active"),
+            _count_if(and_(active, _json_flag("completed"))).label("completed"),
+            func.coalesce(
+                func.sum(case((active, func.coalesce(_json_number("progress"), 0)))),
+                0,
+            ).label("progress"),
+            _count_if(and_(active, block.updated_at >= week_ago)).label("recent"),
+            _count_if(block.updated_at >= week_ago).label("current_week"),
+            _count_if(
+                and_(block.updated_at >= two_weeks_ago, block.updated_at < week_ago)
+            ).label("previous_week"),
+        ]
+        columns += [
+            _count_if(
+                and_(block.updated_at >= day, block.updated_at < day + timedelta(1))
+            ).label(f"day{i}")
+            for i, day in enumerate(days)
+        ]
+        rows = (
+            db.session.query(*columns)
+            .filter(block.user_id == user_id)
+            .group_by(block.type)
+            .all()
+        )
+
+        types = {}
+        weekly = [0] * len(days)
+        current_week = previous_week = 0
+        for row in rows:
+            current_week += row.current_week
+            previous_week += row.previous_week
+            for i in range(len(days)):
+                weekly[i] += getattr(row, f"day{i}")
+            if row.active:
+                types[row.type] = {
+                    "active": int(row.active),
+                    "completed": int(row.completed),
+                    "progress": float(row.progress),
+                    "recent": int(row.recent),
+                }
+
+        objectives = [
+            {
+                "id": obj_id,
+                "title": title,
+                "progress": progress if progress is not None else 0,
+                "status": status or "no_iniciada",
+            }
+            for obj_id, title, progress, status in db.session.query(
+                block.id,
+                block.title,
+                _json_number("progress"),
+                block.metadata_json["status"].as_string(),
+            )
+            .filter(block.user_id == user_id, block.type == "objetivo", active)
+            .order_by(block.created_at)
+        ]
+
+        recent_completions = [
+            {
+                "id": task_id,
+                "title": title,
+                "completed_at": updated_at.isoformat(),
+            }
+            for task_id, title, updated_at, completed in db.session.query(
+                block.id, block.title, block.updated_at, _json_flag("completed")
+            )
+            .filter(
+                block.user_id == user_id,
+                block.type == "tarea",
+                block.updated_at >= week_ago,
+            )
+            .order_by(block.updated_at.desc())
+            .limit(10)
+            if completed
+        ]
+
+        return {
+            "types": types,
+            "total_active": sum(t["active"] for t in types.values()),
+            "weekly_activity": [
+                {
+                    "date": day.strftime("%Y-%m-%d"),
+                    "day": day.strftime("%A"),
+                    "blocks_updated": int(count),
+                }
+                for day, count in zip(days, weekly)
+            ],
+            "current_week": int(current_week),
+            "previous_week": int(previous_week),
+            "objectives": objectives,
+            "recent_completions": recent_completions,
+            "computed_at": now.isoformat(),
+        }
+
     @staticmethod
     def get_dashboard_metrics(user_id: int) -> Dict[str, Any]:
         """Get comprehensive dashboard metrics for a user."""
-        blocks = PersonalSpaceBlock.query.filter_by(
-            user_id=user_id, status="active"
-        ).all()
+        summary = AnalyticsService.get_block_summary(user_id)
+        tasks = summary["types"].get("tarea", {})
+        objectives = summary["types"].get("objetivo", {})
 
         # Basic counts
-        total_blocks = len(blocks)
-        active_objectives = len([b for b in blocks if b.type == "objetivo"])
+        total_blocks = summary["total_active"]
+        active_objectives = objectives.get("active", 0)
 
         # Task metrics
-        task_blocks = [b for b in blocks if b.type == "tarea"]
-        completed_tasks = sum(
-            1 for b in task_blocks if (b.metadata_json or {}).get("completed")
-        )
-        pending_tasks = len(task_blocks) - completed_tasks
+        completed_tasks = tasks.get("completed", 0)
+        pending_tasks = tasks.get("active", 0) - completed_tasks
 
         # Productivity score calculation
         productivity_score = AnalyticsService._calculate_productivity_score(user_id)
@@ -38,57 +196,39 @@ class AnalyticsService:
             "active_objectives": active_objectives,
             "productivity_score": productivity_score,
             "trends": trends,
-            "last_updated": datetime.utcnow().isoformat(),
+            "last_updated": summary["computed_at"],
         }
 
     @staticmethod
     def get_productivity_metrics(user_id: int) -> Dict[str, Any]:
         """Get detailed productivity metrics."""
-        blocks = PersonalSpaceBlock.query.filter_by(
-            user_id=user_id, status="active"
-        ).all()
-
-        # Task completion analysis
-        task_blocks = [b for b in blocks if b.type == "tarea"]
-        completed_tasks = [
-            b for b in task_blocks if (b.metadata_json or {}).get("completed")
-        ]
+        summary = AnalyticsService.get_block_summary(user_id)
+        tasks = summary["types"].get("tarea", {})
+        total_tasks = tasks.get("active", 0)
+        completed_tasks = tasks.get("completed", 0)
 
         # Objective progress analysis
-        objective_blocks = [b for b in blocks if b.type == "objetivo"]
-        objective_progress = []
-        for obj in objective_blocks:
-            progress = (obj.metadata_json or {}).get("progress", 0)
-            objective_progress.append(
-                {
-                    "id": obj.id,
-                    "title": obj.title,
-                    "progress": progress,
-                    "status": (obj.metadata_json or {}).get("status", "no_iniciada"),
-                }
-            )
-
-        # Weekly activity
-        weekly_activity = AnalyticsService._get_weekly_activity(user_id)
+        objective_progress = summary["objectives"]
 
         # Block type distribution
-        type_distribution = {}
-        for block in blocks:
-            type_distribution[block.type] = type_distribution.get(block.type, 0) + 1
+        type_distribution = {
+            block_type: counts["active"]
+            for block_type, counts in summary["types"].items()
+        }
 
         return {
             "task_completion": {
-                "total_tasks": len(task_blocks),
-                "completed_tasks": len(completed_tasks),
+                "total_tasks": total_tasks,
+                "completed_tasks": completed_tasks,
                 "completion_rate": (
-                    round((len(completed_tasks) / len(task_blocks)) * 100, 1)
-                    if task_blocks
+                    round((completed_tasks / total_tasks) * 100, 1)
+                    if total_tasks
                     else 0
                 ),
-                "recent_completions": AnalyticsService._get_recent_completions(user_id),
+                "recent_completions": summary["recent_completions"],
             },
             "objective_progress": {
-                "total_objectives": len(objective_blocks),
+                "total_objectives": len(objective_progress),
                 "objectives": objective_progress,
                 "average_progress": (
                     round(
@@ -100,7 +240,7 @@ class AnalyticsService:
                     else 0
                 ),
             },
-            "weekly_activity": weekly_activity,
+            "weekly_activity": summary["weekly_activity"],
             "block_distribution": type_distribution,
             "productivity_trends": AnalyticsService._get_productivity_trends(user_id),
         }
@@ -149,46 +289,38 @@ class AnalyticsService:
     @staticmethod
     def _calculate_productivity_score(user_id: int) -> int:
         """Calculate a productivity score based on various factors."""
-        blocks = PersonalSpaceBlock.query.filter_by(
-            user_id=user_id, status="active"
-        ).all()
-
-        if not blocks:
+        summary = AnalyticsService.get_block_summary(user_id)
+        total = summary["total_active"]
+        if not total:
             return 0
 
         score = 0
         total_weight = 0
 
         # Task completion weight: 40%
-        task_blocks = [b for b in blocks if b.type == "tarea"]
-        if task_blocks:
-            completed_tasks = sum(
-                1 for b in task_blocks if (b.metadata_json or {}).get("completed")
-            )
-            task_score = (completed_tasks / len(task_blocks)) * 40
+        tasks = summary["types"].get("tarea")
+        if tasks:
+            task_score = (tasks["completed"] / tasks["active"]) * 40
             score += task_score
             total_weight += 40
 
         # Objective progress weight: 30%
-        objective_blocks = [b for b in blocks if b.type == "objetivo"]
-        if objective_blocks:
-            avg_progress = sum(
-                (b.metadata_json or {}).get("progress", 0) for b in objective_blocks
-            ) / len(objective_blocks)
+        objectives = summary["types"].get("objetivo")
+        if objectives:
+            avg_progress = objectives["progress"] / objectives["active"]
             objective_score = (avg_progress / 100) * 30
             score += objective_score
             total_weight += 30
 
         # Recent activity weight: 20%
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_blocks = [b for b in blocks if b.updated_at >= week_ago]
-        activity_score = min((len(recent_blocks) / len(blocks)) * 20, 20)
+        recent = sum(t["recent"] for t in summary["types"].values())
+        activity_score = min((recent / total) * 20, 20)
         score += activity_score
         total_weight += 20
 
         # Block organization weight: 10%
         organization_score = min(
-            (len(blocks) / 10) * 10, 10
+            (total / 10) * 10, 10
         )  # Max 10 points for having blocks
         score += organization_score
         total_weight += 10
@@ -198,26 +330,9 @@ class AnalyticsService:
     @staticmethod
     def _calculate_trends(user_id: int) -> Dict[str, float]:
         """Calculate trends comparing current week with previous week."""
-        now = datetime.utcnow()
-        week_ago = now - timedelta(days=7)
-        two_weeks_ago = now - timedelta(days=14)
-
-        # Current week data
-        current_blocks = PersonalSpaceBlock.query.filter(
-            and_(
-                PersonalSpaceBlock.user_id == user_id,
-                PersonalSpaceBlock.updated_at >= week_ago,
-            )
-        ).count()
-
-        # Previous week data
-        previous_blocks = PersonalSpaceBlock.query.filter(
-            and_(
-                PersonalSpaceBlock.user_id == user_id,
-                PersonalSpaceBlock.updated_at >= two_weeks_ago,
-                PersonalSpaceBlock.updated_at < week_ago,
-            )
-        ).count()
+        summary = AnalyticsService.get_block_summary(user_id)
+        current_blocks = summary["current_week"]
+        previous_blocks = summary["previous_week"]
 
         # Calculate trends
         blocks_trend = (
@@ -236,60 +351,12 @@ class AnalyticsService:
     @staticmethod
     def _get_weekly_activity(user_id: int) -> List[Dict[str, Any]]:
         """Get activity data for the past 7 days."""
-        activity = []
-        for i in range(7):
-            date = datetime.utcnow() - timedelta(days=i)
-            day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-
-            blocks_updated = PersonalSpaceBlock.query.filter(
-                and_(
-                    PersonalSpaceBlock.user_id == user_id,
-                    PersonalSpaceBlock.updated_at >= day_start,
-                    PersonalSpaceBlock.updated_at < day_end,
-                )
-            ).count()
-
-            activity.append(
-                {
-                    "date": day_start.strftime("%Y-%m-%d"),
-                    "day": day_start.strftime("%A"),
-                    "blocks_updated": blocks_updated,
-                }
-            )
-
-        return list(reversed(activity))
+        return AnalyticsService.get_block_summary(user_id)["weekly_activity"]
 
     @staticmethod
     def _get_recent_completions(user_id: int) -> List[Dict[str, Any]]:
         """Get recently completed tasks."""
-        week_ago = datetime.utcnow() - timedelta(days=7)
-
-        recent_tasks = (
-            PersonalSpaceBlock.query.filter(
-                and_(
-                    PersonalSpaceBlock.user_id == user_id,
-                    PersonalSpaceBlock.type == "tarea",
-                    PersonalSpaceBlock.updated_at >= week_ago,
-                )
-            )
-            .order_by(PersonalSpaceBlock.updated_at.desc())
-            .limit(10)
-            .all()
-        )
-
-        completions = []
-        for task in recent_tasks:
-            if (task.metadata_json or {}).get("completed"):
-                completions.append(
-                    {
-                        "id": task.id,
-                        "title": task.title,
-                        "completed_at": task.updated_at.isoformat(),
-                    }
-                )
-
-        return completions
+        return AnalyticsService.get_block_summary(user_id)["recent_completions"]
 
     @staticmethod
     def _get_productivity_trends(user_id: int) -> Dict[str, Any]:
@@ -351,3 +418,36 @@ class AnalyticsService:
             )
 
         return list(reversed(monthly_data))
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    users = {
+        obj.user_id
+        for obj in session.new | session.dirty | session.deleted
+        if isinstance(obj, PersonalSpaceBlock)
+    }
+    if users:
+        session.info.setdefault("block_summary_users", set()).update(users)
+
+
+def _after_commit(session) -> None:
+    for user_id in session.info.pop("block_summary_users", ()):
+        CacheInvalidator.on_block_change(user_id)
+
+
+def _after_rollback(session, previous_transaction) -> None:
+    session.info.pop("block_summary_users", None)
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Invalidate a user's block caches when their blocks are committed."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,510 @@
+"""In-memory prefix index behind the search autocomplete.
+
+Usernames, note titles, note tags and course titles are kept in one
+``PrefixIndex`` (a trie) per kind. Every trie node caches the ``TOP_K`` most
+popular items below it, so a keystroke lookup is a walk down the typed
+prefix without touching the database.
+
+The index lives in ``app.extensions["autocomplete"]``. It is built lazily on
+first use (from the ``flask autocomplete-rebuild`` snapshot when one is fresh,
+otherwise from the database) and kept current from committed session changes.
+After ``AUTOCOMPLETE_MAX_AGE`` seconds it is rebuilt in the background so the
+writes of other processes show up too.
+"""
+
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Iterable, Optional
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from crunevo.extensions import db
+
+log = logging.getLogger(__name__)
+
+TOP_K = 10  # suggestions cached per trie node
+MAX_DEPTH = 32  # indexed prefix length; longer queries filter the subtree
+MAX_ITEMS = 50_000  # per kind
+
+KINDS = ("user", "note", "tag", "course")
+ICONS = {
+    "user": "bi-person",
+    "note": "bi-file-text",
+    "tag": "bi-tag",
+    "course": "bi-play-circle",
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so "Cálculo" and "calc" match."""
+    decomposed = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+class _Node:
+    __slots__ = ("children", "keys", "top", "stale", "size")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.keys: set = set()  # items whose indexed prefix ends here
+        self.top: list[tuple[float, object]] = []  # (score, key), best first
+        self.stale = False
+        self.size = 0  # items in this subtree
+
+
+class PrefixIndex:
+    """Trie of ``key -> (text, score)`` answering top-k prefix lookups.
+
+    Adding an item or raising its score updates the cached ``top`` lists on
+    its path in place; removals and score drops only mark the affected nodes
+    stale, and those are recomputed from their subtree on the next lookup.
+    """
+
+    def __init__(
+        self, top_k: int = TOP_K, max_depth: int = MAX_DEPTH, max_items=MAX_ITEMS
+    ):
+        self.top_k = top_k
+        self.max_depth = max_depth
+        self.max_items = max_items
+        self.root = _Node()
+        self.items: dict = {}  # key -> (normalized text, text, score)
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _path(self, norm: str) -> Iterable[_Node]:
+        node = self.root
+        for ch in norm[: self.max_depth]:
+            node = node.children[ch]
+            yield node
+
+    def add(self, key, text: str, score: float) -> bool:
+        """Insert or update ``key``; return False when the index is full."""
+        norm = normalize(text or "")
+        old = self.items.get(key)
+        if old is not None and old[0] == norm:
+            self.items[key] = (norm, text, score)
+            for node in self._path(norm):
+                self._rescore(node, key, old[2], score)
+            return True
+        if old is not None:
+            self.remove(key)
+        if not norm:
+            return True
+        if len(self.items) >= self.max_items:
+            self.dropped += 1
+            return False
+        self.items[key] = (norm, text, score)
+        node = self.root
+        for ch in norm[: self.max_depth]:
+            node = node.children.setdefault(ch, _Node())
+            node.size += 1
+            if not node.stale:
+                self._offer(node, key, score)
+        node.keys.add(key)
+        return True
+
+    def remove(self, key) -> None:
+        old = self.items.pop(key, None)
+        if old is None:
+            return
+        path = list(self._path(old[0]))
+        path[-1].keys.discard(key)
+        parent = self.root
+        for node, ch in zip(path, old[0]):
+            node.size -= 1
+            if node.size == 0:
+                del parent.children[ch]
+                break
+            entries = [entry for entry in node.top if entry[1] != key]
+            if len(entries) != len(node.top):
+                node.top = entries
+                node.stale = node.stale or node.size > len(entries)
+            parent = node
+
+    def lookup(self, prefix: str, limit: int = TOP_K) -> list[tuple]:
+        """Return ``(key, text, score)`` of the best items starting with ``prefix``."""
+        norm = normalize(prefix)
+        if not norm:
+            return []
+        node = self.root
+        for ch in norm[: self.max_depth]:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        if len(norm) > self.max_depth:
+            ranked = heapq.nsmallest(
+                limit,
+                (
+                    (-score, key)
+                    for key, (text, _, score) in self._subtree(node)
+                    if text.startswith(norm)
+                ),
+            )
+            top = [(-neg, key) for neg, key in ranked]
+        else:
+            if node.stale:
+                self._refresh(node)
+            top = node.top
+        return [(key, self.items[key][1], score) for score, key in top[:limit]]
+
+    def _subtree(self, node: _Node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for key in current.keys:
+                yield key, self.items[key]
+            stack.extend(current.children.values())
+
+    def _refresh(self, node: _Node) -> None:
+        ranked = heapq.nsmallest(
+            self.top_k,
+            ((-item[2], key) for key, item in self._subtree(node)),
+        )
+        node.top = [(-neg, key) for neg, key in ranked]
+        node.stale = False
+
+    def _offer(self, node: _Node, key, score: float) -> None:
+        top = node.top
+        if len(top) >= self.top_k and (-score, key) >= (-top[-1][0], top[-1][1]):
+            return
+        top.append((score, key))
+        top.sort(key=lambda entry: (-entry[0], entry[1]))
+        del top[self.top_k :]
+
+    def _rescore(self, node: _Node, key, old: float, new: float) -> None:
+        if node.stale:
+            return
+        entries = [entry for entry in node.top if entry[1] != key]
+        if len(entries) == len(node.top):
+            self._offer(node, key, new)
+            return
+        node.top = entries
+        if new >= old or node.size <= self.top_k:
+            self._offer(node, key, new)
+        else:
+            # an item outside the cached top may now rank higher
+            node.stale = True
+
+
+class Autocomplete:
+    """Per-kind prefix indexes plus the display data of each suggestion."""
+
+    def __init__(self, max_items: int = MAX_ITEMS):
+        self.indexes = {kind: PrefixIndex(max_items=max_items) for kind in KINDS}
+        self.urls: dict = {}
+        self.tag_counts: Counter = Counter()
+        self.built_at = time.time()
+        self.lock = threading.RLock()
+
+    def put(self, kind: str, ref, text: str, score: float, url: str) -> None:
+        with self.lock:
+            if self.indexes[kind].add(ref, text, score):
+                self.urls[(kind, ref)] = url
+
+    def drop(self, kind: str, ref) -> None:
+        with self.lock:
+            self.indexes[kind].remove(ref)
+            self.urls.pop((kind, ref), None)
+
+    def count_tags(self, added: Iterable[str], removed: Iterable[str]) -> None:
+        with self.lock:
+            for tag in removed:
+                self.tag_counts[tag] -= 1
+            for tag in added:
+                self.tag_counts[tag] += 1
+            for tag in set(added) | set(removed):
+                count = self.tag_counts[tag]
+                if count > 0:
+                    self.put("tag", normalize(tag), tag, count, _tag_url(tag))
+                else:
+                    del self.tag_counts[tag]
+                    self.drop("tag", normalize(tag))
+
+    def suggest(self, prefix: str, per_kind: int = 3, kinds=KINDS) -> list[dict]:
+        results = []
+        with self.lock:
+            for kind in kinds:
+                for ref, text, _ in self.indexes[kind].lookup(prefix, per_kind):
+                    results.append(
+                        {
+                            "text": text,
+                            "type": kind,
+                            "icon": ICONS[kind],
+                            "url": self.urls[(kind, ref)],
+                        }
+                    )
+        return results
+
+    def entries(self) -> list[list]:
+        with self.lock:
+            return [
+                [kind, ref, text, score, self.urls[(kind, ref)]]
+                for kind, index in self.indexes.items()
+                for ref, (_, text, score) in index.items.items()
+            ]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "items": {kind: len(index) for kind, index in self.indexes.items()},
+                "dropped": sum(index.dropped for index in self.indexes.values()),
+                "age": time.time() - self.built_at,
+            }
+
+
+def _split_tags(tags: Optional[str]) -> list[str]:
+    return [t.strip() for t in (tags or "").split(",") if t.strip()]
+
+
+def _tag_url(tag: str) -> str:
+    return f"/search?q={tag}"
+
+
+def _user_entry(user):
+    return "user", user.id, user.username, user.points or 0, f"/perfil/{user.username}"
+
+
+def _note_entry(note):
+    score = (note.downloads or 0) + (note.likes or 0)
+    return "note", note.id, note.title, score, f"/notes/{note.id}"
+
+
+def _course_entry(course):
+    return "course", course.id, course.title, course.views or 0, f"/cursos/{course.id}"
+
+
+def build(max_items: int = MAX_ITEMS) -> Autocomplete:
+    """Load the most popular rows of every kind from the database."""
+    from crunevo.models import Course, Note, User
+
+    ac = Autocomplete(max_items)
+    users = (
+        User.query.filter(User.activated.is_(True))
+        .order_by(User.points.desc())
+        .limit(max_items)
+    )
+    notes = (
+        Note.query.filter(Note.processing_status == "ready")
+        .order_by((Note.downloads + Note.likes).desc())
+        .limit(max_items)
+    )
+    courses = Course.query.order_by(Course.views.desc()).limit(max_items)
+    for entry in map(_user_entry, users):
+        ac.put(*entry)
+    for entry in map(_note_entry, notes):
+        ac.put(*entry)
+    for entry in map(_course_entry, courses):
+        ac.put(*entry)
+
+    counts = Counter()
+    for (tags,) in db.session.query(Note.tags).filter(Note.tags.isnot(None)):
+        counts.update(_split_tags(tags))
+    for tag, count in counts.most_common(max_items):
+        ac.tag_counts[tag] = count
+        ac.put("tag", normalize(tag), tag, count, _tag_url(tag))
+    return ac
+
+
+def _snapshot_path(app) -> Optional[str]:
+    if app.testing:
+        return None
+    return app.config.get("AUTOCOMPLETE_SNAPSHOT")
+
+
+def save_snapshot(ac: Autocomplete, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"built_at": ac.built_at, "entries": ac.entries()}, fh)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str, max_age: float) -> Optional[Autocomplete]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if time.time() - data["built_at"] > max_age:
+        return None
+    ac = Autocomplete()
+    for kind, ref, text, score, url in data["entries"]:
+        ac.put(kind, ref, text, score, url)
+        if kind == "tag":
+            ac.tag_counts[text] = score
+    ac.built_at = data["built_at"]
+    return ac
+
+
+def rebuild(app=None) -> Autocomplete:
+    """Rebuild the index from the database and store it with its snapshot."""
+    app = app or current_app._get_current_object()
+    ac = build(app.config.get("AUTOCOMPLETE_MAX_ITEMS", MAX_ITEMS))
+    app.extensions["autocomplete"] = ac
+    path = _snapshot_path(app)
+    if path:
+        try:
+            save_snapshot(ac, path)
+        except OSError:
+            log.warning("could not write the autocomplete snapshot", exc_info=True)
+    return ac
+
+
+def _rebuild_in_background(app) -> None:
+    with app.app_context():
+        try:
+            rebuild(app)
+        except Exception:
+            log.exception("autocomplete rebuild failed")
+        finally:
+            app.extensions.pop("autocomplete_rebuilding", None)
+
+
+def get_index() -> Autocomplete:
+    """Return the app's index, loading it on first use."""
+    app = current_app._get_current_object()
+    ac = app.extensions.get("autocomplete")
+    max_age = app.config.get("AUTOCOMPLETE_MAX_AGE", 900)
+    if ac is None:
+        path = _snapshot_path(app)
+        ac = (path and load_snapshot(path, max_age)) or build(
+            app.config.get("AUTOCOMPLETE_MAX_ITEMS", MAX_ITEMS)
+        )
+        app.extensions["autocomplete"] = ac
+    elif time.time() - ac.built_at > max_age and not app.extensions.get(
+        "autocomplete_rebuilding"
+    ):
+        app.extensions["autocomplete_rebuilding"] = True
+        threading.Thread(
+            target=_rebuild_in_background, args=(app,), daemon=True
+        ).start()
+    return ac
+
+
+def suggest(prefix: str, per_kind: int = 3, kinds=KINDS) -> list[dict]:
+    return get_index().suggest(prefix, per_kind, kinds)
+
+
+# -- incremental refresh from committed changes --------------------------------
+
+
+def _stored_tags(session, note) -> list[str]:
+    """Tags of ``note`` as currently stored, read without an autoflush."""
+    from crunevo.models import Note
+
+    history = inspect(note).attrs.tags.history
+    if history.deleted:
+        return _split_tags(history.deleted[0])
+    if not history.has_changes() and "tags" in inspect(note).dict:
+        return _split_tags(note.tags)
+    return _split_tags(
+        session.connection()
+        .execute(select(Note.tags).where(Note.id == note.id))
+        .scalar()
+    )
+
+
+def _tag_changes(session) -> list[tuple]:
+    # runs before the flush so the previous tags can still be read back
+    from crunevo.models import Note
+
+    ops = []
+    for obj in session.new:
+        if isinstance(obj, Note):
+            ops.append(("tags", _split_tags(obj.tags), []))
+    for obj in session.dirty:
+        if isinstance(obj, Note) and inspect(obj).attrs.tags.history.has_changes():
+            ops.append(("tags", _split_tags(obj.tags), _stored_tags(session, obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Note):
+            ops.append(("tags", [], _stored_tags(session, obj)))
+    return ops
+
+
+def _changes(session) -> list[tuple]:
+    from crunevo.models import Course, Note, User
+
+    ops = []
+    for obj in session.new | session.dirty:
+        if isinstance(obj, User):
+            if obj.activated:
+                ops.append(("put", _user_entry(obj)))
+            else:
+                ops.append(("drop", ("user", obj.id)))
+        elif isinstance(obj, Note):
+            # notes still being processed (or failed) are not suggested
+            if obj.processing_status == "ready":
+                ops.append(("put", _note_entry(obj)))
+            else:
+                ops.append(("drop", ("note", obj.id)))
+        elif isinstance(obj, Course):
+            ops.append(("put", _course_entry(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            ops.append(("drop", ("user", obj.id)))
+        elif isinstance(obj, Note):
+            ops.append(("drop", ("note", obj.id)))
+        elif isinstance(obj, Course):
+            ops.append(("drop", ("course", obj.id)))
+    return ops
+
+
+def _record(session, ops) -> None:
+    if ops:
+        session.info.setdefault("autocomplete_ops", []).extend(ops)
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    _record(session, _tag_changes(session))
+
+
+def _after_flush(session, flush_context) -> None:
+    _record(session, _changes(session))
+
+
+def _after_commit(session) -> None:
+    ops = session.info.pop("autocomplete_ops", None)
+    if not ops:
+        return
+    try:
+        ac = current_app.extensions.get("autocomplete")
+    except RuntimeError:  # committed outside an app context
+        return
+    if ac is None:
+        return
+    for op, *args in ops:
+        if op == "put":
+            ac.put(*args[0])
+        elif op == "drop":
+            ac.drop(*args[0])
+        else:
+            ac.count_tags(*args)
+
+
+def _after_rollback(session, previous_transaction) -> None:
+    session.info.pop("autocomplete_ops", None)
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Register the session hooks that keep loaded indexes current."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -0,0 +1,300 @@
+"""Rule index for forum badges.
+
+Every active ``ForumBadge`` is compiled once into a ``Rule`` and indexed by
+the user stats its ``requirements`` mention, so a forum action only evaluates
+the badges that depend on the stats it changed. The badges a user already
+holds are kept per process as a bitset (bit ``badge_id``), so the common case
+of nothing new to award costs no queries at all.
+
+Both are kept current by session hooks: committing a ``ForumBadge`` change
+drops the compiled rules, and committing a ``UserBadge`` updates its owner's
+bitset. Changes made by other processes are picked up after ``RULES_TTL``
+seconds, and a badge is always confirmed against ``user_badges`` before it
+is inserted.
+
+``backfill`` is the bulk mode: it awards a badge to every qualifying user
+with one ``INSERT ... SELECT`` and pays the rewards with one ``UPDATE``.
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Iterable, NamedTuple, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, event, exists, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from crunevo.extensions import db
+from crunevo.models.badge import ForumBadge, UserBadge
+from crunevo.models.user import User
+from crunevo.services import leaderboard
+
+RULES_TTL = 300
+MAX_USERS = 10_000
+# experience needed for forum levels 2..10, as in User.calculate_forum_level
+LEVEL_THRESHOLDS = (100, 300, 600, 1000, 1500, 2500, 4000, 6000, 9000)
+# stats that change as a side effect of awarding experience
+PROGRESS_STATS = ("forum_experience", "forum_level")
+
+
+class Rule(NamedTuple):
+    badge_id: int
+    name: str
+    requirements: dict
+    points: int
+
+    def matches(self, user) -> bool:
+        return all(
+            (getattr(user, stat, 0) or 0) >= value
+            for stat, value in self.requirements.items()
+        )
+
+
+class BadgeRules:
+    """Compiled rules plus the earned-badge bitsets of recent users."""
+
+    def __init__(self, badges: Iterable[ForumBadge]):
+        self.rules: dict[int, Rule] = {}
+        self.by_stat: dict[str, list[Rule]] = defaultdict(list)
+        for badge in badges:
+            requirements = badge.requirements or {}
+            # a requirement on something that is not a user stat never holds
+            if not requirements or not all(
+                stat in User.__table__.c for stat in requirements
+            ):
+                continue
+            rule = Rule(badge.id, badge.name, dict(requirements), badge.points_reward)
+            self.rules[badge.id] = rule
+            for stat in requirements:
+                self.by_stat[stat].append(rule)
+        self.loaded_at = time.monotonic()
+        self._earned: OrderedDict[int, tuple[float, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > RULES_TTL
+
+    def candidates(self, stats: Optional[Iterable[str]] = None) -> list[Rule]:
+        if stats is None:
+            return list(self.rules.values())
+        found: dict[int, Rule] = {}
+        for stat in stats:
+            for rule in self.by_stat.get(stat, ()):
+                found[rule.badge_id] = rule
+        return list(found.values())
+
+    def earned(self, user_id: int) -> int:
+        with self._lock:
+            entry = self._earned.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] <= RULES_TTL:
+                self._earned.move_to_end(user_id)
+                return entry[1]
+        bits = 0
+        for (badge_id,) in db.session.query(UserBadge.badge_id).filter_by(
+            user_id=user_id
+        ):
+            bits |= 1 << badge_id
+        self._store(user_id, bits)
+        return bits
+
+    def _store(self, user_id: int, bits: int) -> None:
+        with self._lock:
+            self._earned[user_id] = (time.monotonic(), bits)
+            self._earned.move_to_end(user_id)
+            while len(self._earned) > MAX_USERS:
+                self._earned.popitem(last=False)
+
+    def mark_earned(self, user_id: int, badge_id: int) -> None:
+        with self._lock:
+            entry = self._earned.get(user_id)
+            if entry is not None:
+                self._earned[user_id] = (entry[0], entry[1] | 1 << badge_id)
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._earned.pop(user_id, None)
+
+
+def get_rules(app=None) -> BadgeRules:
+    app = app or current_app._get_current_object()
+    rules = app.extensions.get("badge_rules")
+    if rules is None or rules.expired():
+        rules = app.extensions["badge_rules"] = BadgeRules(
+            ForumBadge.query.filter_by(is_active=True).all()
+        )
+    return rules
+
+
+def evaluate(user, stats: Optional[Iterable[str]] = None) -> list[Rule]:
+    """Unearned badges depending on ``stats`` (all when None) the user meets."""
+    rules = get_rules()
+    earned = rules.earned(user.id)
+    return [
+        rule
+        for rule in rules.candidates(stats)
+        if not earned >> rule.badge_id & 1 and rule.matches(user)
+    ]
+
+
+def award(user, stats: Optional[Iterable[str]] = None) -> list[Rule]:
+    """Award the badges ``user`` now qualifies for and commit them.
+
+    Badge rewards add experience, which can unlock level badges in turn, so
+    progress badges are evaluated again until nothing new qualifies.
+    """
+    awarded: list[Rule] = []
+    pending = evaluate(user, stats)
+    while pending:
+        # confirm against the table: another process may have awarded them
+        held = {
+            badge_id
+            for (badge_id,) in db.session.query(UserBadge.badge_id).filter(
+                UserBadge.user_id == user.id,
+                UserBadge.badge_id.in_([r.badge_id for r in pending]),
+            )
+        }
+        new = [rule for rule in pending if rule.badge_id not in held]
+        if held:
+            get_rules().forget(user.id)
+        for rule in new:
+            db.session.add(UserBadge(user_id=user.id, badge_id=rule.badge_id))
+            if rule.points > 0:
+                user.add_forum_experience(rule.points)
+        if not new:
+            break
+        awarded.extend(new)
+        db.session.commit()
+        if not any(rule.points > 0 for rule in new):
+            break
+        pending = evaluate(user, PROGRESS_STATS)
+    return awarded
+
+
+def _level_expression(experience):
+    return case(
+        *[
+            (experience < threshold, level)
+            for level, threshold in enumerate(LEVEL_THRESHOLDS, start=1)
+        ],
+        else_=len(LEVEL_THRESHOLDS) + 1,
+    )
+
+
+def backfill(badge_ids: Optional[Iterable[int]] = None) -> dict[int, int]:
+    """Award badges to every qualifying user in set-based statements.
+
+    Returns the number of users newly awarded each badge. Badges whose
+    requirements depend on experience or level run last, so rewards from the
+    other badges count towards them.
+    """
+    query = ForumBadge.query.filter_by(is_active=True)
+    if badge_ids is not None:
+        query = query.filter(ForumBadge.id.in_(list(badge_ids)))
+    rules = BadgeRules(query.all()).rules.values()
+    ordered = sorted(
+        rules, key=lambda r: any(stat in PROGRESS_STATS for stat in r.requirements)
+    )
+    user = User.__table__
+    awarded = {}
+    for rule in ordered:
+        qualifies = and_(
+            *[user.c[stat] >= value for stat, value in rule.requirements.items()],
+            ~exists().where(
+                UserBadge.user_id == user.c.id, UserBadge.badge_id == rule.badge_id
+            ),
+        )
+        last_id = db.session.query(db.func.max(UserBadge.id)).scalar() or 0
+        result = db.session.execute(
+            insert(UserBadge).from_select(
+                ["user_id", "badge_id", "earned_at", "is_displayed"],
+                select(
+                    user.c.id,
+                    literal(rule.badge_id),
+                    db.func.current_timestamp(),
+                    literal(True),
+                ).where(qualifies),
+            )
+        )
+        if rule.points > 0 and result.rowcount:
+            # reward only the rows just inserted
+            experience = user.c.forum_experience + rule.points
+            level = _level_expression(experience)
+            db.session.execute(
+                update(user)
+                .where(
+                    user.c.id.in_(
+                        select(UserBadge.user_id).where(
+                            UserBadge.badge_id == rule.badge_id,
+                            UserBadge.id > last_id,
+                        )
+                    )
+                )
+                .values(
+                    forum_experience=experience,
+                    forum_level=case(
+                        (level > user.c.forum_level, level),
+                        else_=user.c.forum_level,
+                    ),
+                )
+            )
+        awarded[rule.badge_id] = result.rowcount
+        db.session.commit()
+    current_app.extensions.pop("badge_rules", None)
+    # the rewards were paid with a bulk UPDATE the leaderboard hooks miss
+    leaderboard.invalidate("level")
+    return awarded
+
+
+# -- session hooks ------------------------------------------------------------
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, UserBadge):
+            changes.append(("earned", obj.user_id, obj.badge_id))
+        elif isinstance(obj, ForumBadge):
+            changes.append(("rules", None, None))
+    for obj in session.dirty | session.deleted:
+        if isinstance(obj, UserBadge):
+            changes.append(("forget", obj.user_id, None))
+        elif isinstance(obj, ForumBadge):
+            changes.append(("rules", None, None))
+    if changes:
+        session.info.setdefault("badge_rule_changes", []).extend(changes)
+
+
+def _after_commit(session) -> None:
+    changes = session.info.pop("badge_rule_changes", None)
+    if not changes or not has_app_context():
+        return
+    rules = current_app.extensions.get("badge_rules")
+    if rules is None:
+        return
+    for kind, user_id, badge_id in changes:
+        if kind == "rules":
+            current_app.extensions.pop("badge_rules", None)
+            return
+        if kind == "earned":
+            rules.mark_earned(user_id, badge_id)
+        else:
+            rules.forget(user_id)
+
+
+def _after_rollback(session, previous_transaction) -> None:
+    session.info.pop("badge_rule_changes", None)
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Register the session hooks that keep the rules and bitsets current."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
@@ -1,10 +1,14 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Dict, Optional, Any
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, bindparam, select, update
 from crunevo.extensions import db
 from crunevo.models import PersonalSpaceBlock
+from crunevo.services.analytics_service import AnalyticsService
 from crunevo.services.validation_service import ValidationService
-from crunevo.services.cache_service import CacheInvalidator
+
+# Blocks are numbered this far apart so a move can land between two of them
+ORDER_GAP = 1024
+GRID_FIELDS = ("x", "y", "width", "height")
 
 
 class BlockService:
@@ -38,7 +42,7 @@ class BlockService:
             title=cleaned_data.get("title", f"Nuevo {cleaned_data['type']}"),
             content=cleaned_data.get("content", ""),
             metadata_json=cleaned_data.get("metadata", {}),
-            order_index=max_order + 1,
+            order_index=max_order + ORDER_GAP,
             status="active",
             is_featured=block_data.get("is_featured", False),
         )
@@ -49,9 +53,6 @@ class BlockService:
         db.session.add(block)
         db.session.commit()
 
-        # Invalidate cache
-        CacheInvalidator.on_block_change(user_id)
-
         return block
 
     @staticmethod
@@ -121,9 +122,6 @@ class BlockService:
         block.updated_at = datetime.utcnow()
         db.session.commit()
 
-        # Invalidate cache
-        CacheInvalidator.on_block_change(user_id)
-
         return block
 
     @staticmethod
@@ -138,47 +136,142 @@ class BlockService:
         block.updated_at = datetime.utcnow()
         db.session.commit()
 
-        # Invalidate cache
-        CacheInvalidator.on_block_change(user_id)
-
         return True
 
     @staticmethod
     def reorder_blocks(user_id: int, block_orders: List[Dict[str, Any]]) -> bool:
-        """Reorder blocks based on provided order list and save grid positions."""
+        """Reorder blocks based on provided order list and save grid positions.
+
+        The listed blocks are read in one query and only those whose order or
+        grid position actually changes are written, with one executemany per
+        kind of change, so a drag on a large board costs a handful of
+        statements instead of one round trip per block.
+        """
+        table = PersonalSpaceBlock.__table__
+        items = {str(item.get("id")): item for item in block_orders if item.get("id")}
+        if not items:
+            return True
         try:
-            for item in block_orders:
-                idx = item.get("order_index", item.get("position"))
-                block = PersonalSpaceBlock.query.filter_by(
-                    id=item.get("id"), user_id=user_id
-                ).first()
-                if block is not None and idx is not None:
-                    block.order_index = idx
-                    
-                    # Save grid position data if provided
-                    if any(key in item for key in ['x', 'y', 'width', 'height']):
-                        if block.metadata_json is None:
-                            block.metadata_json = {}
-                        
-                        if 'grid_position' not in block.metadata_json:
-                            block.metadata_json['grid_position'] = {}
-                        
-                        # Update grid position fields
-                        for field in ['x', 'y', 'width', 'height']:
-                            if field in item:
-                                block.metadata_json['grid_position'][field] = item[field]
-                        
-                        # Mark as modified for SQLAlchemy
-                        from sqlalchemy.orm.attributes import flag_modified
-                        flag_modified(block, 'metadata_json')
+            current = {
+                row.id: row
+                for row in db.session.execute(
+                    select(table.c.id, table.c.order_index, table.c["metadata"]).where(
+                        table.c.user_id == user_id, table.c.id.in_(list(items))
+                    )
+                )
+            }
 
+            order_only, with_grid = [], []
+            for block_id, row in current.items():
+                item = items[block_id]
+                idx = item.get("order_index", item.get("position"))
+                if idx is None:
+                    idx = row.order_index
+                grid = {f: item[f] for f in GRID_FIELDS if f in item}
+                metadata = dict(row.metadata or {})
+                position = dict(metadata.get("grid_position") or {})
+                if grid and any(position.get(f) != v for f, v in grid.items()):
+                    position.update(grid)
+                    metadata["grid_position"] = position
+                    with_grid.append(
+                        {"b_id": block_id, "b_order": idx, "b_metadata": metadata}
+                    )
+                elif idx != row.order_index:
+                    order_only.append({"b_id": block_id, "b_order": idx})
+
+            match = and_(table.c.id == bindparam("b_id"), table.c.user_id == user_id)
+            if order_only:
+                db.session.execute(
+                    update(table).where(match).values(order_index=bindparam("b_order")),
+                    order_only,
+                )
+            if with_grid:
+                db.session.execute(
+                    update(table)
+                    .where(match)
+                    .values(
+                        order_index=bindparam("b_order"),
+                        metadata=bindparam("b_metadata", type_=db.JSON),
+                    ),
+                    with_grid,
+                )
+            if order_only or with_grid:
+                AnalyticsService.blocks_changed(user_id)
             db.session.commit()
-            CacheInvalidator.on_block_change(user_id)
             return True
         except Exception:
             db.session.rollback()
             return False
 
+    @staticmethod
+    def move_block(
+        user_id: int,
+        block_id: str,
+        after_id: Optional[str] = None,
+        before_id: Optional[str] = None,
+    ) -> bool:
+        """Place a block between two others, rewriting only that block.
+
+        Blocks are numbered ``ORDER_GAP`` apart, so a moved block takes the
+        midpoint of its new neighbours. The user's blocks are only renumbered
+        when two neighbours have no room left between them.
+        """
+        table = PersonalSpaceBlock.__table__
+        ids = [i for i in (block_id, after_id, before_id) if i]
+        for attempt in range(2):
+            orders = dict(
+                db.session.execute(
+                    select(table.c.id, table.c.order_index).where(
+                        table.c.user_id == user_id, table.c.id.in_(ids)
+                    )
+                ).all()
+            )
+            if block_id not in orders:
+                return False
+            low = orders.get(after_id)
+            high = orders.get(before_id)
+            if low is None and high is None:
+                return True
+            if low is None:
+                new_index = high - ORDER_GAP
+            elif high is None:
+                new_index = low + ORDER_GAP
+            elif high - low > 1:
+                new_index = (low + high) // 2
+            elif attempt == 0:
+                BlockService._respace(user_id)
+                continue
+            else:
+                return False
+            db.session.execute(
+                update(table)
+                .where(table.c.id == block_id, table.c.user_id == user_id)
+                .values(order_index=new_index)
+            )
+            AnalyticsService.blocks_changed(user_id)
+            db.session.commit()
+            return True
+        return False
+
+    @staticmethod
+    def _respace(user_id: int) -> None:
+        """Renumber the user's blocks ``ORDER_GAP`` apart, keeping their order."""
+        table = PersonalSpaceBlock.__table__
+        ids = db.session.scalars(
+            select(table.c.id)
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.order_index, table.c.created_at, table.c.id)
+        ).all()
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(order_index=bindparam("b_order")),
+            [
+                {"b_id": block_id, "b_order": (i + 1) * ORDER_GAP}
+                for i, block_id in enumerate(ids)
+            ],
+        )
+
     @staticmethod
     def get_block(block_id: str, user_id: int) -> Optional[PersonalSpaceBlock]:
         """Get a specific block by ID and user ID."""
@@ -244,7 +337,7 @@ class BlockService:
             metadata_json=(
                 original.metadata_json.copy() if original.metadata_json else {}
             ),
-            order_index=max_order + 1,
+            order_index=max_order + ORDER_GAP,
             status="active",
         )
 
@@ -255,49 +348,34 @@ class BlockService:
     @staticmethod
     def get_block_analytics(user_id: int) -> Dict[str, Any]:
         """Get analytics data for user's blocks."""
-        blocks = PersonalSpaceBlock.query.filter_by(
-            user_id=user_id, status="active"
-        ).all()
-
-        # Count by type
-        type_counts = {}
-        for block in blocks:
-            type_counts[block.type] = type_counts.get(block.type, 0) + 1
-
-        # Task completion stats
-        task_blocks = [b for b in blocks if b.type == "tarea"]
-        completed_tasks = sum(
-            1 for b in task_blocks if (b.metadata_json or {}).get("completed")
-        )
-
-        # Objective progress
-        objective_blocks = [b for b in blocks if b.type == "objetivo"]
-        avg_objective_progress = 0
-        if objective_blocks:
-            total_progress = sum(
-                (b.metadata_json or {}).get("progress", 0) for b in objective_blocks
-            )
-            avg_objective_progress = total_progress / len(objective_blocks)
-
-        # Recent activity
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_blocks = [b for b in blocks if b.updated_at >= week_ago]
+        summary = AnalyticsService.get_block_summary(user_id)
+        types = summary["types"]
+        tasks = types.get("tarea", {"active": 0, "completed": 0})
+        objectives = types.get("objetivo", {"active": 0, "progress": 0})
 
         return {
-            "total_blocks": len(blocks),
-            "blocks_by_type": type_counts,
+            "total_blocks": summary["total_active"],
+            "blocks_by_type": {t: counts["active"] for t, counts in types.items()},
             "task_completion": {
-                "total": len(task_blocks),
-                "completed": completed_tasks,
+                "total": tasks["active"],
+                "completed": tasks["completed"],
                 "percentage": (
-                    int((completed_tasks / len(task_blocks)) * 100)
-                    if task_blocks
+                    int((tasks["completed"] / tasks["active"]) * 100)
+                    if tasks["active"]
                     else 0
                 ),
             },
             "objective_progress": {
-                "total": len(objective_blocks),
-                "average_progress": round(avg_objective_progress, 1),
+                "total": objectives["active"],
+                "average_progress": (
+                    round(objectives["progress"] / objectives["active"], 1)
+                    if objectives["active"]
+                    else 0
+                ),
+            },
+            "recent_activity": {
+                "blocks_updated_this_week": sum(
+                    counts["recent"] for counts in types.values()
+                )
             },
-            "recent_activity": {"blocks_updated_this_week": len(recent_blocks)},
         }
@@ -1,13 +1,63 @@
-from typing import Any, Optional
+from typing import Any, Callable, Iterable, Optional
+from collections import OrderedDict
 from functools import wraps
 import json
 import hashlib
-from flask import current_app
+import math
+import random
+import threading
+import time
+import uuid
+from flask import current_app, has_app_context
 from crunevo.extensions import redis_client
 
+try:  # optional: faster JSON encoding
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class JSONSerializer:
+    @staticmethod
+    def dumps(data: Any) -> str:
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+    @staticmethod
+    def loads(raw: str) -> Any:
+        return json.loads(raw)
+
+
+class ORJSONSerializer:
+    @staticmethod
+    def dumps(data: Any) -> str:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    @staticmethod
+    def loads(raw: str) -> Any:
+        return orjson.loads(raw)
+
+
+# CACHE_SERIALIZER picks one of these. Values must encode to text: the shared
+# Redis client decodes every response as UTF-8.
+SERIALIZERS = {"json": JSONSerializer}
+if orjson is not None:
+    SERIALIZERS["orjson"] = ORJSONSerializer
+
+
+def get_serializer():
+    name = current_app.config.get("CACHE_SERIALIZER") if has_app_context() else None
+    return SERIALIZERS.get(name or "json", JSONSerializer)
+
 
 class CacheService:
-    """Service for caching data to improve performance."""
+    """Service for caching data to improve performance.
+
+    Per-user keys embed a generation number (``g<n>``) read from a counter in
+    Redis. Invalidating a user's blocks or templates is a single ``INCR`` of
+    that counter: later reads build new keys and the old entries simply
+    expire. Entries stored with ``tags`` are also listed in a Redis set so
+    they can be purged explicitly with ``purge_tag``.
+    """
 
     # Cache key prefixes
     USER_BLOCKS_PREFIX = "user_blocks"
@@ -22,6 +72,12 @@ class CacheService:
     DASHBOARD_TTL = 180  # 3 minutes
     TEMPLATES_TTL = 900  # 15 minutes
 
+    # Generation counters and tag sets
+    GENERATION_PREFIX = "cache_gen"
+    TAG_PREFIX = "cache_tag"
+    TAG_TTL = 3600  # longer than any entry it lists
+    SCAN_BATCH = 500
+
     @staticmethod
     def _get_cache_key(prefix: str, *args) -> str:
         """Generate a cache key from prefix and arguments."""
@@ -32,7 +88,7 @@ class CacheService:
     def _serialize_data(data: Any) -> str:
         """Serialize data for caching."""
         try:
-            return json.dumps(data, default=str, ensure_ascii=False)
+            return get_serializer().dumps(data)
         except (TypeError, ValueError):
             return str(data)
 
@@ -40,8 +96,8 @@ class CacheService:
     def _deserialize_data(data: str) -> Any:
         """Deserialize cached data."""
         try:
-            return json.loads(data)
-        except (TypeError, ValueError, json.JSONDecodeError):
+            return get_serializer().loads(data)
+        except (TypeError, ValueError):
             return data
 
     @staticmethod
@@ -60,14 +116,22 @@ class CacheService:
             return None
 
     @staticmethod
-    def set(key: str, data: Any, ttl: int = DEFAULT_TTL) -> bool:
-        """Set data in cache with TTL."""
+    def set(
+        key: str, data: Any, ttl: int = DEFAULT_TTL, tags: Iterable[str] = ()
+    ) -> bool:
+        """Set data in cache with TTL, listing the key under ``tags``."""
         try:
             if not redis_client:
                 return False
 
             serialized_data = CacheService._serialize_data(data)
-            return redis_client.setex(key, ttl, serialized_data)
+            pipe = redis_client.pipeline()
+            pipe.setex(key, ttl, serialized_data)
+            for tag in tags:
+                tag_key = CacheService._tag_key(tag)
+                pipe.sadd(tag_key, key)
+                pipe.expire(tag_key, CacheService.TAG_TTL)
+            return bool(pipe.execute()[0])
         except Exception as e:
             current_app.logger.warning(f"Cache set error: {e}")
             return False
@@ -79,6 +143,8 @@ class CacheService:
             if not redis_client:
                 return False
 
+            if has_app_context():
+                get_tiered_cache().local.delete(key)
             return bool(redis_client.delete(key))
         except Exception as e:
             current_app.logger.warning(f"Cache delete error: {e}")
@@ -86,51 +152,153 @@ class CacheService:
 
     @staticmethod
     def delete_pattern(pattern: str) -> int:
-        """Delete all keys matching a pattern."""
+        """Delete all keys matching a pattern.
+
+        Walks the keyspace with ``SCAN`` rather than ``KEYS`` so Redis is not
+        blocked; it is still proportional to the keyspace, so it is meant for
+        maintenance. Regular invalidation goes through ``bump``.
+        """
         try:
             if not redis_client:
                 return 0
 
-            keys = redis_client.keys(pattern)
-            if keys:
-                return redis_client.delete(*keys)
-            return 0
+            deleted = 0
+            batch = []
+            for key in redis_client.scan_iter(
+                match=pattern, count=CacheService.SCAN_BATCH
+            ):
+                batch.append(key)
+                if len(batch) >= CacheService.SCAN_BATCH:
+                    deleted += redis_client.delete(*batch)
+                    batch = []
+            if batch:
+                deleted += redis_client.delete(*batch)
+            return deleted
         except Exception as e:
             current_app.logger.warning(f"Cache delete pattern error: {e}")
             return 0
 
+    @staticmethod
+    def _generation_key(scope: str) -> str:
+        return CacheService._get_cache_key(CacheService.GENERATION_PREFIX, scope)
+
+    @staticmethod
+    def generations(*scopes: str) -> list:
+        """Current generation of each scope, read in one round trip.
+
+        A missing counter is seeded with the current time rather than 0, so a
+        counter lost from Redis never reuses a generation that may still have
+        live entries.
+        """
+        try:
+            if not redis_client:
+                return [0] * len(scopes)
+
+            keys = [CacheService._generation_key(scope) for scope in scopes]
+            values = redis_client.mget(keys)
+            for i, value in enumerate(values):
+                if value is None:
+                    redis_client.set(keys[i], int(time.time()), nx=True)
+                    values[i] = redis_client.get(keys[i])
+            return [int(value or 0) for value in values]
+        except Exception as e:
+            current_app.logger.warning(f"Cache generation error: {e}")
+            return [0] * len(scopes)
+
+    @staticmethod
+    def bump(*scopes: str) -> None:
+        """Invalidate every key built from ``scopes``."""
+        try:
+            if not redis_client:
+                return
+
+            pipe = redis_client.pipeline()
+            for scope in scopes:
+                pipe.incr(CacheService._generation_key(scope))
+            pipe.execute()
+        except Exception as e:
+            current_app.logger.warning(f"Cache bump error: {e}")
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return CacheService._get_cache_key(CacheService.TAG_PREFIX, tag)
+
+    @staticmethod
+    def user_tag(user_id: int) -> str:
+        """Tag for entries to purge when a user's data must go."""
+        return f"user:{user_id}"
+
+    @staticmethod
+    def purge_tag(tag: str) -> int:
+        """Delete every entry stored under ``tag``."""
+        try:
+            if not redis_client:
+                return 0
+
+            tag_key = CacheService._tag_key(tag)
+            keys = list(redis_client.smembers(tag_key))
+            redis_client.delete(tag_key, *keys)
+            return len(keys)
+        except Exception as e:
+            current_app.logger.warning(f"Cache purge error: {e}")
+            return 0
+
+    @staticmethod
+    def _user_scope(user_id: int) -> str:
+        # blocks and everything computed from them
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _templates_scope(user_id: Optional[int] = None) -> str:
+        return f"templates:{user_id if user_id is not None else 'public'}"
+
     @staticmethod
     def invalidate_user_cache(user_id: int) -> None:
         """Invalidate all cache entries for a user."""
-        patterns = [
-            f"{CacheService.USER_BLOCKS_PREFIX}:{user_id}:*",
-            f"{CacheService.USER_TEMPLATES_PREFIX}:{user_id}:*",
-            f"{CacheService.ANALYTICS_PREFIX}:{user_id}:*",
-            f"{CacheService.DASHBOARD_PREFIX}:{user_id}:*",
-            f"{CacheService.BLOCK_ANALYTICS_PREFIX}:{user_id}:*",
-        ]
+        CacheService.bump(
+            CacheService._user_scope(user_id), CacheService._templates_scope(user_id)
+        )
+        if not CacheService.purge_tag(CacheService.user_tag(user_id)):
+            # tag set expired or lost: fall back to scanning for leftovers
+            for prefix in (
+                CacheService.USER_BLOCKS_PREFIX,
+                CacheService.USER_TEMPLATES_PREFIX,
+                CacheService.ANALYTICS_PREFIX,
+                CacheService.DASHBOARD_PREFIX,
+                CacheService.BLOCK_ANALYTICS_PREFIX,
+            ):
+                CacheService.delete_pattern(f"{prefix}:{user_id}:*")
 
-        for pattern in patterns:
-            CacheService.delete_pattern(pattern)
+    @staticmethod
+    def _user_key(prefix: str, user_id: int, *args) -> str:
+        (generation,) = CacheService.generations(CacheService._user_scope(user_id))
+        return CacheService._get_cache_key(prefix, user_id, f"g{generation}", *args)
 
     @staticmethod
     def get_user_blocks_cache_key(
         user_id: int, block_type: Optional[str] = None, status: str = "active"
     ) -> str:
         """Get cache key for user blocks."""
-        key_parts = [CacheService.USER_BLOCKS_PREFIX, str(user_id), status]
+        key_parts = [status]
         if block_type:
             key_parts.append(block_type)
-        return ":".join(key_parts)
+        return CacheService._user_key(
+            CacheService.USER_BLOCKS_PREFIX, user_id, *key_parts
+        )
 
     @staticmethod
     def get_user_templates_cache_key(
         user_id: int, category: Optional[str] = None, include_public: bool = True
     ) -> str:
         """Get cache key for user templates."""
+        scopes = [CacheService._templates_scope(user_id)]
+        if include_public:
+            scopes.append(CacheService._templates_scope())
+        generation = ".".join(str(g) for g in CacheService.generations(*scopes))
         key_parts = [
             CacheService.USER_TEMPLATES_PREFIX,
             str(user_id),
+            f"g{generation}",
             str(include_public),
         ]
         if category:
@@ -140,23 +308,218 @@ class CacheService:
     @staticmethod
     def get_analytics_cache_key(user_id: int, analytics_type: str) -> str:
         """Get cache key for analytics data."""
-        return CacheService._get_cache_key(
+        return CacheService._user_key(
             CacheService.ANALYTICS_PREFIX, user_id, analytics_type
         )
 
     @staticmethod
     def get_dashboard_cache_key(user_id: int) -> str:
         """Get cache key for dashboard data."""
-        return CacheService._get_cache_key(CacheService.DASHBOARD_PREFIX, user_id)
+        return CacheService._user_key(CacheService.DASHBOARD_PREFIX, user_id)
 
     @staticmethod
     def get_block_analytics_cache_key(user_id: int) -> str:
         """Get cache key for block analytics."""
-        return CacheService._get_cache_key(CacheService.BLOCK_ANALYTICS_PREFIX, user_id)
+        return CacheService._user_key(CacheService.BLOCK_ANALYTICS_PREFIX, user_id)
+
+
+class LocalCache:
+    """Per-process LRU with a short TTL, in front of Redis."""
 
+    def __init__(self, max_items: int = 1024, ttl: float = 5):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
 
-def cached(ttl: int = CacheService.DEFAULT_TTL, key_func: Optional[callable] = None):
-    """Decorator for caching function results."""
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class TieredCache:
+    """Two-tier read-through cache used by ``cached`` and ``get_or_set_cache``.
+
+    Values are looked up in the per-process ``LocalCache`` first, then in
+    Redis. A miss is filled by a single worker: the one holding the
+    ``lock:<key>`` Redis lock computes the value while the others wait for it
+    to appear. Entries record how long they took to compute and when they
+    expire, and XFetch refreshes a hot key shortly before it expires, with a
+    probability that grows as expiry nears and with the cost of the
+    computation, so it does not expire under load.
+
+    Local entries are only dropped on ``CacheService.delete`` in the same
+    process; keys invalidated by other processes stay visible here for up
+    to ``CACHE_LOCAL_TTL`` seconds, which is why generation-keyed entries
+    suit this tier best.
+    """
+
+    LOCK_TIMEOUT = 10  # seconds a filler may hold the lock
+    WAIT_STEP = 0.05
+
+    def __init__(self, max_items: int = 1024, local_ttl: float = 5, beta: float = 1):
+        self.local = LocalCache(max_items, local_ttl)
+        self.beta = beta
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.early_refreshes = 0
+        self.lock_waits = 0
+        self.fills = 0
+        self.fill_seconds = 0.0
+
+    def fetch(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: int = CacheService.DEFAULT_TTL,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        entry = self.local.get(key)
+        if entry is not None:
+            self.local_hits += 1
+        else:
+            entry = self._read(key)
+            if entry is not None:
+                self.redis_hits += 1
+                self.local.set(key, entry)
+
+        if entry is not None:
+            if not self._refresh_early(entry):
+                return entry["v"]
+            token = self._acquire(key)
+            if token is None:
+                return entry["v"]  # someone else is already refreshing it
+            self.early_refreshes += 1
+            return self._fill(key, compute, ttl, tags, token)
+
+        self.misses += 1
+        token = self._acquire(key)
+        if token is not None:
+            return self._fill(key, compute, ttl, tags, token)
+
+        # another worker is computing this key: wait for its result
+        self.lock_waits += 1
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(self.WAIT_STEP)
+            entry = self._read(key)
+            if entry is not None:
+                self.local.set(key, entry)
+                return entry["v"]
+        return self._fill(key, compute, ttl, tags, None)
+
+    def _refresh_early(self, entry: dict) -> bool:
+        # XFetch: now - delta * beta * ln(rand) >= expiry, rand in (0, 1]
+        gap = entry["d"] * self.beta * math.log(1.0 - random.random())
+        return time.time() - gap >= entry["x"]
+
+    @staticmethod
+    def _read(key: str) -> Optional[dict]:
+        entry = CacheService.get(key)
+        if isinstance(entry, dict) and {"v", "d", "x"} <= entry.keys():
+            return entry
+        return None
+
+    @staticmethod
+    def _acquire(key: str) -> Optional[str]:
+        """Take the fill lock for ``key``; returns the lock token or None."""
+        token = uuid.uuid4().hex
+        try:
+            if redis_client.set(
+                f"lock:{key}", token, nx=True, px=TieredCache.LOCK_TIMEOUT * 1000
+            ):
+                return token
+            return None
+        except Exception as e:
+            # without Redis every worker fills for itself
+            current_app.logger.warning(f"Cache lock error: {e}")
+            return token
+
+    @staticmethod
+    def _release(key: str, token: str) -> None:
+        try:
+            if redis_client.get(f"lock:{key}") == token:
+                redis_client.delete(f"lock:{key}")
+        except Exception as e:
+            current_app.logger.warning(f"Cache unlock error: {e}")
+
+    def _fill(self, key, compute, ttl, tags, token) -> Any:
+        started = time.perf_counter()
+        try:
+            value = compute()
+        finally:
+            if token is not None:
+                self._release(key, token)
+        delta = time.perf_counter() - started
+        self.fills += 1
+        self.fill_seconds += delta
+        entry = {"v": value, "d": delta, "x": time.time() + ttl}
+        CacheService.set(key, entry, ttl, tags=tags)
+        self.local.set(key, entry)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        hits = self.local_hits + self.redis_hits
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            "early_refreshes": self.early_refreshes,
+            "lock_waits": self.lock_waits,
+            "fills": self.fills,
+            "avg_fill_ms": (
+                round(self.fill_seconds / self.fills * 1000, 2) if self.fills else None
+            ),
+            "local_size": len(self.local),
+            "local_evictions": self.local.evictions,
+        }
+
+
+def get_tiered_cache(app=None) -> TieredCache:
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get("tiered_cache")
+    if cache is None:
+        cache = app.extensions["tiered_cache"] = TieredCache(
+            app.config.get("CACHE_LOCAL_SIZE", 1024),
+            app.config.get("CACHE_LOCAL_TTL", 5),
+            app.config.get("CACHE_XFETCH_BETA", 1),
+        )
+    return cache
+
+
+def cached(
+    ttl: int = CacheService.DEFAULT_TTL,
+    key_func: Optional[callable] = None,
+    tags: Iterable[str] = (),
+):
+    """Decorator for caching function results in the two-tier cache."""
 
     def decorator(func):
         @wraps(func)
@@ -171,15 +534,9 @@ def cached(ttl: int = CacheService.DEFAULT_TTL, key_func: Optional[callable] = N
                 key_parts.extend([f"{k}:{v}" for k, v in sorted(kwargs.items())])
                 cache_key = hashlib.md5(":".join(key_parts).encode()).hexdigest()
 
-            # Try to get from cache
-            cached_result = CacheService.get(cache_key)
-            if cached_result is not None:
-                return cached_result
-
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            CacheService.set(cache_key, result, ttl)
-            return result
+            return get_tiered_cache().fetch(
+                cache_key, lambda: func(*args, **kwargs), ttl, tags
+            )
 
         return wrapper
 
@@ -243,45 +600,33 @@ class CacheInvalidator:
     @staticmethod
     def on_block_change(user_id: int) -> None:
         """Invalidate caches when blocks change."""
-        # Invalidate user blocks cache
-        CacheService.delete_pattern(f"{CacheService.USER_BLOCKS_PREFIX}:{user_id}:*")
-
-        # Invalidate analytics cache
-        CacheService.delete_pattern(f"{CacheService.ANALYTICS_PREFIX}:{user_id}:*")
-        CacheService.delete_pattern(f"{CacheService.DASHBOARD_PREFIX}:{user_id}:*")
-        CacheService.delete_pattern(
-            f"{CacheService.BLOCK_ANALYTICS_PREFIX}:{user_id}:*"
-        )
+        # Blocks, analytics and dashboard keys share the user's generation
+        CacheService.bump(CacheService._user_scope(user_id))
 
     @staticmethod
     def on_template_change(user_id: int) -> None:
         """Invalidate caches when templates change."""
-        # Invalidate user templates cache
-        CacheService.delete_pattern(f"{CacheService.USER_TEMPLATES_PREFIX}:{user_id}:*")
-
-        # Also invalidate public templates cache for all users
-        CacheService.delete_pattern(f"{CacheService.USER_TEMPLATES_PREFIX}:*:True*")
+        # Listings that include public templates also embed the public generation
+        CacheService.bump(
+            CacheService._templates_scope(user_id), CacheService._templates_scope()
+        )
 
     @staticmethod
     def on_user_activity(user_id: int) -> None:
         """Invalidate analytics caches on user activity."""
-        CacheService.delete_pattern(f"{CacheService.ANALYTICS_PREFIX}:{user_id}:*")
-        CacheService.delete_pattern(f"{CacheService.DASHBOARD_PREFIX}:{user_id}:*")
+        # analytics share the blocks generation, so block lists go too
+        CacheService.bump(CacheService._user_scope(user_id))
 
 
 # Utility functions for common caching patterns
 def get_or_set_cache(
-    key: str, fetch_func: callable, ttl: int = CacheService.DEFAULT_TTL
+    key: str,
+    fetch_func: callable,
+    ttl: int = CacheService.DEFAULT_TTL,
+    tags: Iterable[str] = (),
 ) -> Any:
     """Get data from cache or fetch and cache it."""
-    cached_data = CacheService.get(key)
-    if cached_data is not None:
-        return cached_data
-
-    # Fetch fresh data
-    fresh_data = fetch_func()
-    CacheService.set(key, fresh_data, ttl)
-    return fresh_data
+    return get_tiered_cache().fetch(key, fetch_func, ttl, tags)
 
 
 def warm_user_cache(user_id: int) -> None:
@@ -296,14 +641,14 @@ def warm_user_cache(user_id: int) -> None:
         if not CacheService.get(blocks_key):
             blocks = BlockService.get_user_blocks(user_id)
             CacheService.set(
-                blocks_key, [b.to_dict() for b in blocks], CacheService.DEFAULT_TTL
+                blocks_key,
+                [b.to_dict() for b in blocks],
+                CacheService.DEFAULT_TTL,
+                tags=[CacheService.user_tag(user_id)],
             )
 
         # Warm dashboard cache
-        dashboard_key = CacheService.get_dashboard_cache_key(user_id)
-        if not CacheService.get(dashboard_key):
-            dashboard_data = AnalyticsService.get_dashboard_metrics(user_id)
-            CacheService.set(dashboard_key, dashboard_data, CacheService.DASHBOARD_TTL)
+        AnalyticsService.get_block_summary(user_id)
 
         # Warm templates cache
         templates_key = CacheService.get_user_templates_cache_key(user_id)
@@ -313,6 +658,7 @@ def warm_user_cache(user_id: int) -> None:
                 templates_key,
                 [t.to_dict() for t in templates],
                 CacheService.TEMPLATES_TTL,
+                tags=[CacheService.user_tag(user_id)],
             )
 
     except Exception as e:
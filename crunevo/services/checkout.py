@@ -0,0 +1,125 @@
+"""Set-based checkout.
+
+A checkout is three statements whatever the size of the cart: one query
+loads the cart's products, one ``UPDATE ... WHERE stock >= quantity
+RETURNING`` decrements the stock of every product that still has enough, and
+one executemany ``INSERT`` writes the purchases. The stock check happens in
+the database, on the row the ``UPDATE`` locks, so concurrent buyers cannot
+oversell a product: a buyer whose row no longer has enough stock simply gets
+no row back for it. Invoices are rendered afterwards by a background task.
+
+``scripts/checkout_load_test.py`` hammers one product from many threads and
+checks that no more units are sold than were in stock.
+"""
+
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import case, insert, update
+
+from crunevo.extensions import db
+from crunevo.models import Product, Purchase
+from crunevo.services import mission_progress
+
+
+class CheckoutResult(NamedTuple):
+    purchase_ids: list[int]
+    sold: dict[int, int]
+    total: float
+    out_of_stock: list[str]
+    download_url: Optional[str]
+
+
+def load_cart(cart: dict, official_only: bool = False) -> list[tuple]:
+    """``(product, quantity)`` for the cart's products, in one query."""
+    quantities = {}
+    for pid, qty in cart.items():
+        try:
+            pid, qty = int(pid), int(qty)
+        except (TypeError, ValueError):
+            continue
+        if qty > 0:
+            quantities[pid] = qty
+    if not quantities:
+        return []
+    query = Product.query.filter(Product.id.in_(list(quantities)))
+    if official_only:
+        query = query.filter_by(is_official=True)
+    products = {product.id: product for product in query}
+    return [(products[pid], qty) for pid, qty in quantities.items() if pid in products]
+
+
+def reserve_stock(connection, quantities: dict[int, int]) -> dict[int, tuple]:
+    """Take ``quantities`` out of stock where there is enough of it.
+
+    Returns ``{product_id: (price, download_url)}`` for the products whose
+    stock was decremented; the others did not have enough.
+    """
+    if not quantities:
+        return {}
+    table = Product.__table__
+    quantity = case(quantities, value=table.c.id)
+    rows = connection.execute(
+        update(table)
+        .where(table.c.id.in_(list(quantities)), table.c.stock >= quantity)
+        .values(stock=table.c.stock - quantity)
+        .returning(table.c.id, table.c.price, table.c.download_url)
+    )
+    return {pid: (price, download_url) for pid, price, download_url in rows}
+
+
+def place_order(
+    user_id: int,
+    items: list[tuple],
+    shipping_address: Optional[str] = None,
+    shipping_message: Optional[str] = None,
+) -> CheckoutResult:
+    """Buy ``items`` from ``load_cart`` for the user and commit.
+
+    ``sold`` maps the bought products to their quantities; products that ran
+    out of stock are skipped and reported by name.
+    """
+    quantities = {product.id: qty for product, qty in items}
+    reserved = reserve_stock(db.session.connection(), quantities)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "product_id": pid,
+            "quantity": qty,
+            "price_soles": reserved[pid][0],
+            "shipping_address": shipping_address,
+            "shipping_message": shipping_message,
+            "timestamp": now,
+        }
+        for pid, qty in quantities.items()
+        if pid in reserved
+    ]
+    sold = {row["product_id"]: row["quantity"] for row in rows}
+    total = sum(float(row["price_soles"]) * row["quantity"] for row in rows)
+    out_of_stock = [product.name for product, _ in items if product.id not in reserved]
+    purchase_ids = []
+    if rows:
+        purchase_ids = list(
+            db.session.scalars(insert(Purchase).returning(Purchase.id), rows)
+        )
+        # the bulk insert skips the mapper hooks that count purchases
+        mission_progress.record(
+            db.session.connection(), "purchases", user_id, now, len(rows)
+        )
+    db.session.commit()
+
+    download_url = next(
+        (
+            reserved[pid][1]
+            for pid, qty in quantities.items()
+            if pid in reserved and qty == 1 and reserved[pid][1]
+        ),
+        None,
+    )
+    if purchase_ids:
+        from crunevo.tasks import task_queue
+        from crunevo.utils.invoice import generate_invoices
+
+        task_queue.enqueue(generate_invoices, purchase_ids)
+    return CheckoutResult(purchase_ids, sold, total, out_of_stock, download_url)
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from sqlalchemy import func
 from crunevo.extensions import db
 from crunevo.models.user import User
 from crunevo.models.forum import ForumQuestion, ForumAnswer
 from crunevo.models.social import Challenge, UserChallenge
+from crunevo.services import leaderboard as leaderboards
 from typing import Dict, List, Optional
 
 
@@ -71,24 +72,38 @@ class CrolarsIntegrationService:
     @staticmethod
     def get_crolars_leaderboard(limit: int = 10) -> List[Dict]:
         """Get top users by Crolars earnings"""
-        users = User.query.order_by(desc(User.credits)).limit(limit).all()
+        users = leaderboards.top("credits", limit)
+        ids = [user.id for user in users]
+        rewards = CrolarsIntegrationService.ACTIVITY_REWARDS
+
+        questions = dict(
+            db.session.query(ForumQuestion.author_id, func.count(ForumQuestion.id))
+            .filter(ForumQuestion.author_id.in_(ids))
+            .group_by(ForumQuestion.author_id)
+            .all()
+        )
+        answers = {}
+        best_answers = {}
+        for author_id, accepted, count in (
+            db.session.query(
+                ForumAnswer.author_id,
+                ForumAnswer.is_accepted,
+                func.count(ForumAnswer.id),
+            )
+            .filter(ForumAnswer.author_id.in_(ids))
+            .group_by(ForumAnswer.author_id, ForumAnswer.is_accepted)
+        ):
+            answers[author_id] = answers.get(author_id, 0) + count
+            if accepted:
+                best_answers[author_id] = best_answers.get(author_id, 0) + count
 
         leaderboard = []
         for i, user in enumerate(users, 1):
             # Calculate total estimated Crolars from forum activities
-            questions_count = ForumQuestion.query.filter_by(author_id=user.id).count()
-            answers_count = ForumAnswer.query.filter_by(author_id=user.id).count()
-            best_answers_count = ForumAnswer.query.filter_by(
-                author_id=user.id, is_accepted=True
-            ).count()
-
             estimated_earned = (
-                questions_count
-                * CrolarsIntegrationService.ACTIVITY_REWARDS["ask_question"]
-                + answers_count
-                * CrolarsIntegrationService.ACTIVITY_REWARDS["answer_question"]
-                + best_answers_count
-                * CrolarsIntegrationService.ACTIVITY_REWARDS["best_answer"]
+                questions.get(user.id, 0) * rewards["ask_question"]
+                + answers.get(user.id, 0) * rewards["answer_question"]
+                + best_answers.get(user.id, 0) * rewards["best_answer"]
             )
 
             leaderboard.append(
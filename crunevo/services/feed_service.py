@@ -20,7 +20,12 @@ from crunevo.utils.login_streak import streak_reward
 
 def get_featured_posts():
     """Return top notes, posts and users with recent achievements."""
-    top_notes = Note.query.order_by(Note.views.desc()).limit(3).all()
+    top_notes = (
+        Note.query.filter(Note.processing_status == "ready")
+        .order_by(Note.views.desc())
+        .limit(3)
+        .all()
+    )
     top_posts = (
         Post.query.join(PostReaction)
         .group_by(Post.id)
@@ -81,7 +86,7 @@ def get_weekly_ranking(limit=5):
 
 
 def fetch_feed_data(user, categoria: str | None = None, limit: int = 10):
-    query = FeedItem.query.filter_by(owner_id=user.id).options(
+    query = FeedItem.query.filter(FeedItem.visible_to(user.id)).options(
         joinedload(FeedItem.post), joinedload(FeedItem.note)
     )
     if categoria == "apuntes":
@@ -1,7 +1,7 @@
 from datetime import date
 from crunevo.extensions import db
-from crunevo.models.user import User
 from crunevo.models.badge import ForumBadge, UserBadge
+from crunevo.services import badge_rules, leaderboard
 from crunevo.services.crolars_integration import CrolarsIntegrationService
 from flask import flash
 
@@ -20,6 +20,16 @@ class GamificationService:
         "first_answer": 15,
     }
 
+    # User stats changed by each action, used to pick the badges to evaluate
+    ACTION_STATS = {
+        "ask_question": ("questions_asked", "forum_streak"),
+        "first_question": ("questions_asked", "forum_streak"),
+        "answer_question": ("answers_given", "forum_streak"),
+        "first_answer": ("answers_given", "forum_streak"),
+        "best_answer": ("best_answers", "forum_streak"),
+        "receive_vote": ("helpful_votes", "forum_streak"),
+    }
+
     @staticmethod
     def award_experience(user, action, amount=None):
         """Award experience points to user for an action."""
@@ -37,7 +47,11 @@ class GamificationService:
                 )
 
             # Check for new badges
-            GamificationService.check_and_award_badges(user)
+            GamificationService.check_and_award_badges(
+                user,
+                GamificationService.ACTION_STATS.get(action, ())
+                + badge_rules.PROGRESS_STATS,
+            )
 
             return level_up
         return False
@@ -66,50 +80,23 @@ class GamificationService:
         db.session.commit()
 
     @staticmethod
-    def check_and_award_badges(user):
-        """Check if user qualifies for new badges and award them."""
-        badges = ForumBadge.query.filter_by(is_active=True).all()
-        awarded_badges = []
-
-        for badge in badges:
-            # Check if user already has this badge
-            existing = UserBadge.query.filter_by(
-                user_id=user.id, badge_id=badge.id
-            ).first()
-
-            if existing:
-                continue
-
-            # Check if user meets requirements
-            if GamificationService._meets_requirements(user, badge.requirements):
-                user_badge = UserBadge(user_id=user.id, badge_id=badge.id)
-                db.session.add(user_badge)
-
-                # Award experience points for badge
-                if badge.points_reward > 0:
-                    user.add_forum_experience(badge.points_reward)
+    def check_and_award_badges(user, stats=None):
+        """Check if user qualifies for new badges and award them.
 
-                awarded_badges.append(badge)
-
-        if awarded_badges:
-            db.session.commit()
-            for badge in awarded_badges:
-                flash(f"¡Nueva insignia desbloqueada: {badge.name}!", "badge")
+        ``stats`` names the user stats that changed; only badges depending
+        on them are evaluated. Without it every badge is checked.
+        """
+        awarded = badge_rules.award(user, stats)
+        awarded_badges = [db.session.get(ForumBadge, rule.badge_id) for rule in awarded]
+        for badge in awarded_badges:
+            flash(f"¡Nueva insignia desbloqueada: {badge.name}!", "badge")
 
         return awarded_badges
 
     @staticmethod
-    def _meets_requirements(user, requirements):
-        """Check if user meets badge requirements."""
-        if not requirements:
-            return False
-
-        for req_key, req_value in requirements.items():
-            user_value = getattr(user, req_key, 0)
-            if user_value < req_value:
-                return False
-
-        return True
+    def backfill_badges(badge_ids=None):
+        """Award badges to every qualifying user in bulk."""
+        return badge_rules.backfill(badge_ids)
 
     @staticmethod
     def get_user_badges(user, limit=None):
@@ -124,16 +111,7 @@ class GamificationService:
     @staticmethod
     def get_leaderboard(limit=10):
         """Get forum leaderboard based on reputation score."""
-        return (
-            User.query.filter(User.reputation_score > 0)
-            .order_by(
-                User.reputation_score.desc(),
-                User.forum_level.desc(),
-                User.forum_experience.desc(),
-            )
-            .limit(limit)
-            .all()
-        )
+        return leaderboard.top("reputation", limit)
 
     @staticmethod
     def calculate_reputation(user):
@@ -159,14 +137,19 @@ class GamificationService:
     def initialize_default_badges():
         """Initialize default badges in the database."""
         default_badges = ForumBadge.get_default_badges()
+        created = []
 
         for badge_data in default_badges:
             existing = ForumBadge.query.filter_by(name=badge_data["name"]).first()
             if not existing:
                 badge = ForumBadge(**badge_data)
                 db.session.add(badge)
+                created.append(badge)
 
         db.session.commit()
+        if created:
+            # users who already meet them get the new badges right away
+            badge_rules.backfill([badge.id for badge in created])
 
     @staticmethod
     def process_question_action(user, is_first=False, question=None):
@@ -0,0 +1,317 @@
+"""Leaderboards backed by Redis sorted sets.
+
+Each board ranks users by one ``User`` column and lives in a sorted set of
+user ids scored by that column, so the top N is a ``ZREVRANGE`` and a user's
+rank is a ``ZSCORE`` plus a ``ZCOUNT`` of the higher scores, all O(log n)
+instead of a sort or a count over the users table per page view. Ranks are
+competition ranks: users with the same score share one.
+
+The session hooks below keep the boards current: a committed change to a
+ranked column rewrites the user's score (``ZADD``), and the gain is added to
+the ``week`` and ``month`` window boards (``ZINCRBY``), which expire on their
+own once the period is over. Users with nothing to show are left out.
+
+A board without its ``ready`` marker is rebuilt from the database on the next
+read, and the marker expires every ``REBUILD_INTERVAL`` seconds to correct
+drift from bulk updates that skip the hooks; ``rebuild`` does the same on
+demand (``flask leaderboards-rebuild``). The credits windows are rebuilt from
+the credit ledger, the other windows only exist from the moment they are
+first updated. When Redis is unavailable the readers fall back to the
+equivalent SQL.
+"""
+
+from datetime import datetime, timedelta
+import logging
+from numbers import Number
+from typing import Iterable, Optional
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from crunevo.extensions import db, redis_client
+from crunevo.models import Credit, User
+
+log = logging.getLogger(__name__)
+
+PREFIX = "leaderboard"
+REBUILD_INTERVAL = 6 * 3600
+REBUILD_LOCK_TTL = 60
+REBUILD_CHUNK = 1000
+
+# board -> the User column it ranks by; forum levels follow experience
+BOARDS = {
+    "points": "points",
+    "credits": "credits",
+    "reputation": "reputation_score",
+    "level": "forum_experience",
+    "helpful": "helpful_votes",
+    "questions": "questions_asked",
+    "answers": "answers_given",
+    "best_answers": "best_answers",
+}
+WINDOWS = {"week": timedelta(days=14), "month": timedelta(days=62)}
+
+
+def _period(window: str, now: Optional[datetime] = None) -> str:
+    now = now or datetime.utcnow()
+    if window == "week":
+        year, week, _ = now.isocalendar()
+        return f"{year}-w{week:02d}"
+    if window == "month":
+        return f"{now:%Y-%m}"
+    raise ValueError(f"unknown leaderboard window {window!r}")
+
+
+def board_key(board: str, window: Optional[str] = None, now=None) -> str:
+    if board not in BOARDS:
+        raise ValueError(f"unknown leaderboard {board!r}")
+    if window is None:
+        return f"{PREFIX}:{board}"
+    return f"{PREFIX}:{board}:{_period(window, now)}"
+
+
+def _ready_key(board: str) -> str:
+    return f"{PREFIX}:{board}:ready"
+
+
+# -- readers ------------------------------------------------------------------
+
+
+def _ensure(board: str) -> bool:
+    """Make sure ``board`` is built; False if it is being rebuilt elsewhere."""
+    if redis_client.exists(_ready_key(board)):
+        return True
+    lock = f"{PREFIX}:{board}:lock"
+    if not redis_client.set(lock, 1, ex=REBUILD_LOCK_TTL, nx=True):
+        return False
+    try:
+        _rebuild_board(board)
+    finally:
+        redis_client.delete(lock)
+    return True
+
+
+def top_ids(board: str, limit: int = 10, window: Optional[str] = None):
+    """``(user_id, score)`` of the ``limit`` best users, best first."""
+    try:
+        if window is not None or _ensure(board):
+            return [
+                (int(member), int(score))
+                for member, score in redis_client.zrevrange(
+                    board_key(board, window), 0, limit - 1, withscores=True
+                )
+            ]
+    except Exception:
+        log.warning("leaderboard %s unavailable", board, exc_info=True)
+    if window is not None:
+        return []
+    column = getattr(User, BOARDS[board])
+    return [
+        tuple(row)
+        for row in db.session.query(User.id, column)
+        .filter(column > 0)
+        .order_by(column.desc(), User.id)
+        .limit(limit)
+    ]
+
+
+def top_scored(board: str, limit: int = 10, window: Optional[str] = None) -> list:
+    """``(user, score)`` of the ``limit`` best users, best first.
+
+    With a ``window`` the score is what the user gained in that period.
+    """
+    ranked = top_ids(board, limit, window)
+    if not ranked:
+        return []
+    users = {
+        user.id: user
+        for user in User.query.filter(User.id.in_([uid for uid, _ in ranked]))
+    }
+    return [(users[uid], score) for uid, score in ranked if uid in users]
+
+
+def top(board: str, limit: int = 10, window: Optional[str] = None) -> list:
+    """The ``limit`` best users of ``board``, best first."""
+    return [user for user, _ in top_scored(board, limit, window)]
+
+
+def rank(board: str, user_id: int, window: Optional[str] = None) -> int:
+    """1-based rank of the user; users without a score rank after the rest."""
+    try:
+        if window is not None or _ensure(board):
+            key = board_key(board, window)
+            score = float(redis_client.zscore(key, str(user_id)) or 0)
+            return int(redis_client.zcount(key, f"({score}", "+inf")) + 1
+    except Exception:
+        log.warning("leaderboard %s unavailable", board, exc_info=True)
+    column = getattr(User, BOARDS[board])
+    score = db.session.query(column).filter(User.id == user_id).scalar() or 0
+    return User.query.filter(column > score).count() + 1
+
+
+def ranks(user_id: int, boards: Iterable[str], window=None) -> dict:
+    return {board: rank(board, user_id, window) for board in boards}
+
+
+# -- rebuilds -----------------------------------------------------------------
+
+
+def _fill(key: str, rows) -> int:
+    """Replace ``key`` with ``(user_id, score)`` rows, swapping it in at once."""
+    staging = f"{key}:staging"
+    redis_client.delete(staging)
+    total = 0
+    chunk = {}
+    for user_id, score in rows:
+        chunk[str(user_id)] = float(score)
+        if len(chunk) >= REBUILD_CHUNK:
+            redis_client.zadd(staging, chunk)
+            total += len(chunk)
+            chunk = {}
+    if chunk:
+        redis_client.zadd(staging, chunk)
+        total += len(chunk)
+    if total:
+        redis_client.rename(staging, key)
+    else:
+        redis_client.delete(key)
+    return total
+
+
+def _rebuild_board(board: str) -> int:
+    column = getattr(User, BOARDS[board])
+    rows = db.session.execute(
+        select(User.id, column)
+        .where(column > 0)
+        .execution_options(yield_per=REBUILD_CHUNK)
+    )
+    total = _fill(board_key(board), rows)
+    redis_client.setex(_ready_key(board), REBUILD_INTERVAL, 1)
+    return total
+
+
+def _rebuild_credit_windows(now: Optional[datetime] = None) -> None:
+    now = now or datetime.utcnow()
+    starts = {
+        "week": datetime.combine(
+            (now - timedelta(days=now.weekday())).date(), datetime.min.time()
+        ),
+        "month": now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+    }
+    for window, start in starts.items():
+        key = board_key("credits", window, now)
+        rows = db.session.execute(
+            select(Credit.user_id, func.sum(Credit.amount))
+            .where(Credit.amount > 0, Credit.timestamp >= start)
+            .group_by(Credit.user_id)
+        )
+        if _fill(key, rows):
+            redis_client.expire(key, int(WINDOWS[window].total_seconds()))
+
+
+def rebuild(boards: Optional[Iterable[str]] = None) -> dict[str, int]:
+    """Rebuild boards (all by default) from the users table.
+
+    Returns the number of ranked users per board.
+    """
+    boards = list(boards or BOARDS)
+    built = {board: _rebuild_board(board) for board in boards}
+    if "credits" in boards:
+        _rebuild_credit_windows()
+    return built
+
+
+def invalidate(*boards: str) -> None:
+    """Rebuild ``boards`` on their next read; for bulk updates of users."""
+    try:
+        redis_client.delete(*[_ready_key(board) for board in boards or BOARDS])
+    except Exception:
+        log.warning("could not invalidate leaderboards", exc_info=True)
+
+
+# -- session hooks ------------------------------------------------------------
+
+
+def _changes(session) -> list[tuple]:
+    ops = []
+    for obj in session.new:
+        if isinstance(obj, User):
+            for board, attr in BOARDS.items():
+                value = getattr(obj, attr)
+                if isinstance(value, Number) and value:
+                    ops.append((board, obj, value, value))
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        for board, attr in BOARDS.items():
+            history = state.attrs[attr].history
+            if not history.has_changes():
+                continue
+            value = history.added[0] if history.added else None
+            if not isinstance(value, Number):
+                # an SQL expression: the next rebuild picks it up
+                ops.append((board, None, None, None))
+                continue
+            before = history.deleted[0] if history.deleted else None
+            gain = value - before if isinstance(before, Number) else 0
+            ops.append((board, obj, value, gain))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            ops.extend((board, obj, 0, 0) for board in BOARDS)
+    return ops
+
+
+def _before_flush(session, flush_context, instances) -> None:
+    ops = _changes(session)
+    if ops:
+        session.info.setdefault("leaderboard_ops", []).extend(ops)
+
+
+def _after_commit(session) -> None:
+    ops = session.info.pop("leaderboard_ops", None)
+    if not ops:
+        return
+    stale = set()
+    try:
+        pipe = redis_client.pipeline()
+        for board, user, value, gain in ops:
+            if user is None:
+                stale.add(board)
+                continue
+            # new users only get their id on flush; the identity outlives expiry
+            member = str(inspect(user).identity[0])
+            key = board_key(board)
+            if value > 0:
+                pipe.zadd(key, {member: float(value)})
+            else:
+                pipe.zrem(key, member)
+            if gain > 0:
+                for window, ttl in WINDOWS.items():
+                    window_key = board_key(board, window)
+                    pipe.zincrby(window_key, float(gain), member)
+                    pipe.expire(window_key, int(ttl.total_seconds()))
+        pipe.execute()
+    except Exception:
+        log.warning("could not update leaderboards", exc_info=True)
+        stale.update(BOARDS)
+    if stale:
+        invalidate(*stale)
+
+
+def _after_rollback(session, previous_transaction) -> None:
+    session.info.pop("leaderboard_ops", None)
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Register the session hooks that keep the boards current."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
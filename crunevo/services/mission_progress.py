@@ -0,0 +1,264 @@
+"""Incremental mission progress.
+
+Missions count events: notes uploaded, comments posted, reactions received,
+purchases and completed referrals. Instead of counting them again on every
+visit to the missions tab, mapper hooks bump a ``MissionProgress`` counter in
+the same transaction as the row that caused the event. Each event goes to
+its UTC day bucket and to the ``TOTAL`` bucket, so all-time missions read one
+counter, daily and weekly missions sum the last few buckets, and ``load``
+reads every metric of a set of users with a single query.
+
+Writes that bypass the ORM do not fire the hooks. The reconciliation job
+(``crunevo.jobs.mission_progress``) recounts from the source tables, repairs
+any drift and drops day buckets that fell out of ``WINDOW_DAYS``.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Iterable, NamedTuple, Optional
+
+from sqlalchemy import and_, event, inspect, insert, or_, select, update
+
+from crunevo.extensions import db
+from crunevo.models import (
+    MissionProgress,
+    Note,
+    Post,
+    PostComment,
+    PostReaction,
+    Purchase,
+    Referral,
+)
+
+TOTAL = date(1970, 1, 1)
+WINDOW_DAYS = 7
+
+
+class Metric(NamedTuple):
+    """Where the events of a metric live."""
+
+    model: Any
+    owner: Any  # column holding the user the event counts for
+    timestamp: Any
+    join: Optional[tuple] = None
+    where: tuple = ()
+
+
+METRICS = {
+    "notes": Metric(Note, Note.user_id, Note.created_at),
+    "comments": Metric(PostComment, PostComment.author_id, PostComment.timestamp),
+    # reactions received on the user's posts, not counting their own
+    "likes": Metric(
+        PostReaction,
+        Post.author_id,
+        PostReaction.timestamp,
+        join=(Post, Post.id == PostReaction.post_id),
+        where=(PostReaction.user_id != Post.author_id,),
+    ),
+    "purchases": Metric(Purchase, Purchase.user_id, Purchase.timestamp),
+    "referrals": Metric(
+        Referral,
+        Referral.invitador_id,
+        Referral.fecha_creacion,
+        where=(Referral.completado.is_(True),),
+    ),
+}
+
+
+def mission_metric(code: str, category: Optional[str] = None):
+    """The ``(metric, window)`` a mission code counts, None if it counts none.
+
+    ``window`` is ``"total"``, ``"day"`` (today, UTC) or ``"week"`` (the
+    last ``WINDOW_DAYS`` days).
+    """
+    if code.startswith("subir_apuntes_") or code == "primer_apunte":
+        return "notes", "day" if category == "diaria" else "total"
+    if code == "maraton_apuntes":
+        return "notes", "day"
+    if code.startswith("comentar_"):
+        return "comments", "day"
+    if code.startswith("likes_") or code == "primer_like":
+        return "likes", "total"
+    if code.startswith("comprar_producto_"):
+        return "purchases", "total"
+    if code == "referido_maraton":
+        return "referrals", "week"
+    if code.startswith("referido_"):
+        return "referrals", "total"
+    return None
+
+
+def load(user_ids: Iterable[int], today: Optional[date] = None) -> dict:
+    """Counters of each user keyed by ``(metric, window)``, in one query."""
+    user_ids = list(user_ids)
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=WINDOW_DAYS - 1)
+    counters = {user_id: defaultdict(int) for user_id in user_ids}
+    if not user_ids:
+        return counters
+    rows = db.session.query(
+        MissionProgress.user_id,
+        MissionProgress.metric,
+        MissionProgress.bucket,
+        MissionProgress.count,
+    ).filter(
+        MissionProgress.user_id.in_(user_ids),
+        or_(MissionProgress.bucket == TOTAL, MissionProgress.bucket >= since),
+    )
+    for user_id, metric, bucket, count in rows:
+        found = counters[user_id]
+        if bucket == TOTAL:
+            found[metric, "total"] += count
+            continue
+        found[metric, "week"] += count
+        if bucket == today:
+            found[metric, "day"] += count
+    return counters
+
+
+def progress(counters: dict, code: str, category: Optional[str] = None) -> int:
+    """Progress of a mission code given a user's counters from ``load``."""
+    key = mission_metric(code, category)
+    return max(counters.get(key, 0), 0) if key else 0
+
+
+def upsert(connection, rows: list[dict], increment: bool = True) -> None:
+    """Add ``count`` to the counters in ``rows`` (or set it), creating them."""
+    table = MissionProgress.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        count = stmt.excluded["count"]
+        connection.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["user_id", "metric", "bucket"],
+                set_={"count": table.c.count + count if increment else count},
+            ),
+            rows,
+        )
+        return
+    for row in rows:
+        updated = connection.execute(
+            update(table)
+            .where(
+                table.c.user_id == row["user_id"],
+                table.c.metric == row["metric"],
+                table.c.bucket == row["bucket"],
+            )
+            .values(count=table.c.count + row["count"] if increment else row["count"])
+        ).rowcount
+        if not updated:
+            connection.execute(insert(table), row)
+
+
+# -- event hooks ---------------------------------------------------------------
+
+
+def record(connection, metric: str, user_id, moment, delta: int) -> None:
+    """Count ``delta`` events of ``user_id`` at ``moment``.
+
+    Used by the hooks below and by bulk writes that skip them.
+    """
+    if user_id is None:
+        return
+    day = (moment or datetime.utcnow()).date()
+    if delta > 0:
+        upsert(
+            connection,
+            [
+                {"user_id": user_id, "metric": metric, "bucket": bucket, "count": delta}
+                for bucket in (TOTAL, day)
+            ],
+        )
+        return
+    table = MissionProgress.__table__
+    connection.execute(
+        update(table)
+        .where(
+            and_(
+                table.c.user_id == user_id,
+                table.c.metric == metric,
+                table.c.bucket.in_([TOTAL, day]),
+            )
+        )
+        .values(count=table.c.count + delta)
+    )
+
+
+def retract(connection, metric: str, *criteria) -> None:
+    """Uncount the ``metric`` events matching ``criteria``.
+
+    Call it before a bulk ``Query.delete()`` of those rows, which skips the
+    ``after_delete`` hooks.
+    """
+    spec = METRICS[metric]
+    stmt = select(spec.owner, spec.timestamp).select_from(spec.model)
+    if spec.join is not None:
+        stmt = stmt.join(*spec.join)
+    stmt = stmt.where(*spec.where, *criteria)
+    counts = defaultdict(int)
+    for owner, moment in connection.execute(stmt):
+        counts[owner, (moment or datetime.utcnow()).date()] += 1
+    for (owner, day), n in counts.items():
+        record(connection, metric, owner, datetime.combine(day, time()), -n)
+
+
+def _owner(connection, metric: str, target):
+    """The user ``target`` counts for under ``metric``, None if nobody."""
+    if metric == "likes":
+        author = connection.scalar(
+            select(Post.author_id).where(Post.id == target.post_id)
+        )
+        return author if author != target.user_id else None
+    if metric == "referrals" and not target.completado:
+        return None
+    return getattr(target, METRICS[metric].owner.key)
+
+
+def _listeners(metric: str):
+    timestamp = METRICS[metric].timestamp.key
+
+    def after_insert(mapper, connection, target) -> None:
+        owner = _owner(connection, metric, target)
+        record(connection, metric, owner, getattr(target, timestamp), 1)
+
+    def after_delete(mapper, connection, target) -> None:
+        owner = _owner(connection, metric, target)
+        record(connection, metric, owner, getattr(target, timestamp), -1)
+
+    return after_insert, after_delete
+
+
+def _referral_update(mapper, connection, target) -> None:
+    history = inspect(target).attrs.completado.history
+    if not history.has_changes():
+        return
+    was_completed = bool(history.deleted and history.deleted[0])
+    if was_completed != bool(target.completado):
+        record(
+            connection,
+            "referrals",
+            target.invitador_id,
+            target.fecha_creacion,
+            1 if target.completado else -1,
+        )
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Register the mapper hooks that keep the counters current."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    for metric, spec in METRICS.items():
+        after_insert, after_delete = _listeners(metric)
+        event.listen(spec.model, "after_insert", after_insert)
+        event.listen(spec.model, "after_delete", after_delete)
+    event.listen(Referral, "after_update", _referral_update)
@@ -0,0 +1,344 @@
+"""Staged ingestion of uploaded notes.
+
+``upload_note`` only stores the raw file and creates the note with
+``processing_status="pending"``. The stages below then run as background
+tasks, one task per stage, so a failing stage is retried on its own:
+
+``convert`` (docx/pptx to PDF) -> ``thumbnail`` -> ``fingerprint``
+(near-duplicate check) -> ``upload`` -> ``categorize`` -> ``translate`` ->
+``fanout`` (feed items)
+
+Progress is kept in ``Note.processing_state["stages"]``. Failures in the
+optional stages are recorded and skipped; failures in the other stages mark
+the note ``failed`` and are left to the task queue's retries. Once those run
+out the note is discarded so the author can upload the file again.
+
+The file's hash is only recorded, and the upload only rewarded, when the
+note becomes ``ready``: until then a note is invisible and a failed one must
+not block a retry as a duplicate.
+"""
+
+import logging
+import os
+import shutil
+import uuid
+
+import cloudinary.uploader
+import cloudinary.utils
+from flask import current_app
+from pdf2image import convert_from_path
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+from crunevo.extensions import db
+from crunevo.models import FeedItem, Note, NoteHash, NotePageHash
+from crunevo.utils.office import convert_to_pdf
+
+log = logging.getLogger(__name__)
+
+STAGES = (
+    "convert",
+    "thumbnail",
+    "fingerprint",
+    "upload",
+    "categorize",
+    "translate",
+    "fanout",
+)
+OPTIONAL_STAGES = {"thumbnail", "fingerprint", "categorize", "translate"}
+FINGERPRINT_DPI = 50
+OFFICE_EXTS = {".docx", ".pptx"}
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def store_upload(file) -> str:
+    """Save the raw upload in its own work directory and return its path."""
+    workdir = os.path.join(
+        current_app.config.get("INGEST_FOLDER", "instance/ingest"), uuid.uuid4().hex
+    )
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, secure_filename(file.filename))
+    file.save(path)
+    return path
+
+
+def initial_state(raw_path: str, sha256: str | None = None) -> dict:
+    return {
+        "raw": raw_path,
+        "sha256": sha256,
+        "stages": {stage: "pending" for stage in STAGES},
+    }
+
+
+def start(note_id: int) -> None:
+    """Queue the first stage of the note's pipeline."""
+    from crunevo.tasks import task_queue
+
+    task_queue.enqueue(run_stage, note_id, STAGES[0])
+
+
+def run_stage(note_id: int, stage: str) -> None:
+    """Run one pipeline stage and queue the next one."""
+    from crunevo.tasks import task_queue
+
+    note = db.session.get(Note, note_id)
+    if note is None:
+        return
+    state = _update(note, stage, "running", status="processing")
+    db.session.commit()
+    try:
+        STAGE_HANDLERS[stage](note, state)
+    except Exception as e:
+        db.session.rollback()
+        if stage not in OPTIONAL_STAGES:
+            state = _update(note, stage, "failed", status="failed", error=repr(e))
+            attempts = state.get("attempts", 0) + 1
+            state["attempts"] = attempts
+            db.session.commit()
+            # the inline queue never retries; the worker queue stops after
+            # max_retries more runs
+            if attempts > getattr(task_queue, "max_retries", 0):
+                discard(note_id)
+            raise
+        log.exception("note %s: optional stage %s failed", note_id, stage)
+        state = _update(note, stage, "failed")
+    else:
+        state = _update(note, stage, "done", state=state)
+
+    following = STAGES.index(stage) + 1
+    if following < len(STAGES):
+        db.session.commit()
+        task_queue.enqueue(run_stage, note_id, STAGES[following])
+        return
+    note.processing_status = "ready"
+    db.session.commit()
+    _cleanup(state)
+    _complete(note, state)
+
+
+def _complete(note, state: dict) -> None:
+    """Record the file's hash and reward the author of a ready note."""
+    from crunevo.constants import AchievementCodes, CreditReasons
+    from crunevo.models import Referral
+    from crunevo.utils import plagiarism, unlock_achievement
+    from crunevo.utils.credits import add_credit
+
+    if state.get("sha256"):
+        duplicate_id = plagiarism.record_hash(note.id, state["sha256"])
+        if duplicate_id:
+            # the same file was accepted concurrently; keep it for review
+            plagiarism.report_duplicate(
+                note.user_id,
+                duplicate_id,
+                f"Note {note.id} duplicates {duplicate_id}",
+            )
+            db.session.commit()
+    author = note.author
+    author.points += 10
+    add_credit(author, 5, CreditReasons.APUNTE_SUBIDO, related_id=note.id)
+    unlock_achievement(author, AchievementCodes.PRIMER_APUNTE)
+    ref = Referral.query.filter_by(invitado_id=author.id, completado=True).first()
+    if ref:
+        unlock_achievement(ref.invitador, AchievementCodes.ALIADO_EDUCATIVO)
+    db.session.commit()
+
+
+def discard(note_id: int) -> None:
+    """Delete a note whose processing failed for good, so it can be retried."""
+    from crunevo.utils import send_notification
+
+    note = db.session.get(Note, note_id)
+    if note is None or note.processing_status == "ready":
+        return
+    state = note.processing_state or {}
+    user_id, title = note.user_id, note.title
+    for model in (NoteHash, NotePageHash):
+        model.query.filter_by(note_id=note_id).delete(synchronize_session=False)
+    FeedItem.query.filter_by(item_type="apunte", ref_id=note_id).delete(
+        synchronize_session=False
+    )
+    db.session.delete(note)
+    send_notification(
+        user_id,
+        f"No pudimos procesar tu apunte «{title}». Vuelve a subirlo.",
+    )
+    db.session.commit()
+    _cleanup(state)
+
+
+def _update(note, stage, stage_status, status=None, error=None, state=None) -> dict:
+    # JSON columns only detect reassignment, so always store a fresh dict
+    state = dict(state or note.processing_state or {})
+    state["stages"] = {**state.get("stages", {}), stage: stage_status}
+    if error:
+        state["error"] = error
+    note.processing_state = state
+    if status:
+        note.processing_status = status
+    return state
+
+
+def _ext(state: dict) -> str:
+    return os.path.splitext(state["raw"])[1].lower()
+
+
+def _cleanup(state: dict) -> None:
+    workdir = os.path.dirname(state.get("raw", ""))
+    if workdir and os.path.isdir(workdir):
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _convert(note, state: dict) -> None:
+    ext = _ext(state)
+    if ext in OFFICE_EXTS:
+        state["pdf"] = convert_to_pdf(state["raw"], os.path.dirname(state["raw"]))
+    elif ext == ".pdf":
+        state["pdf"] = state["raw"]
+
+
+def _thumbnail(note, state: dict) -> None:
+    if not state.get("pdf"):
+        return
+    images = convert_from_path(state["pdf"], first_page=1, last_page=1, fmt="png")
+    stem = os.path.splitext(os.path.basename(state["raw"]))[0]
+    thumb = os.path.join(os.path.dirname(state["raw"]), f"{stem}_thumb.png")
+    images[0].save(thumb, "PNG")
+    state["thumb"] = thumb
+
+
+def _fingerprint(note, state: dict) -> None:
+    from crunevo.utils import plagiarism
+
+    if state.get("pdf"):
+        pages = convert_from_path(
+            state["pdf"],
+            first_page=1,
+            last_page=plagiarism.NEAR_PAGES,
+            dpi=FINGERPRINT_DPI,
+        )
+    elif _ext(state) in IMAGE_EXTS:
+        pages = [Image.open(state["raw"])]
+    else:
+        return
+    hashes = [plagiarism.dhash(page) for page in pages]
+    match = plagiarism.find_near_duplicate(hashes, exclude_note_id=note.id)
+    if match:
+        plagiarism.report_duplicate(
+            note.user_id, match, f"Note {note.id} closely matches {match}"
+        )
+    plagiarism.record_page_hashes(note.id, hashes)
+
+
+def _upload(note, state: dict) -> None:
+    if current_app.config.get("CLOUDINARY_URL"):
+        _upload_cloudinary(note, state)
+    else:
+        _upload_local(note, state)
+
+
+def _upload_cloudinary(note, state: dict) -> None:
+    ext = _ext(state)
+    public_id = os.path.splitext(os.path.basename(state["raw"]))[0]
+
+    def view_url():
+        url, _ = cloudinary.utils.cloudinary_url(
+            f"notes/{public_id}.pdf", resource_type="image", secure=True
+        )
+        return url
+
+    if ext == ".pdf":
+        result = cloudinary.uploader.upload(
+            state["raw"],
+            resource_type="auto",
+            public_id=f"notes/{public_id}",
+            format="pdf",
+        )
+        note.filename = view_url()
+        note.original_file_url = result["secure_url"]
+    elif ext in OFFICE_EXTS:
+        orig = cloudinary.uploader.upload(
+            state["raw"],
+            resource_type="raw",
+            public_id=f"notes/{public_id}",
+            format=ext[1:],
+        )
+        note.original_file_url = orig["secure_url"]
+        note.filename = orig["secure_url"]
+        if ext == ".pptx":
+            cloudinary.uploader.upload(
+                state["pdf"],
+                resource_type="auto",
+                public_id=f"notes/{public_id}",
+                format="pdf",
+            )
+            note.filename = view_url()
+    else:
+        result = cloudinary.uploader.upload(
+            state["raw"], resource_type="image", public_id=f"notes/{public_id}"
+        )
+        note.filename = note.original_file_url = result["secure_url"]
+
+    if state.get("thumb"):
+        up = cloudinary.uploader.upload(
+            state["thumb"],
+            resource_type="image",
+            public_id=f"notes/{public_id}_thumb",
+        )
+        note.thumbnail_url = up["secure_url"]
+    elif ext in IMAGE_EXTS:
+        note.thumbnail_url = note.filename
+
+
+def _upload_local(note, state: dict) -> None:
+    ext = _ext(state)
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    os.makedirs(upload_folder, exist_ok=True)
+
+    def keep(path):
+        dest = os.path.join(upload_folder, os.path.basename(path))
+        shutil.copyfile(path, dest)
+        return dest
+
+    note.original_file_url = note.filename = keep(state["raw"])
+    if ext == ".pptx":
+        note.filename = keep(state["pdf"])
+    if state.get("thumb"):
+        note.thumbnail_url = keep(state["thumb"])
+    elif ext in IMAGE_EXTS:
+        note.thumbnail_url = note.filename
+
+
+def _categorize(note, state: dict) -> None:
+    from crunevo.utils import suggest_categories
+
+    if note.category:
+        return
+    cats = current_app.config.get("NOTE_CATEGORIES", [])
+    suggested = suggest_categories(f"{note.title} {note.description}", cats)
+    if suggested:
+        note.category = suggested[0]
+
+
+def _translate(note, state: dict) -> None:
+    from crunevo.utils import translate_fields
+
+    trans_folder = os.path.join(current_app.config["TRANSLATIONS_FOLDER"], "notes")
+    langs = current_app.config.get("NOTE_TRANSLATION_LANGS", ["en"])
+    translate_fields(note.id, note.title, note.description, langs, trans_folder)
+
+
+def _fanout(note, state: dict) -> None:
+    from crunevo.utils import create_feed_item_for_all
+
+    create_feed_item_for_all("apunte", note.id)
+
+
+STAGE_HANDLERS = {
+    "convert": _convert,
+    "thumbnail": _thumbnail,
+    "fingerprint": _fingerprint,
+    "upload": _upload,
+    "categorize": _categorize,
+    "translate": _translate,
+    "fanout": _fanout,
+}
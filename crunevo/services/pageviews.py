@@ -0,0 +1,162 @@
+"""Batched page view logging.
+
+``record`` runs on every non-static request and only appends the path to a
+bounded in-memory ring buffer; when the buffer is full the oldest views are
+dropped and counted. A background thread per process writes the buffer out
+every ``PAGEVIEW_FLUSH_INTERVAL`` seconds, or as soon as
+``PAGEVIEW_BATCH_SIZE`` views are waiting: one multi-row INSERT into
+``page_view`` plus an upsert of the per-path, per-hour counters in
+``page_view_hourly``, which is what the admin analytics read.
+"""
+
+import atexit
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app
+
+from crunevo.extensions import db
+from crunevo.models import PageView, PageViewHourly
+
+log = logging.getLogger(__name__)
+
+MAX_PATH_LENGTH = 300
+
+
+def hour_of(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class PageViewBuffer:
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 5,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._views: deque = deque(maxlen=capacity)
+        self._flushing = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def record(self, path: str, now: Optional[datetime] = None) -> None:
+        if len(self._views) == self._views.maxlen:
+            self.dropped += 1
+        # deque.append is atomic; no lock on the request path
+        self._views.append((path[:MAX_PATH_LENGTH], now or datetime.utcnow()))
+        if len(self._views) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write the buffered views and their hourly counts; return rows written."""
+        with self._flushing:
+            batch = []
+            while self._views:
+                batch.append(self._views.popleft())
+            if not batch:
+                return 0
+            try:
+                db.session.execute(
+                    db.insert(PageView),
+                    [{"path": path, "timestamp": moment} for path, moment in batch],
+                )
+                _add_hourly(Counter((path, hour_of(m)) for path, m in batch))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # views are best effort: drop the batch rather than grow
+                self.failed += len(batch)
+                raise
+            self.written += len(batch)
+            return len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._views),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def start(self, app) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,), daemon=True)
+            self._thread.start()
+        atexit.register(self._flush_at_exit, app)
+
+    def _run(self, app) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    log.exception("page view flush failed")
+
+    def _flush_at_exit(self, app) -> None:
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                log.exception("page view flush failed")
+
+
+def _add_hourly(counts: Counter) -> None:
+    rows = [
+        {"path": path, "hour": hour, "count": count}
+        for (path, hour), count in counts.items()
+    ]
+    dialect = db.engine.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(PageViewHourly)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["path", "hour"],
+                set_={"count": PageViewHourly.count + stmt.excluded["count"]},
+            ),
+            rows,
+        )
+        return
+    for row in rows:
+        updated = PageViewHourly.query.filter_by(
+            path=row["path"], hour=row["hour"]
+        ).update({"count": PageViewHourly.count + row["count"]})
+        if not updated:
+            db.session.add(PageViewHourly(**row))
+
+
+def get_buffer(app=None) -> PageViewBuffer:
+    app = app or current_app._get_current_object()
+    buffer = app.extensions.get("pageviews")
+    if buffer is None:
+        buffer = app.extensions["pageviews"] = PageViewBuffer(
+            app.config.get("PAGEVIEW_BUFFER_SIZE", 10_000),
+            app.config.get("PAGEVIEW_BATCH_SIZE", 500),
+            app.config.get("PAGEVIEW_FLUSH_INTERVAL", 5),
+        )
+    return buffer
+
+
+def record(path: str) -> None:
+    """Buffer a page view; the write happens on the flusher thread."""
+    app = current_app._get_current_object()
+    buffer = get_buffer(app)
+    buffer.record(path)
+    if not app.testing:
+        buffer.start(app)
@@ -0,0 +1,312 @@
+"""Full-text search index for the universal search.
+
+Documents from several models live in one index keyed by ``(entity, ref_id)``:
+
+* PostgreSQL: ``search_document`` table with a weighted ``tsvector`` column
+  (Spanish configuration) behind a GIN index, ranked with ``ts_rank``.
+* SQLite: ``search_fts`` FTS5 virtual table (accent-insensitive tokenizer),
+  ranked with ``bm25``.
+
+The index is kept current by SQLAlchemy mapper events on insert, update and
+delete. On other databases, or when the index table is missing, ``match``
+returns ``None`` and callers fall back to ``ILIKE`` filters.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Float, Integer, event, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from crunevo.extensions import db
+
+log = logging.getLogger(__name__)
+
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+REINDEX_BATCH = 500
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    entity: str
+    model: type
+    title: tuple[str, ...]
+    body: tuple[str, ...]
+    # rows failing the predicate are kept out of the index
+    include: Optional[Callable] = None
+    include_fields: tuple[str, ...] = ()
+
+    def changed(self, obj) -> bool:
+        state = inspect(obj)
+        return any(
+            state.attrs[f].history.has_changes()
+            for f in self.title + self.body + self.include_fields
+        )
+
+    def document(self, obj) -> Optional[tuple[str, str]]:
+        if self.include and not self.include(obj):
+            return None
+        return _join(obj, self.title), _join(obj, self.body)
+
+
+def _join(obj, fields) -> str:
+    return " ".join(str(v) for v in (getattr(obj, f, None) for f in fields) if v)
+
+
+def _specs() -> list[IndexSpec]:
+    from crunevo.models import Course, Message, Mission, Note, Post, Product, User
+
+    return [
+        IndexSpec(
+            "note",
+            Note,
+            ("title",),
+            ("description", "tags", "summary", "course", "career"),
+        ),
+        IndexSpec("post", Post, (), ("content",)),
+        IndexSpec("user", User, ("username",), ("email",)),
+        IndexSpec("product", Product, ("name",), ("description",)),
+        IndexSpec("course", Course, ("title",), ("description", "category")),
+        IndexSpec(
+            "chat",
+            Message,
+            (),
+            ("content",),
+            include=lambda m: m.is_global and not m.is_deleted,
+            include_fields=("is_global", "is_deleted"),
+        ),
+        IndexSpec("mission", Mission, ("code",), ("description",)),
+    ]
+
+
+def _terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+class _PostgresIndex:
+    name = "postgresql"
+
+    def ready(self, conn) -> bool:
+        return inspect(conn).has_table("search_document")
+
+    def upsert(self, conn, entity, ref_id, title, body):
+        conn.execute(
+            text(
+                "INSERT INTO search_document (entity, ref_id, tsv) VALUES (:e, :r,"
+                " setweight(to_tsvector('spanish', :t), 'A')"
+                " || setweight(to_tsvector('spanish', :b), 'B'))"
+                " ON CONFLICT (entity, ref_id) DO UPDATE SET tsv = EXCLUDED.tsv"
+            ),
+            {"e": entity, "r": ref_id, "t": title, "b": body},
+        )
+
+    def delete(self, conn, entity, ref_id):
+        conn.execute(
+            text("DELETE FROM search_document WHERE entity = :e AND ref_id = :r"),
+            {"e": entity, "r": ref_id},
+        )
+
+    def clear(self, conn, entity):
+        conn.execute(
+            text("DELETE FROM search_document WHERE entity = :e"), {"e": entity}
+        )
+
+    def match(self, entity, terms):
+        return text(
+            "SELECT ref_id, ts_rank(tsv, to_tsquery('spanish', :q)) AS rank"
+            " FROM search_document"
+            " WHERE entity = :e AND tsv @@ to_tsquery('spanish', :q)"
+        ).bindparams(q=" & ".join(f"{t}:*" for t in terms), e=entity)
+
+
+class _SQLiteIndex:
+    name = "sqlite"
+
+    def ready(self, conn) -> bool:
+        created = not inspect(conn).has_table("search_fts")
+        try:
+            conn.execute(
+                text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+                    "entity UNINDEXED, ref_id UNINDEXED, title, body,"
+                    " tokenize = 'unicode61 remove_diacritics 2')"
+                )
+            )
+        except SQLAlchemyError:
+            log.warning("SQLite FTS5 unavailable; search falls back to LIKE")
+            return False
+        if created:
+            # like the Postgres migration, index the rows that predate the table
+            try:
+                log.info("search index: backfilled %d documents", self.fill(conn))
+            except SQLAlchemyError:
+                log.warning("search index backfill failed", exc_info=True)
+        return True
+
+    def fill(self, conn) -> int:
+        """Index every row of every entity through ``conn``."""
+        insert = text(
+            "INSERT INTO search_fts (entity, ref_id, title, body) VALUES (:e, :r, :t, :b)"
+        )
+        # another process may have filled it already
+        conn.execute(text("DELETE FROM search_fts"))
+        total = 0
+        for spec in _specs():
+            fields = dict.fromkeys(
+                ("id",) + spec.title + spec.body + spec.include_fields
+            )
+            rows = conn.execute(
+                select(*(getattr(spec.model, f) for f in fields)).execution_options(
+                    yield_per=REINDEX_BATCH
+                )
+            )
+            for batch in rows.partitions():
+                docs = [(row.id, spec.document(row)) for row in batch]
+                params = [
+                    {"e": spec.entity, "r": ref_id, "t": doc[0], "b": doc[1]}
+                    for ref_id, doc in docs
+                    if doc is not None
+                ]
+                if params:
+                    conn.execute(insert, params)
+                    total += len(params)
+        return total
+
+    def upsert(self, conn, entity, ref_id, title, body):
+        self.delete(conn, entity, ref_id)
+        conn.execute(
+            text(
+                "INSERT INTO search_fts (entity, ref_id, title, body) VALUES (:e, :r, :t, :b)"
+            ),
+            {"e": entity, "r": ref_id, "t": title, "b": body},
+        )
+
+    def delete(self, conn, entity, ref_id):
+        conn.execute(
+            text("DELETE FROM search_fts WHERE entity = :e AND ref_id = :r"),
+            {"e": entity, "r": ref_id},
+        )
+
+    def clear(self, conn, entity):
+        conn.execute(text("DELETE FROM search_fts WHERE entity = :e"), {"e": entity})
+
+    def match(self, entity, terms):
+        # bm25() is lower for better matches; negate so higher is better
+        return text(
+            "SELECT ref_id, -bm25(search_fts, 0, 0, :tw, :bw) AS rank"
+            " FROM search_fts WHERE search_fts MATCH :q AND entity = :e"
+        ).bindparams(
+            q=" ".join(f'"{t}"*' for t in terms),
+            e=entity,
+            tw=TITLE_WEIGHT,
+            bw=BODY_WEIGHT,
+        )
+
+
+_BACKENDS = {"postgresql": _PostgresIndex(), "sqlite": _SQLiteIndex()}
+_ready: "WeakKeyDictionary" = WeakKeyDictionary()
+_registered: dict[type, IndexSpec] = {}
+
+
+def backend_for(conn):
+    """Return the index backend usable on ``conn``'s engine, or ``None``."""
+    engine = conn.engine
+    if engine not in _ready:
+        backend = _BACKENDS.get(engine.dialect.name)
+        _ready[engine] = backend if backend and backend.ready(conn) else None
+    return _ready[engine]
+
+
+def _after_insert(mapper, conn, obj):
+    _index(_registered[mapper.class_], conn, obj)
+
+
+def _after_update(mapper, conn, obj):
+    spec = _registered[mapper.class_]
+    if spec.changed(obj):
+        _index(spec, conn, obj)
+
+
+def _index(spec, conn, obj):
+    backend = backend_for(conn)
+    if backend is None:
+        return
+    doc = spec.document(obj)
+    if doc is None:
+        backend.delete(conn, spec.entity, obj.id)
+    else:
+        backend.upsert(conn, spec.entity, obj.id, *doc)
+
+
+def _after_delete(mapper, conn, obj):
+    backend = backend_for(conn)
+    if backend is not None:
+        backend.delete(conn, _registered[mapper.class_].entity, obj.id)
+
+
+def prepare() -> Optional[str]:
+    """Set up the index on ``db.engine`` in its own transaction.
+
+    On SQLite this creates and fills ``search_fts`` when it is missing, so
+    rows that predate it are searchable without ``flask search-reindex``.
+    Returns the backend's name, ``None`` without a usable index.
+    """
+    with db.engine.begin() as conn:
+        backend = backend_for(conn)
+    return backend.name if backend else None
+
+
+def init_app(app) -> None:
+    """Register the index maintenance hooks (once per process)."""
+    for spec in _specs():
+        if spec.model in _registered:
+            continue
+        _registered[spec.model] = spec
+        event.listen(spec.model, "after_insert", _after_insert)
+        event.listen(spec.model, "after_update", _after_update)
+        event.listen(spec.model, "after_delete", _after_delete)
+
+
+def match(entity: str, query: str):
+    """Return a ``(ref_id, rank)`` subquery of matches, higher rank first.
+
+    ``None`` means no usable index (or no searchable terms) and the caller
+    should use its ``ILIKE`` fallback.
+    """
+    terms = _terms(query)
+    if not terms:
+        return None
+    backend = backend_for(db.session.connection())
+    if backend is None:
+        return None
+    return (
+        backend.match(entity, terms)
+        .columns(ref_id=Integer, rank=Float)
+        .subquery(f"{entity}_hits")
+    )
+
+
+def rebuild(entities: Optional[list[str]] = None) -> dict[str, int]:
+    """Re-index every row of the given entities (all by default)."""
+    conn = db.session.connection()
+    backend = backend_for(conn)
+    if backend is None:
+        raise RuntimeError("No full-text index available for this database")
+    counts = {}
+    for spec in _specs():
+        if entities and spec.entity not in entities:
+            continue
+        backend.clear(conn, spec.entity)
+        indexed = 0
+        for obj in spec.model.query.yield_per(REINDEX_BATCH):
+            doc = spec.document(obj)
+            if doc is not None:
+                backend.upsert(conn, spec.entity, obj.id, *doc)
+                indexed += 1
+        counts[spec.entity] = indexed
+    db.session.commit()
+    return counts
@@ -0,0 +1,198 @@
+"""Trending searches aggregated from the queries sent to ``/search/api``.
+
+``record`` only normalizes the query and appends it to an in-memory log, so
+it never blocks the request. Each process drains the log into counters per
+``(time bucket, term)``. Every ``TRENDING_FLUSH_INTERVAL`` seconds a
+background thread adds those counts to the ``search_trend`` table, drops
+buckets that fell out of the window and reloads the window's top terms.
+``top`` is then answered from memory: the persisted top-K merged with the
+counts not flushed yet. Because the counts live in the database, trending
+terms survive restarts and are shared by every process.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import func
+
+from crunevo.extensions import db
+from crunevo.models import SearchTrend
+
+log = logging.getLogger(__name__)
+
+BUCKET_MINUTES = 5
+MAX_TERM_LENGTH = 100
+MAX_LOG = 50_000  # queries buffered between drains; oldest dropped first
+MAX_PENDING_TERMS = 10_000  # distinct (bucket, term) pairs held between flushes
+TOP_CACHE = 50  # persisted terms kept in memory
+
+
+def normalize(query: str) -> str:
+    return " ".join(re.findall(r"\w+", query.lower()))[:MAX_TERM_LENGTH]
+
+
+def bucket_of(moment: datetime) -> datetime:
+    return moment.replace(
+        minute=moment.minute - moment.minute % BUCKET_MINUTES,
+        second=0,
+        microsecond=0,
+    )
+
+
+class TrendingSearches:
+    def __init__(self, window_hours: float = 24, flush_interval: float = 60):
+        self.window = timedelta(hours=window_hours)
+        self.flush_interval = flush_interval
+        self._log: deque = deque(maxlen=MAX_LOG)
+        self._pending: Counter = Counter()
+        self._top: list[tuple[str, int]] = []
+        self._lock = threading.Lock()
+        self._flushing = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.dropped = 0
+
+    def record(self, query: str, now: Optional[datetime] = None) -> None:
+        term = normalize(query)
+        if len(term) >= 2:
+            # deque.append is atomic; no lock on the request path
+            self._log.append((now or datetime.utcnow(), term))
+
+    def claim_flush(self) -> bool:
+        """Return True (once per interval) when a flush should be started."""
+        with self._lock:
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                return False
+            if self._flushing.locked():
+                return False
+            self._last_flush = time.monotonic()
+            return True
+
+    def _drain(self) -> None:
+        with self._lock:
+            while self._log:
+                moment, term = self._log.popleft()
+                key = (bucket_of(moment), term)
+                if key not in self._pending and len(self._pending) >= MAX_PENDING_TERMS:
+                    self.dropped += 1
+                    continue
+                self._pending[key] += 1
+
+    def top(self, limit: int = 5, now: Optional[datetime] = None) -> list[dict]:
+        """Most searched terms of the window, without touching the database."""
+        self._drain()
+        cutoff = bucket_of((now or datetime.utcnow()) - self.window)
+        with self._lock:
+            counts = Counter(dict(self._top))
+            for (bucket, term), count in self._pending.items():
+                if bucket >= cutoff:
+                    counts[term] += count
+        return [
+            {"query": term, "count": count} for term, count in counts.most_common(limit)
+        ]
+
+    def flush(self, now: Optional[datetime] = None) -> int:
+        """Persist pending counts and reload the top terms; return rows written."""
+        with self._flushing:
+            self._drain()
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+            try:
+                written = _add_counts(pending)
+                cutoff = bucket_of((now or datetime.utcnow()) - self.window)
+                SearchTrend.query.filter(SearchTrend.bucket < cutoff).delete(
+                    synchronize_session=False
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                with self._lock:
+                    self._pending.update(pending)
+                raise
+            top = (
+                db.session.query(SearchTrend.term, func.sum(SearchTrend.count))
+                .filter(SearchTrend.bucket >= cutoff)
+                .group_by(SearchTrend.term)
+                .order_by(func.sum(SearchTrend.count).desc())
+                .limit(TOP_CACHE)
+                .all()
+            )
+            with self._lock:
+                self._top = [(term, int(count)) for term, count in top]
+            self._last_flush = time.monotonic()
+            return written
+
+
+def _add_counts(pending: Counter) -> int:
+    if not pending:
+        return 0
+    rows = [
+        {"bucket": bucket, "term": term, "count": count}
+        for (bucket, term), count in pending.items()
+    ]
+    dialect = db.engine.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(SearchTrend)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["bucket", "term"],
+                set_={"count": SearchTrend.count + stmt.excluded["count"]},
+            ),
+            rows,
+        )
+        return len(rows)
+    for row in rows:
+        updated = SearchTrend.query.filter_by(
+            bucket=row["bucket"], term=row["term"]
+        ).update({"count": SearchTrend.count + row["count"]})
+        if not updated:
+            db.session.add(SearchTrend(**row))
+    return len(rows)
+
+
+def _flush_in_background(app, trends: TrendingSearches) -> None:
+    with app.app_context():
+        try:
+            trends.flush()
+        except Exception:
+            log.exception("trending searches flush failed")
+
+
+def get_trends(app=None) -> TrendingSearches:
+    app = app or current_app._get_current_object()
+    trends = app.extensions.get("trending")
+    if trends is None:
+        trends = app.extensions["trending"] = TrendingSearches(
+            app.config.get("TRENDING_WINDOW_HOURS", 24),
+            app.config.get("TRENDING_FLUSH_INTERVAL", 60),
+        )
+        if not app.testing:
+            # pick up the persisted window after a restart
+            threading.Thread(
+                target=_flush_in_background, args=(app, trends), daemon=True
+            ).start()
+    return trends
+
+
+def record(query: str) -> None:
+    """Log a search; the flush, when due, runs on a background thread."""
+    app = current_app._get_current_object()
+    trends = get_trends(app)
+    trends.record(query)
+    if not app.testing and trends.claim_flush():
+        threading.Thread(
+            target=_flush_in_background, args=(app, trends), daemon=True
+        ).start()
+
+
+def top(limit: int = 5) -> list[dict]:
+    return get_trends().top(limit)
@@ -127,7 +127,7 @@ function initializeSortable() {
         chosenClass: 'sortable-chosen',
         dragClass: 'sortable-drag',
         onEnd: function(evt) {
-            updateBlockOrder();
+            updateBlockOrder(evt.item);
         }
     });
 }
@@ -1252,7 +1252,12 @@ function toggleBlockFeatured(blockId) {
     });
 }
 
-function updateBlockOrder() {
+function updateBlockOrder(movedCard) {
+    if (movedCard && movedCard.dataset.blockId) {
+        moveBlock(movedCard);
+        return;
+    }
+
     const blocks = [];
     document.querySelectorAll('.block-card').forEach((card, index) => {
         if (card.dataset.blockId) {
@@ -1281,6 +1286,33 @@ function updateBlockOrder() {
     });
 }
 
+function moveBlock(card) {
+    const neighbour = (el, step) => {
+        while ((el = el[step]) && !el.dataset.blockId) {}
+        return el ? el.dataset.blockId : null;
+    };
+
+    csrfFetch(`/api/personal-space/blocks/${card.dataset.blockId}/position`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            after_id: neighbour(card, 'previousElementSibling'),
+            before_id: neighbour(card, 'nextElementSibling')
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            console.error('Error updating order:', data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error updating order:', error);
+    });
+}
+
 // UI Controls
 function toggleDarkMode() {
     try {
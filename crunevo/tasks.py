@@ -1,31 +1,290 @@
+import importlib
 import logging
 import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 
 from .extensions import db
-from .models import User, FeedItem, Note
+from .models import FeedItem, Note
 from .cache.feed_cache import push_items
 from .utils.scoring import compute_score
 
 log = logging.getLogger(__name__)
 
 
+def _task_name(func) -> str:
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def _resolve_task(name: str):
+    module_name, _, attr = name.partition(":")
+    if not module_name.startswith("crunevo."):
+        raise ValueError(f"Refusing to run task outside crunevo: {name}")
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class TaskStats:
+    """Per-task execution counters and timings (milliseconds)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+
+    def record(self, name: str, duration_ms: float, ok: bool) -> None:
+        with self._lock:
+            st = self._stats.setdefault(
+                name,
+                {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0},
+            )
+            st["count"] += 1
+            st["total_ms"] += duration_ms
+            st["max_ms"] = max(st["max_ms"], duration_ms)
+            if not ok:
+                st["failures"] += 1
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.record(name, duration_ms, ok)
+            log.debug(
+                "task %s %s in %.1fms", name, "ok" if ok else "failed", duration_ms
+            )
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                name: {
+                    **st,
+                    "avg_ms": st["total_ms"] / st["count"] if st["count"] else 0.0,
+                }
+                for name, st in self._stats.items()
+            }
+
+
 # Simple synchronous queue used for task execution
 class _LocalQueue:
     """Synchronous task queue."""
 
+    def __init__(self):
+        self.stats = TaskStats()
+
     def enqueue(self, func, *args, **kwargs):
-        return func(*args, **kwargs)
+        with self.stats.timer(_task_name(func)):
+            return func(*args, **kwargs)
+
+
+class SQLiteBackend:
+    """Durable job store in a local SQLite file shared by web and workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS task_job (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    run_at REAL NOT NULL,
+                    last_error TEXT
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_task_job_ready"
+                " ON task_job (status, run_at)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def push(self, payload: str, run_at: float | None = None) -> int:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO task_job (payload, run_at) VALUES (?, ?)",
+                (payload, run_at or time.time()),
+            )
+            return cur.lastrowid
+
+    def claim(self):
+        """Atomically mark the next due job as running and return it."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM task_job"
+                " WHERE status = 'queued' AND run_at <= ?"
+                " ORDER BY run_at, id LIMIT 1",
+                (time.time(),),
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE task_job SET status = 'running' WHERE id = ?", (row[0],)
+                )
+            conn.execute("COMMIT")
+            return row
+        finally:
+            conn.close()
+
+    def ack(self, job_id: int) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM task_job WHERE id = ?", (job_id,))
+
+    def retry(self, job_id: int, run_at: float, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE task_job SET status = 'queued', attempts = attempts + 1,"
+                " run_at = ?, last_error = ? WHERE id = ?",
+                (run_at, error, job_id),
+            )
+
+    def fail(self, job_id: int, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE task_job SET status = 'failed', attempts = attempts + 1,"
+                " last_error = ? WHERE id = ?",
+                (error, job_id),
+            )
+
+    def requeue_running(self) -> int:
+        """Return jobs left running by a crashed worker to the queue."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE task_job SET status = 'queued' WHERE status = 'running'"
+            )
+            return cur.rowcount
+
+    def counts(self) -> dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM task_job GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+class WorkerQueue:
+    """Queue that persists tasks for ``crunevo worker`` to execute.
+
+    Tasks must be module-level functions inside ``crunevo`` and their
+    arguments JSON serializable. Failed tasks are retried with exponential
+    backoff up to ``max_retries`` times.
+    """
+
+    def __init__(self, backend, max_retries: int = 3, retry_delay: float = 5):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.stats = TaskStats()
+
+    def enqueue(self, func, *args, **kwargs):
+        payload = json.dumps({"task": _task_name(func), "args": args, "kwargs": kwargs})
+        return self.backend.push(payload)
+
+    def run_pending(self, limit: int | None = None) -> int:
+        """Execute due jobs until the queue is drained or ``limit`` is hit."""
+        done = 0
+        while limit is None or done < limit:
+            job = self.backend.claim()
+            if job is None:
+                break
+            self._execute(*job)
+            done += 1
+        return done
+
+    def work(self, poll_interval: float = 1.0, stop: threading.Event | None = None):
+        """Process jobs forever (or until ``stop`` is set)."""
+        stop = stop or threading.Event()
+        recovered = self.backend.requeue_running()
+        if recovered:
+            log.warning("worker: requeued %d interrupted tasks", recovered)
+        log.info("worker: started")
+        while not stop.is_set():
+            if not self.run_pending(limit=100):
+                stop.wait(poll_interval)
+
+    def _execute(self, job_id: int, payload: str, attempts: int) -> None:
+        data = json.loads(payload)
+        name = data["task"]
+        try:
+            func = _resolve_task(name)
+            with self.stats.timer(name):
+                func(*data.get("args", []), **data.get("kwargs", {}))
+        except Exception as e:
+            db.session.rollback()
+            if attempts < self.max_retries:
+                delay = self.retry_delay * 2**attempts
+                log.warning("task %s failed (%s), retrying in %.0fs", name, e, delay)
+                self.backend.retry(job_id, time.time() + delay, repr(e))
+            else:
+                log.exception("task %s failed permanently", name)
+                self.backend.fail(job_id, repr(e))
+        else:
+            self.backend.ack(job_id)
+        finally:
+            db.session.remove()
 
 
 task_queue = _LocalQueue()
 
 
+def init_app(app) -> None:
+    """Select the task queue backend from ``TASK_QUEUE_BACKEND``.
+
+    ``sync`` (the default, and always used under testing) runs tasks inline;
+    ``sqlite`` stores them in ``TASK_QUEUE_PATH`` for ``crunevo worker``.
+    """
+    global task_queue
+    backend = app.config.get("TASK_QUEUE_BACKEND", "sync")
+    if app.testing or backend == "sync":
+        if not isinstance(task_queue, _LocalQueue):
+            task_queue = _LocalQueue()
+        return
+    if backend != "sqlite":
+        raise ValueError(f"Unknown TASK_QUEUE_BACKEND: {backend}")
+    task_queue = WorkerQueue(
+        SQLiteBackend(app.config.get("TASK_QUEUE_PATH", "instance/tasks.db")),
+        max_retries=app.config.get("TASK_MAX_RETRIES", 3),
+        retry_delay=app.config.get("TASK_RETRY_DELAY", 5),
+    )
+
+
+def run_worker(app, poll_interval: float = 1.0) -> None:
+    """Run the task worker loop inside ``app``'s context."""
+    if not isinstance(task_queue, WorkerQueue):
+        raise RuntimeError("TASK_QUEUE_BACKEND must be 'sqlite' to run a worker")
+    with app.app_context():
+        task_queue.work(poll_interval=poll_interval)
+
+
 def insert_feed_items(
     item_type, ref_id, meta_dict=None, owner_ids=None, is_highlight=False
 ):
-    """Insert feed items into the database and cache."""
+    """Insert feed items into the database and cache.
+
+    When ``owner_ids`` is ``None`` the item is a broadcast: a single row with
+    no owner is stored and merged into every timeline at read time, so the
+    write cost does not depend on the number of users.
+    """
     if owner_ids is None:
-        owner_ids = [u.id for u in User.query.with_entities(User.id).all()]
+        owner_ids = [FeedItem.BROADCAST]
 
     meta_str = json.dumps(meta_dict) if meta_dict else None
 
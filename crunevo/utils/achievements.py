@@ -1,7 +1,6 @@
 from crunevo.models import UserAchievement, Achievement, Credit, AchievementPopup
 from crunevo.constants.credit_reasons import CreditReasons
 from crunevo.extensions import db
-from crunevo.utils.feed import create_feed_item_for_all
 
 
 def unlock_achievement(user, badge_code):
@@ -33,8 +32,5 @@ def unlock_achievement(user, badge_code):
         )
         db.session.add(popup)
     db.session.commit()
-    meta_dict = {
-        "badge_code": badge_code,
-        "username": user.username,
-    }
-    create_feed_item_for_all("logro", new.id, meta_dict=meta_dict, is_highlight=True)
+    # announced in the feed by the achievement digest job, see
+    # crunevo.jobs.achievement_digest
@@ -0,0 +1,108 @@
+"""Streaming CSV exports.
+
+Exporters register a header and a row generator with ``@exporter``. Row
+generators read with ``yield_per`` (a server-side cursor on PostgreSQL), and
+``stream`` turns them into a chunked response through a small reusable
+buffer, so memory use does not grow with the table. ``?gzip=1`` compresses
+the stream on the fly. Very large tables can be exported with
+``?background=1`` instead: a background task writes a gzipped file to
+``EXPORT_FOLDER`` and the response carries the URL to download it from.
+"""
+
+import csv
+import io
+import os
+import uuid
+import zlib
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from flask import Response, current_app, stream_with_context
+
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 1000
+
+
+class Exporter(NamedTuple):
+    filename: str
+    header: list[str]
+    rows: Callable[[], Iterable[Iterable]]
+
+
+EXPORTERS: dict[str, Exporter] = {}
+
+
+def exporter(name: str, filename: str, header: list[str]):
+    """Register a row generator as the ``name`` export."""
+
+    def decorator(func):
+        EXPORTERS[name] = Exporter(filename, header, func)
+        return func
+
+    return decorator
+
+
+def csv_chunks(header: list[str], rows: Iterable[Iterable]) -> Iterator[bytes]:
+    """Yield the CSV as UTF-8 chunks of roughly ``CHUNK_SIZE`` bytes."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(name: str, gzip: bool = False) -> Response:
+    """Chunked download of the ``name`` export."""
+    export = EXPORTERS[name]
+    chunks = csv_chunks(export.header, export.rows())
+    filename = export.filename
+    mimetype = "text/csv"
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+def export_folder() -> str:
+    return os.path.abspath(current_app.config.get("EXPORT_FOLDER", "instance/exports"))
+
+
+def start_background(name: str) -> str:
+    """Queue a file export of ``name`` and return the file name it will get."""
+    from crunevo.tasks import task_queue
+
+    base = os.path.splitext(EXPORTERS[name].filename)[0]
+    filename = f"{base}-{uuid.uuid4().hex[:12]}.csv.gz"
+    task_queue.enqueue(write_export, name, filename)
+    return filename
+
+
+def write_export(name: str, filename: str) -> None:
+    """Write the ``name`` export to ``EXPORT_FOLDER/filename``."""
+    export = EXPORTERS[name]
+    folder = export_folder()
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, filename)
+    # the download only appears once the file is complete
+    partial = path + ".part"
+    with open(partial, "wb") as fh:
+        for chunk in gzip_chunks(csv_chunks(export.header, export.rows())):
+            fh.write(chunk)
+    os.replace(partial, path)
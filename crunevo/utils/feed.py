@@ -1,13 +1,11 @@
-from crunevo.models import User
-
-
 def create_feed_item_for_all(
     item_type, ref_id, meta_dict=None, owner_ids=None, is_highlight=False
 ):
-    """Enqueue creation of feed items for all or selected users."""
-    if owner_ids is None:
-        owner_ids = [u.id for u in User.query.with_entities(User.id).all()]
+    """Enqueue creation of feed items for all or selected users.
 
+    Without ``owner_ids`` the item is broadcast once to the shared stream
+    instead of being copied into every user's timeline.
+    """
     from crunevo.tasks import task_queue, insert_feed_items
 
     task_queue.enqueue(
@@ -31,3 +31,15 @@ def generate_invoice(purchase):
     c.save()
 
     return path
+
+
+def generate_invoices(purchase_ids):
+    """Render the invoices of ``purchase_ids``; queued by the checkout."""
+    from sqlalchemy.orm import joinedload
+
+    from crunevo.models import Purchase
+
+    purchases = Purchase.query.options(joinedload(Purchase.product)).filter(
+        Purchase.id.in_(purchase_ids)
+    )
+    return [generate_invoice(purchase) for purchase in purchases]
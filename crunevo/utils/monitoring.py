@@ -107,9 +107,17 @@ class CRUNEVOMonitor:
 
             cache_stats = get_cache_stats()
 
+            # Métricas de tareas en segundo plano
+            from crunevo import tasks
+            from crunevo.services import pageviews
+            from crunevo.services.cache_service import get_tiered_cache
+
             perf_metrics = {
                 "request": request_metrics,
                 "cache": cache_stats,
+                "tasks": tasks.task_queue.stats.snapshot(),
+                "pageviews": pageviews.get_buffer().stats(),
+                "cache_tiers": get_tiered_cache().stats(),
                 "timestamp": datetime.utcnow().isoformat(),
             }
 
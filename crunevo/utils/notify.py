@@ -1,23 +1,154 @@
-from crunevo.models.notification import Notification
+"""Notifications and the per-user unread counter.
+
+``send_notification`` writes with a single ``INSERT ... SELECT`` over the
+matching users, so a career or interest broadcast costs one statement
+however many users it reaches. ``User.unread_notifications`` is kept in step
+with the ``notifications`` table: the bulk paths here update it with the
+same filters, and the mapper hooks registered by ``init_app`` cover
+notifications added, read or deleted through the ORM. The badge poll then
+reads the counter instead of running ``COUNT(*)``.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    and_,
+    event,
+    false,
+    insert,
+    inspect,
+    literal,
+    select,
+    true,
+    update,
+)
+
 from crunevo.extensions import db
 from crunevo.models import User
+from crunevo.models.notification import Notification
+
+PAGE_SIZE = 30
+UNREAD_BACKFILL = """
+UPDATE "user" SET unread_notifications = (
+    SELECT COUNT(*) FROM notifications
+    WHERE notifications.user_id = "user".id AND NOT notifications.is_read
+)
+"""
+
+
+def _audience(user_id=None, career=None, interests=None):
+    if user_id is not None:
+        return User.id == user_id
+    clauses = []
+    if career:
+        clauses.append(User.career == career)
+    if interests:
+        clauses.append(User.interests.ilike(f"%{interests}%"))
+    return and_(true(), *clauses)
 
 
 def send_notification(
     user_id=None, message=None, url=None, career=None, interests=None
-):
-    """Send a notification to a single user or a filtered group."""
-    if user_id is not None:
-        users = User.query.filter_by(id=user_id).all()
-    else:
-        query = User.query
-        if career:
-            query = query.filter_by(career=career)
-        if interests:
-            query = query.filter(User.interests.ilike(f"%{interests}%"))
-        users = query.all()
-
-    for u in users:
-        db.session.add(Notification(user_id=u.id, message=message, url=url))
+) -> int:
+    """Send a notification to a single user or a filtered group.
 
+    Returns the number of notifications created.
+    """
+    audience = _audience(user_id, career, interests)
+    rows = select(
+        User.id,
+        literal(message),
+        literal(url),
+        false(),
+        literal(datetime.utcnow()),
+    ).where(audience)
+    result = db.session.execute(
+        insert(Notification).from_select(
+            ["user_id", "message", "url", "is_read", "timestamp"], rows
+        )
+    )
+    if result.rowcount:
+        db.session.execute(
+            update(User)
+            .where(audience)
+            .values(unread_notifications=User.unread_notifications + 1)
+            .execution_options(synchronize_session=False)
+        )
     db.session.commit()
+    return result.rowcount
+
+
+def mark_all_read(user_id: int) -> int:
+    """Mark the user's notifications read; the caller commits."""
+    marked = Notification.query.filter_by(user_id=user_id, is_read=False).update(
+        {"is_read": True}, synchronize_session=False
+    )
+    if marked:
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(unread_notifications=User.unread_notifications - marked)
+            .execution_options(synchronize_session=False)
+        )
+    return marked
+
+
+def page(user_id: int, before: Optional[int] = None, limit: int = PAGE_SIZE):
+    """Newest notifications first, ``limit`` at a time.
+
+    Pages are keyed on the id of the last notification shown, so each page is
+    an index range scan on ``(user_id, id)`` whatever its depth. Returns the
+    page and the ``before`` value of the next one (None on the last page).
+    """
+    query = Notification.query.filter(Notification.user_id == user_id)
+    if before is not None:
+        query = query.filter(Notification.id < before)
+    items = query.order_by(Notification.id.desc()).limit(limit + 1).all()
+    if len(items) > limit:
+        return items[:limit], items[limit - 1].id
+    return items, None
+
+
+# -- unread counter hooks ------------------------------------------------------
+
+
+def _bump(connection, user_id: int, delta: int) -> None:
+    connection.execute(
+        update(User.__table__)
+        .where(User.__table__.c.id == user_id)
+        .values(unread_notifications=User.__table__.c.unread_notifications + delta)
+    )
+
+
+def _after_insert(mapper, connection, target) -> None:
+    if not target.is_read:
+        _bump(connection, target.user_id, 1)
+
+
+def _after_update(mapper, connection, target) -> None:
+    history = inspect(target).attrs.is_read.history
+    if not history.has_changes():
+        return
+    was_read = bool(history.deleted and history.deleted[0])
+    if was_read != bool(target.is_read):
+        _bump(connection, target.user_id, -1 if target.is_read else 1)
+
+
+def _after_delete(mapper, connection, target) -> None:
+    if not target.is_read:
+        _bump(connection, target.user_id, -1)
+
+
+_registered = False
+
+
+def init_app(app) -> None:
+    """Register the mapper hooks that keep the unread counter current."""
+    global _registered
+    if _registered:
+        return
+    _registered = True
+    event.listen(Notification, "after_insert", _after_insert)
+    event.listen(Notification, "after_update", _after_update)
+    event.listen(Notification, "after_delete", _after_delete)
@@ -0,0 +1,192 @@
+"""Pool of long-lived LibreOffice instances for docx/pptx to PDF conversion.
+
+Each slot owns a LibreOffice user profile and, when ``unoserver`` is
+installed, a ``unoserver`` process that stays up between conversions, so
+documents are converted over UNO without paying the soffice start-up on every
+upload. Without ``unoserver`` each conversion still runs ``soffice
+--convert-to``, but against the slot's persistent profile, which skips the
+first-run profile initialisation.
+
+Every web or worker process builds its own pool, so by default slots take
+free ports from the OS each time their server starts and keep their profiles
+under a per-process directory; two pools never share either. Set
+``OFFICE_BASE_PORT`` only when a single process runs the pool.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Optional
+
+# unoserver es opcional
+try:
+    from unoserver.client import UnoClient
+
+    UNOSERVER_AVAILABLE = True
+except ImportError:
+    UNOSERVER_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+START_TIMEOUT = 30
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Slot:
+    def __init__(self, index: int, base_port: int, profile_root: str):
+        # 0: ask the OS for free ports whenever the server (re)starts
+        self.base_port = base_port + 2 * index if base_port else 0
+        self.port = self.uno_port = self.base_port
+        self.profile = os.path.join(profile_root, f"slot-{index}")
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def profile_url(self) -> str:
+        return "file://" + os.path.abspath(self.profile)
+
+    def _ensure_server(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            return
+        os.makedirs(self.profile, exist_ok=True)
+        if self.base_port:
+            self.port, self.uno_port = self.base_port, self.base_port + 1
+        else:
+            self.port, self.uno_port = _free_port(), _free_port()
+        self.process = subprocess.Popen(
+            [
+                "unoserver",
+                "--interface",
+                "127.0.0.1",
+                "--port",
+                str(self.port),
+                "--uno-port",
+                str(self.uno_port),
+                "--user-installation",
+                self.profile_url,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline and self.process.poll() is None:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"unoserver did not start on port {self.port}")
+
+    def convert(self, src: str, outdir: str, timeout: float) -> str:
+        out = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        if UNOSERVER_AVAILABLE:
+            self._ensure_server()
+            UnoClient(port=str(self.port)).convert(
+                inpath=src, outpath=out, convert_to="pdf"
+            )
+        else:
+            os.makedirs(self.profile, exist_ok=True)
+            subprocess.run(
+                [
+                    "soffice",
+                    f"-env:UserInstallation={self.profile_url}",
+                    "--headless",
+                    "--norestore",
+                    "--convert-to",
+                    "pdf",
+                    "--outdir",
+                    outdir,
+                    src,
+                ],
+                check=True,
+                shell=False,
+                timeout=timeout,
+            )
+        return out
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+
+class OfficePool:
+    """Bounded set of converter slots; callers wait for a free one."""
+
+    def __init__(
+        self,
+        size: int = 2,
+        base_port: int = 0,
+        profile_root: Optional[str] = None,
+        timeout: float = 120,
+    ):
+        # LibreOffice locks its profile, so pools in other processes need
+        # their own
+        profile_root = os.path.join(
+            profile_root or os.path.join(tempfile.gettempdir(), "crunevo-office"),
+            f"pid-{os.getpid()}",
+        )
+        self.profile_root = profile_root
+        self.timeout = timeout
+        self._slots = [_Slot(i, base_port, profile_root) for i in range(size)]
+        self._free: queue.Queue = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+
+    def convert(self, src: str, outdir: str) -> str:
+        """Convert ``src`` to PDF inside ``outdir`` and return the PDF path."""
+        slot = self._free.get(timeout=self.timeout)
+        try:
+            return slot.convert(src, outdir, self.timeout)
+        except Exception:
+            # a wedged instance is replaced on the slot's next conversion
+            slot.stop()
+            raise
+        finally:
+            self._free.put(slot)
+
+    def close(self) -> None:
+        for slot in self._slots:
+            slot.stop()
+        shutil.rmtree(self.profile_root, ignore_errors=True)
+
+
+_pool: Optional[OfficePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(config) -> OfficePool:
+    """Return the process-wide pool, created from ``OFFICE_*`` settings."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficePool(
+                size=config.get("OFFICE_POOL_SIZE", 2),
+                base_port=config.get("OFFICE_BASE_PORT", 0),
+                profile_root=config.get("OFFICE_PROFILE_DIR"),
+                timeout=config.get("OFFICE_CONVERT_TIMEOUT", 120),
+            )
+            atexit.register(_pool.close)
+        return _pool
+
+
+def convert_to_pdf(src: str, outdir: str) -> str:
+    from flask import current_app
+
+    return get_pool(current_app.config).convert(src, outdir)
@@ -1,24 +1,88 @@
+"""Duplicate and near-duplicate detection for uploaded notes.
+
+Exact copies are found by SHA-256 in the ``note_hash`` table, whose unique
+index is the source of truth. Each process keeps a Bloom filter of the known
+hashes in front of it, so the common "not a duplicate" answer needs no query.
+
+Near-duplicates (re-saved or re-compressed files) are found by comparing
+perceptual hashes of the first rendered pages (``note_page_hash``). Blank or
+near-uniform pages hash to almost nothing and would match each other, so they
+are left out and such notes rely on the exact check alone.
+"""
+
 import hashlib
-import json
-import os
+import threading
+import time
+from typing import Iterable, Optional
+
 from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "data"))
-HASH_FILE = os.path.join(BASE_DIR, "note_hashes.json")
+from crunevo.extensions import db
+from crunevo.models import NoteHash, NotePageHash, Report, User
 
+HASH_SIZE = 8  # dHash grid: 8x8 differences -> 64-bit hash
+NEAR_DISTANCE = 3  # max differing bits for two pages to match
+NEAR_PAGES = 5  # pages fingerprinted per note
+MIN_HASH_BITS = 8  # fewer set (or clear) bits: a blank page, not a fingerprint
+BLOOM_ERROR_RATE = 0.01
+BLOOM_MIN_CAPACITY = 100_000
+BLOOM_MAX_AGE = 600  # seconds before reloading hashes added by other processes
 
-def _load_hashes():
-    try:
-        with open(HASH_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
 
+class BloomFilter:
+    """Bloom filter over hex digests; bit positions are slices of the digest."""
+
+    def __init__(self, capacity: int, error_rate: float = BLOOM_ERROR_RATE):
+        import math
+
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, min(8, round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.loaded_at = time.monotonic()
+
+    def _positions(self, digest: str) -> Iterable[int]:
+        raw = bytes.fromhex(digest)
+        for i in range(self.hashes):
+            yield int.from_bytes(raw[i * 4 : i * 4 + 4], "big") % self.size
+
+    def add(self, digest: str) -> None:
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
 
-def _save_hashes(data: dict) -> None:
-    os.makedirs(BASE_DIR, exist_ok=True)
-    with open(HASH_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+    def __contains__(self, digest: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest)
+        )
+
+
+_bloom_lock = threading.Lock()
+
+
+def _load_bloom() -> BloomFilter:
+    total = db.session.query(db.func.count(NoteHash.note_id)).scalar() or 0
+    bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, total * 2))
+    for (digest,) in db.session.query(NoteHash.sha256).yield_per(10_000):
+        bloom.add(digest)
+    bloom.loaded_at = time.monotonic()
+    current_app.extensions["plagiarism_bloom"] = bloom
+    return bloom
+
+
+def _get_bloom() -> BloomFilter:
+    with _bloom_lock:
+        bloom = current_app.extensions.get("plagiarism_bloom")
+        if (
+            bloom is None
+            or bloom.count >= bloom.capacity
+            or time.monotonic() - bloom.loaded_at > BLOOM_MAX_AGE
+        ):
+            bloom = _load_bloom()
+        return bloom
 
 
 def compute_hash(fileobj) -> str:
@@ -39,11 +103,130 @@ def compute_hash(fileobj) -> str:
 
 def get_duplicate(file_hash: str):
     """Return note id for existing hash or None."""
-    hashes = _load_hashes()
-    return hashes.get(file_hash)
+    if file_hash not in _get_bloom():
+        return None
+    return db.session.query(NoteHash.note_id).filter_by(sha256=file_hash).scalar()
+
+
+def record_hash(note_id: int, file_hash: str):
+    """Store and commit the note's hash; return the id of an existing copy.
+
+    Two workers can accept the same file concurrently; the unique index lets
+    only the first one through and the second gets the original's id back.
+    Call it without other pending changes in the session.
+    """
+    try:
+        db.session.add(NoteHash(note_id=note_id, sha256=file_hash))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # the winner may be another process, so its hash is not in our filter
+        duplicate_id = (
+            db.session.query(NoteHash.note_id).filter_by(sha256=file_hash).scalar()
+        )
+        _remember(file_hash)
+        return duplicate_id
+    _remember(file_hash)
+    return None
+
+
+def _remember(file_hash: str) -> None:
+    with _bloom_lock:
+        bloom = current_app.extensions.get("plagiarism_bloom")
+        if bloom is not None:
+            bloom.add(file_hash)
+
+
+def report_duplicate(user_id: int, duplicate_id: int, description: str) -> None:
+    """File a report for an upload matching ``duplicate_id`` and tell an admin."""
+    from crunevo.utils import send_notification
+
+    db.session.add(Report(user_id=user_id, description=description))
+    admin = User.query.filter_by(role="admin").first()
+    if admin:
+        send_notification(
+            admin.id,
+            f"Posible plagio al subir nota coincidente con {duplicate_id}",
+        )
+
+
+# -- near duplicates ----------------------------------------------------------
+
+
+def dhash(image) -> int:
+    """64-bit difference hash of a PIL image (robust to re-compression)."""
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE))
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = value << 1 | (left > right)
+    return value
+
+
+def informative(value: int) -> bool:
+    """Whether a page hash carries enough detail to compare."""
+    bits = bin(value).count("1")
+    return MIN_HASH_BITS <= bits <= HASH_SIZE * HASH_SIZE - MIN_HASH_BITS
+
+
+def _signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _bands(value: int) -> list[int]:
+    return [(value >> shift) & 0xFFFF for shift in (48, 32, 16, 0)]
+
+
+def find_near_duplicate(
+    hashes: list[int], exclude_note_id: Optional[int] = None
+) -> Optional[int]:
+    """Return a note whose pages match at least half of ``hashes``.
+
+    Pages without detail are ignored; None if no page has any.
+    """
+    hashes = [h for h in hashes if informative(h)]
+    if not hashes:
+        return None
+    bands = [_bands(h) for h in hashes]
+    columns = (
+        NotePageHash.band0,
+        NotePageHash.band1,
+        NotePageHash.band2,
+        NotePageHash.band3,
+    )
+    query = db.session.query(NotePageHash.note_id, NotePageHash.phash).filter(
+        or_(*(column.in_({b[i] for b in bands}) for i, column in enumerate(columns)))
+    )
+    if exclude_note_id is not None:
+        query = query.filter(NotePageHash.note_id != exclude_note_id)
+    matched: dict[int, set[int]] = {}
+    for note_id, phash in query:
+        phash &= (1 << 64) - 1
+        for i, h in enumerate(hashes):
+            if bin(h ^ phash).count("1") <= NEAR_DISTANCE:
+                matched.setdefault(note_id, set()).add(i)
+    needed = (len(hashes) + 1) // 2
+    best = max(matched.items(), key=lambda kv: len(kv[1]), default=None)
+    if best and len(best[1]) >= needed:
+        return best[0]
+    return None
 
 
-def record_hash(note_id: int, file_hash: str) -> None:
-    hashes = _load_hashes()
-    hashes[file_hash] = note_id
-    _save_hashes(hashes)
+def record_page_hashes(note_id: int, hashes: list[int]) -> None:
+    """Store the note's informative page hashes for later comparisons."""
+    db.session.add_all(
+        NotePageHash(
+            note_id=note_id,
+            page=page,
+            phash=_signed(h),
+            band0=b[0],
+            band1=b[1],
+            band2=b[2],
+            band3=b[3],
+        )
+        for page, (h, b) in enumerate(zip(hashes, map(_bands, hashes)), start=1)
+        if informative(h)
+    )
@@ -1,43 +1,131 @@
 from datetime import datetime, timedelta
+from sqlalchemy import func, insert, literal, or_, and_, select, union, union_all
+from sqlalchemy.orm import joinedload
 from crunevo.extensions import db
-from crunevo.models import User, Note, RankingCache
+from crunevo.models import Note, NoteVote, Credit, RankingCache
 from crunevo.utils import unlock_achievement
 from crunevo.constants import AchievementCodes
 
+WINDOW = timedelta(days=7)
 
-def calculate_weekly_ranking():
-    """Compute and store the weekly ranking for all users."""
-    start_date = datetime.utcnow() - timedelta(days=7)
-    db.session.query(RankingCache).filter_by(period="semanal").delete()
-
-    users = User.query.all()
-    created = []
-    for user in users:
-        apuntes = Note.query.filter(
-            Note.author == user, Note.created_at >= start_date
-        ).count()
-        votos = sum(
-            getattr(n, "votes", getattr(n, "likes", 0))
-            for n in Note.query.filter(
-                Note.author == user, Note.created_at >= start_date
-            ).all()
-        )  # usa n.votes o n.likes si existen
+
+def _weekly_activity(start_date, user_ids=None):
+    """Aggregate notes, votes and positive credits per user since ``start_date``.
+
+    Returns ``(user_id, apuntes, votos, creditos)`` rows from a single
+    statement; ``user_ids`` restricts the aggregation to those users.
+    """
+    notes = select(
+        Note.user_id.label("user_id"),
+        func.count(Note.id).label("apuntes"),
+        func.coalesce(func.sum(Note.likes), 0).label("votos"),
+        literal(0).label("creditos"),
+    ).where(Note.created_at >= start_date)
+    credits = select(
+        Credit.user_id.label("user_id"),
+        literal(0).label("apuntes"),
+        literal(0).label("votos"),
+        func.sum(Credit.amount).label("creditos"),
+    ).where(Credit.timestamp >= start_date, Credit.amount > 0)
+    if user_ids is not None:
+        notes = notes.where(Note.user_id.in_(user_ids))
+        credits = credits.where(Credit.user_id.in_(user_ids))
+    activity = union_all(
+        notes.group_by(Note.user_id), credits.group_by(Credit.user_id)
+    ).subquery()
+    return db.session.execute(
+        select(
+            activity.c.user_id,
+            func.sum(activity.c.apuntes),
+            func.sum(activity.c.votos),
+            func.sum(activity.c.creditos),
+        ).group_by(activity.c.user_id)
+    ).all()
+
+
+def _changed_user_ids(last_run, start_date):
+    """Users whose weekly score may differ from the one stored at ``last_run``.
+
+    Covers new notes, credits and votes since the last run, plus activity
+    that has slid out of the window in the meantime.
+    """
+    dropped_from = last_run - WINDOW
+    changed = union(
+        select(Note.user_id).where(
+            or_(
+                Note.created_at > last_run,
+                and_(Note.created_at >= dropped_from, Note.created_at < start_date),
+            )
+        ),
+        select(Credit.user_id).where(
+            Credit.amount > 0,
+            or_(
+                Credit.timestamp > last_run,
+                and_(Credit.timestamp >= dropped_from, Credit.timestamp < start_date),
+            ),
+        ),
+        select(Note.user_id)
+        .join(NoteVote, NoteVote.note_id == Note.id)
+        .where(NoteVote.timestamp > last_run, Note.created_at >= start_date),
+    )
+    return [uid for (uid,) in db.session.execute(changed)]
+
+
+def calculate_weekly_ranking(incremental: bool = False):
+    """Compute and store the weekly ranking for all users.
+
+    With ``incremental`` only users with activity since the previous run are
+    recomputed; the first run (or one without a previous ranking) is full.
+    """
+    now = datetime.utcnow()
+    start_date = now - WINDOW
+    stored = RankingCache.query.filter_by(period="semanal")
+
+    last_run = None
+    if incremental:
+        last_run = (
+            db.session.query(func.max(RankingCache.calculated_at))
+            .filter_by(period="semanal")
+            .scalar()
+        )
+    if last_run is not None:
+        user_ids = _changed_user_ids(last_run, start_date)
+        if not user_ids:
+            return
+        stored.filter(RankingCache.user_id.in_(user_ids)).delete(
+            synchronize_session=False
+        )
+        activity = _weekly_activity(start_date, user_ids)
+    else:
+        stored.delete(synchronize_session=False)
+        activity = _weekly_activity(start_date)
+
+    rows = []
+    for user_id, apuntes, votos, creditos in activity:
         # Respuestas útiles en el foro (a implementar cuando el foro esté listo)
         respuestas = 0
-        creditos = sum(
-            float(c.amount)
-            for c in getattr(user, "credit_history", [])  # puede estar vacío
-            if c.timestamp >= start_date and c.amount > 0
+        score = int(
+            (5 * apuntes) + (2 * respuestas) + (1 * votos) + (10 * float(creditos))
         )
-
-        score = int((5 * apuntes) + (2 * respuestas) + (1 * votos) + (10 * creditos))
         if score > 0:
-            rc = RankingCache(user_id=user.id, score=score, period="semanal")
-            db.session.add(rc)
-            created.append(rc)
-
+            rows.append(
+                {
+                    "user_id": user_id,
+                    "score": score,
+                    "period": "semanal",
+                    "calculated_at": now,
+                }
+            )
+    if rows:
+        db.session.execute(insert(RankingCache), rows)
     db.session.commit()
 
-    ranked = sorted(created, key=lambda r: r.score, reverse=True)
-    for rc in ranked[:3]:
+    top = (
+        RankingCache.query.options(joinedload(RankingCache.user))
+        .filter_by(period="semanal")
+        .order_by(RankingCache.score.desc())
+        .limit(3)
+        .all()
+    )
+    for rc in top:
         unlock_achievement(rc.user, AchievementCodes.TOP_3)
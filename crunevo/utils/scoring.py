@@ -52,3 +52,10 @@ def update_feed_score(note_id: int) -> None:
                     }
                 ],
             )
+
+
+def schedule_feed_score_update(note_id: int) -> None:
+    """Enqueue ``update_feed_score`` on the background task queue."""
+    from crunevo.tasks import task_queue
+
+    task_queue.enqueue(update_feed_score, note_id)
@@ -0,0 +1,27 @@
+"""allow broadcast feed items without owner
+
+Revision ID: feed_item_broadcast_rows
+Revises: 4d579e45b598
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "feed_item_broadcast_rows"
+down_revision = "4d579e45b598"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("feed_item", schema=None) as batch_op:
+        batch_op.alter_column("owner_id", existing_type=sa.Integer(), nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM feed_item WHERE owner_id IS NULL")
+    with op.batch_alter_table("feed_item", schema=None) as batch_op:
+        batch_op.alter_column("owner_id", existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,76 @@
+"""per-user mission progress counters
+
+Revision ID: mission_progress_counters
+Revises: notification_unread_counter
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "mission_progress_counters"
+down_revision = "notification_unread_counter"
+branch_labels = None
+depends_on = None
+
+# metric -> (owner, timestamp, FROM ... WHERE ...), as in
+# crunevo.services.mission_progress.METRICS
+SOURCES = {
+    "notes": ("note.user_id", "note.created_at", "note WHERE 1 = 1"),
+    "comments": (
+        "post_comment.author_id",
+        "post_comment.timestamp",
+        "post_comment WHERE post_comment.author_id IS NOT NULL",
+    ),
+    "likes": (
+        "post.author_id",
+        "post_reaction.timestamp",
+        "post_reaction JOIN post ON post.id = post_reaction.post_id"
+        " WHERE post_reaction.user_id != post.author_id",
+    ),
+    "purchases": ("purchase.user_id", "purchase.timestamp", "purchase WHERE 1 = 1"),
+    "referrals": (
+        "referrals.invitador_id",
+        "referrals.fecha_creacion",
+        "referrals WHERE referrals.completado",
+    ),
+}
+
+
+def upgrade():
+    op.create_table(
+        "mission_progress",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("metric", sa.String(length=20), nullable=False),
+        sa.Column("bucket", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id", "metric", "bucket"),
+    )
+
+    since = (datetime.utcnow() - timedelta(days=6)).date().isoformat()
+    for metric, (owner, timestamp, source) in SOURCES.items():
+        op.execute(
+            f"""
+            INSERT INTO mission_progress (user_id, metric, bucket, count)
+            SELECT {owner}, '{metric}', '1970-01-01', COUNT(*)
+            FROM {source}
+            GROUP BY {owner}
+            """
+        )
+        op.execute(
+            f"""
+            INSERT INTO mission_progress (user_id, metric, bucket, count)
+            SELECT {owner}, '{metric}', date({timestamp}), COUNT(*)
+            FROM {source} AND {timestamp} >= '{since}'
+            GROUP BY {owner}, date({timestamp})
+            """
+        )
+
+
+def downgrade():
+    op.drop_table("mission_progress")
@@ -0,0 +1,82 @@
+"""indexed note hashes for duplicate detection
+
+Revision ID: note_hash_index
+Revises: note_processing_status
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+import json
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "note_hash_index"
+down_revision = "note_processing_status"
+branch_labels = None
+depends_on = None
+
+LEGACY_FILE = os.path.join(
+    os.path.dirname(__file__),
+    os.pardir,
+    os.pardir,
+    "crunevo",
+    "data",
+    "note_hashes.json",
+)
+
+
+def upgrade():
+    op.create_table(
+        "note_hash",
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["note_id"], ["note.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("note_id"),
+        sa.UniqueConstraint("sha256"),
+    )
+    op.create_table(
+        "note_page_hash",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("note_id", sa.Integer(), nullable=False),
+        sa.Column("page", sa.Integer(), nullable=False),
+        sa.Column("phash", sa.BigInteger(), nullable=False),
+        sa.Column("band0", sa.Integer(), nullable=False),
+        sa.Column("band1", sa.Integer(), nullable=False),
+        sa.Column("band2", sa.Integer(), nullable=False),
+        sa.Column("band3", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["note_id"], ["note.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    for column in ("note_id", "band0", "band1", "band2", "band3"):
+        op.create_index(
+            f"ix_note_page_hash_{column}", "note_page_hash", [column], unique=False
+        )
+
+    # carry over the hashes kept in crunevo/data/note_hashes.json
+    try:
+        with open(LEGACY_FILE, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError):
+        return
+    conn = op.get_bind()
+    existing = {row[0] for row in conn.execute(sa.text("SELECT id FROM note"))}
+    rows, seen = [], set()
+    for digest, note_id in legacy.items():
+        if note_id in existing and note_id not in seen:
+            seen.add(note_id)
+            rows.append({"note_id": note_id, "sha256": digest})
+    if rows:
+        op.bulk_insert(
+            sa.table("note_hash", sa.column("note_id"), sa.column("sha256")), rows
+        )
+
+
+def downgrade():
+    for column in ("band3", "band2", "band1", "band0", "note_id"):
+        op.drop_index(f"ix_note_page_hash_{column}", table_name="note_page_hash")
+    op.drop_table("note_page_hash")
+    op.drop_table("note_hash")
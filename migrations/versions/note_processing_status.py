@@ -0,0 +1,35 @@
+"""track note ingestion pipeline progress
+
+Revision ID: note_processing_status
+Revises: search_trend_counts
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "note_processing_status"
+down_revision = "search_trend_counts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("note", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "processing_status",
+                sa.String(length=20),
+                nullable=False,
+                server_default="ready",
+            )
+        )
+        batch_op.add_column(sa.Column("processing_state", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("note", schema=None) as batch_op:
+        batch_op.drop_column("processing_state")
+        batch_op.drop_column("processing_status")
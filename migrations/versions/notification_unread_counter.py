@@ -0,0 +1,48 @@
+"""unread notification counter and keyset index
+
+Revision ID: notification_unread_counter
+Revises: page_view_hourly_rollup
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "notification_unread_counter"
+down_revision = "page_view_hourly_rollup"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "unread_notifications",
+                sa.Integer(),
+                nullable=False,
+                server_default="0",
+            )
+        )
+    op.create_index(
+        "ix_notifications_user_id_id",
+        "notifications",
+        ["user_id", "id"],
+        unique=False,
+    )
+    op.execute(
+        """
+        UPDATE "user" SET unread_notifications = (
+            SELECT COUNT(*) FROM notifications
+            WHERE notifications.user_id = "user".id AND NOT notifications.is_read
+        )
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notifications_user_id_id", table_name="notifications")
+    with op.batch_alter_table("user", schema=None) as batch_op:
+        batch_op.drop_column("unread_notifications")
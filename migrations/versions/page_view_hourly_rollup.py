@@ -0,0 +1,45 @@
+"""hourly page view rollups
+
+Revision ID: page_view_hourly_rollup
+Revises: note_hash_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "page_view_hourly_rollup"
+down_revision = "note_hash_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "page_view_hourly",
+        sa.Column("path", sa.String(length=300), nullable=False),
+        sa.Column("hour", sa.DateTime(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("path", "hour"),
+    )
+    op.create_index(
+        "ix_page_view_hourly_hour", "page_view_hourly", ["hour"], unique=False
+    )
+
+    if op.get_bind().dialect.name == "postgresql":
+        hour = "date_trunc('hour', timestamp)"
+    else:
+        hour = "strftime('%Y-%m-%d %H:00:00.000000', timestamp)"
+    op.execute(
+        f"""
+        INSERT INTO page_view_hourly (path, hour, count)
+        SELECT path, {hour}, COUNT(*) FROM page_view GROUP BY path, {hour}
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("ix_page_view_hourly_hour", table_name="page_view_hourly")
+    op.drop_table("page_view_hourly")
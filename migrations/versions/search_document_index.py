@@ -0,0 +1,73 @@
+"""full-text search index table
+
+Revision ID: search_document_index
+Revises: feed_item_broadcast_rows
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "search_document_index"
+down_revision = "feed_item_broadcast_rows"
+branch_labels = None
+depends_on = None
+
+# entity -> (table, title columns, body columns, row filter)
+DOCUMENTS = {
+    "note": (
+        "note",
+        ["title"],
+        ["description", "tags", "summary", "course", "career"],
+        None,
+    ),
+    "post": ("post", [], ["content"], None),
+    "user": ('"user"', ["username"], ["email"], None),
+    "product": ("product", ["name"], ["description"], None),
+    "course": ("courses", ["title"], ["description", "category"], None),
+    "chat": ("message", [], ["content"], "is_global AND NOT is_deleted"),
+    "mission": ("mission", ["code"], ["description"], None),
+}
+
+
+def _text(columns):
+    if not columns:
+        return "''"
+    return "concat_ws(' ', " + ", ".join(f"{c}::text" for c in columns) + ")"
+
+
+def upgrade():
+    # SQLite keeps its FTS5 table outside the migrations (created on demand)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.create_table(
+        "search_document",
+        sa.Column("entity", sa.String(length=20), nullable=False),
+        sa.Column("ref_id", sa.Integer(), nullable=False),
+        sa.Column("tsv", postgresql.TSVECTOR(), nullable=False),
+        sa.PrimaryKeyConstraint("entity", "ref_id"),
+    )
+    op.create_index(
+        "ix_search_document_tsv",
+        "search_document",
+        ["tsv"],
+        postgresql_using="gin",
+    )
+    for entity, (table, title, body, where) in DOCUMENTS.items():
+        op.execute(
+            "INSERT INTO search_document (entity, ref_id, tsv)"
+            f" SELECT '{entity}', id,"
+            f" setweight(to_tsvector('spanish', {_text(title)}), 'A')"
+            f" || setweight(to_tsvector('spanish', {_text(body)}), 'B')"
+            f" FROM {table}" + (f" WHERE {where}" if where else "")
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_search_document_tsv", table_name="search_document")
+    op.drop_table("search_document")
@@ -0,0 +1,30 @@
+"""search trend counters
+
+Revision ID: search_trend_counts
+Revises: search_document_index
+Create Date: 2026-10-18 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "search_trend_counts"
+down_revision = "search_document_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "search_trend",
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("term", sa.String(length=100), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket", "term"),
+    )
+
+
+def downgrade():
+    op.drop_table("search_trend")
@@ -0,0 +1,105 @@
+"""Load test for the checkout stock decrement.
+
+Many threads try to buy the same product at once through
+``crunevo.services.checkout.reserve_stock``, each in its own transaction,
+and the run fails if more units were sold than were in stock.
+
+    python scripts/checkout_load_test.py --threads 64 --orders 50 --stock 500
+
+``DATABASE_URL`` selects the database (a temporary SQLite file by default).
+Point it at a scratch database: the schema is created there if missing.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, delete, insert, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crunevo.extensions import db  # noqa: E402
+from crunevo.models import Product  # noqa: E402
+from crunevo.services.checkout import reserve_stock  # noqa: E402
+
+
+def run(url: str, threads: int, orders: int, stock: int, quantity: int) -> dict:
+    engine = create_engine(url, pool_size=threads, max_overflow=0)
+    db.metadata.create_all(engine)
+    table = Product.__table__
+    with engine.begin() as conn:
+        product_id = conn.execute(
+            insert(table)
+            .values(name="load test", price=1, stock=stock)
+            .returning(table.c.id)
+        ).scalar_one()
+
+    sold = [0] * threads
+    errors = []
+    start_line = threading.Barrier(threads)
+
+    def buyer(slot: int) -> None:
+        start_line.wait()
+        for _ in range(orders):
+            try:
+                with engine.begin() as conn:
+                    if reserve_stock(conn, {product_id: quantity}):
+                        sold[slot] += quantity
+            except Exception as exc:  # lock timeouts count as failed orders
+                errors.append(exc)
+
+    workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    with engine.begin() as conn:
+        left = conn.execute(
+            select(table.c.stock).where(table.c.id == product_id)
+        ).scalar_one()
+        conn.execute(delete(table).where(table.c.id == product_id))
+    engine.dispose()
+    return {
+        "attempts": threads * orders,
+        "sold": sum(sold),
+        "left": left,
+        "errors": len(errors),
+        "orders_per_second": threads * orders / elapsed,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--quantity", type=int, default=1)
+    args = parser.parse_args()
+
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        url = f"sqlite:///{tempfile.mkdtemp()}/checkout_load_test.db"
+    if url.startswith("sqlite"):
+        url += "?timeout=30" if "?" not in url else "&timeout=30"
+    stats = run(url, args.threads, args.orders, args.stock, args.quantity)
+    for key, value in stats.items():
+        print(f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}")
+
+    expected = min(args.stock // args.quantity, stats["attempts"]) * args.quantity
+    if stats["sold"] + stats["left"] != args.stock or stats["left"] < 0:
+        print("OVERSOLD")
+        return 1
+    if not stats["errors"] and stats["sold"] != expected:
+        print(f"expected to sell {expected}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,10 @@ import os
 os.environ.setdefault("SECRET_KEY", "test-secret")
 
 import sys
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -65,12 +68,36 @@ def another_user(db_session):
     return user
 
 
+@pytest.fixture
+def count_queries(app):
+    """Return a context manager collecting the SQL statements run inside it."""
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def before(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", before)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", before)
+
+    return counting
+
+
 @pytest.fixture(autouse=True)
 def reset_caches():
-    feed_cache._cache.clear()
+    feed_cache.clear()
     from crunevo.cache import weather_cache
 
     weather_cache._cache.clear()
+    from crunevo.extensions import MockRedis, redis_client
+
+    if isinstance(redis_client, MockRedis):
+        redis_client.flushdb()
     from crunevo import tasks
 
     tasks.task_queue = tasks._LocalQueue()
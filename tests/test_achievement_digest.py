@@ -0,0 +1,90 @@
+import json
+from datetime import datetime, timedelta
+
+from crunevo.cache import feed_cache
+from crunevo.jobs.achievement_digest import publish_achievement_digests
+from crunevo.models import FeedItem, User
+from crunevo.utils.achievements import unlock_achievement
+
+
+def make_user(db_session, name, career):
+    user = User(
+        username=name,
+        email=f"{name}@example.com",
+        career=career,
+        activated=True,
+        avatar_url="a",
+    )
+    user.set_password("secret")
+    db_session.add(user)
+    return user
+
+
+def test_unlocks_are_coalesced_per_window_and_career(db_session):
+    med = [make_user(db_session, f"med{i}", "Medicina") for i in range(3)]
+    law = make_user(db_session, "law", "Derecho")
+    db_session.commit()
+
+    for user in med[:2]:
+        unlock_achievement(user, "TOP_3")
+    assert FeedItem.query.count() == 0
+
+    later = datetime.utcnow() + timedelta(hours=1)
+    stats = publish_achievement_digests(later)
+
+    assert (stats["unlocks"], stats["digests"]) == (2, 1)
+    owners = {item.owner_id for item in FeedItem.query}
+    assert owners == {u.id for u in med}
+    meta = json.loads(FeedItem.query.first().metadata)
+    assert meta["count"] == 2
+    assert meta["summary"] == "2 estudiantes de Medicina desbloquearon TOP_3"
+    assert law.id not in owners
+
+    # the watermark keeps a second run from publishing the window again
+    assert publish_achievement_digests(later)["digests"] == 0
+
+
+def test_audience_is_capped_but_keeps_the_unlocker(app, db_session):
+    app.config["ACHIEVEMENT_DIGEST_AUDIENCE"] = 2
+    users = [make_user(db_session, f"u{i}", "Arte") for i in range(5)]
+    db_session.commit()
+
+    unlock_achievement(users[-1], "TOP_3")
+    publish_achievement_digests(datetime.utcnow() + timedelta(hours=1))
+
+    owners = [item.owner_id for item in FeedItem.query]
+    assert len(owners) == 2
+    assert users[-1].id in owners
+
+
+def test_digests_reach_only_cached_timelines(client, db_session):
+    viewer = make_user(db_session, "viewer", "Medicina")
+    unlocker = make_user(db_session, "unlocker", "Medicina")
+    db_session.commit()
+    feed_cache.mark_warm(viewer.id)
+    feed_cache.push_items(
+        viewer.id,
+        [
+            {
+                "score": 1,
+                "created_at": datetime.utcnow(),
+                "payload": {"item_type": "post", "ref_id": 1},
+            }
+        ],
+    )
+
+    unlock_achievement(unlocker, "TOP_3")
+    publish_achievement_digests(datetime.utcnow() + timedelta(hours=1))
+    assert feed_cache.fetch(unlocker.id) == []
+
+    client.post("/login", data={"username": "viewer", "password": "secret"})
+    items = client.get("/api/feed").get_json()
+    # the cached post is still there, and the digest joined it
+    assert [it["item_type"] for it in items] == ["post", "logro"]
+    assert items[1]["summary"] == "unlocker desbloqueó TOP_3"
+
+    # the cold timeline reads the committed row instead
+    client.get("/logout")
+    client.post("/login", data={"username": "unlocker", "password": "secret"})
+    items = client.get("/api/feed").get_json()
+    assert [it["item_type"] for it in items] == ["logro"]
@@ -0,0 +1,72 @@
+import csv
+import gzip
+import io
+
+from crunevo.models import Credit, User
+from crunevo.utils import csv_export
+
+
+def login(client, username, password):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def make_admin(db_session):
+    admin = User(
+        username="admin",
+        email="admin@example.com",
+        role="admin",
+        activated=True,
+        avatar_url="a",
+    )
+    admin.set_password("pass")
+    db_session.add(admin)
+    db_session.commit()
+    return admin
+
+
+def test_credit_export_streams_csv(client, db_session, test_user):
+    make_admin(db_session)
+    db_session.add_all(
+        Credit(user_id=test_user.id, amount=i, reason="test") for i in range(3)
+    )
+    db_session.commit()
+    login(client, "admin", "pass")
+
+    resp = client.get("/admin/credits/export")
+
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == "text/csv"
+    rows = list(csv.reader(io.StringIO(resp.get_data(as_text=True))))
+    assert rows[0] == ["ID", "Usuario", "Email", "Monto", "Razón", "Fecha"]
+    assert sorted(r[3] for r in rows[1:]) == ["0.00", "1.00", "2.00"]
+    assert {r[1] for r in rows[1:]} == {test_user.username}
+
+
+def test_export_gzip_and_background(client, app, db_session, tmp_path):
+    app.config["EXPORT_FOLDER"] = str(tmp_path)
+    make_admin(db_session)
+    login(client, "admin", "pass")
+
+    resp = client.get("/admin/export/users?gzip=1")
+    assert resp.mimetype == "application/gzip"
+    text = gzip.decompress(resp.get_data()).decode()
+    assert text.splitlines()[1].split(",")[1] == "admin"
+
+    resp = client.get("/admin/export/users?background=1")
+    assert resp.status_code == 202
+    download = client.get(resp.get_json()["url"])
+    assert download.status_code == 200
+    assert gzip.decompress(download.get_data()).decode() == text
+    assert client.get("/admin/exports/missing.csv.gz").status_code == 404
+
+
+def test_csv_chunks_are_bounded(monkeypatch):
+    monkeypatch.setattr(csv_export, "CHUNK_SIZE", 1024)
+    rows = ([i, "x" * 50] for i in range(1000))
+
+    chunks = list(csv_export.csv_chunks(["id", "value"], rows))
+
+    assert len(chunks) > 40
+    assert max(len(c) for c in chunks) < 1024 + 100
+    assert b"".join(chunks).count(b"\n") == 1001
@@ -0,0 +1,145 @@
+from sqlalchemy import event
+
+from crunevo.extensions import db
+from crunevo.models import Course, Note
+from crunevo.services import autocomplete
+from crunevo.services.autocomplete import PrefixIndex
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def test_prefix_index_ranks_by_score():
+    index = PrefixIndex(top_k=3)
+    for key, (text, score) in enumerate(
+        [("Cálculo I", 5), ("calculadora", 9), ("Cálculo II", 1), ("Física", 7)]
+    ):
+        index.add(key, text, score)
+
+    assert [text for _, text, _ in index.lookup("calc")] == [
+        "calculadora",
+        "Cálculo I",
+        "Cálculo II",
+    ]
+    assert [text for _, text, _ in index.lookup("fís")] == ["Física"]
+    assert index.lookup("quim") == []
+
+
+def test_prefix_index_updates_and_removals():
+    index = PrefixIndex(top_k=2)
+    for key, score in enumerate([10, 8, 6, 4]):
+        index.add(key, f"tema {key}", score)
+    assert [key for key, _, _ in index.lookup("tema")] == [0, 1]
+
+    # dropping a cached item pulls the next best one from the subtree
+    index.add(0, "tema 0", 1)
+    assert [key for key, _, _ in index.lookup("tema")] == [1, 2]
+    index.remove(1)
+    assert [key for key, _, _ in index.lookup("tema")] == [2, 3]
+    index.add(3, "tema 3", 50)
+    assert [key for key, _, _ in index.lookup("tema")] == [3, 2]
+    index.add(2, "otro", 6)
+    assert [key for key, _, _ in index.lookup("tema")] == [3, 0]
+    assert [key for key, _, _ in index.lookup("otro")] == [2]
+
+
+def test_prefix_index_bounds():
+    index = PrefixIndex(max_depth=4, max_items=2)
+    assert index.add(1, "programacion", 1)
+    assert index.add(2, "progreso", 2)
+    assert not index.add(3, "proyecto", 3)
+    assert index.dropped == 1
+    # queries longer than the indexed depth filter the subtree
+    assert [key for key, _, _ in index.lookup("programa")] == [1]
+    assert [key for key, _, _ in index.lookup("prog")] == [2, 1]
+
+
+def test_suggest_serves_from_memory(app, db_session, test_user):
+    db_session.add_all(
+        [
+            Note(title="Test de álgebra", tags="test, álgebra", author=test_user),
+            Course(
+                title="Testing avanzado",
+                youtube_url="https://youtu.be/x",
+                creator_id=test_user.id,
+            ),
+        ]
+    )
+    db_session.commit()
+    autocomplete.get_index()
+
+    statements = []
+    listener = lambda *args: statements.append(args)  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        found = autocomplete.suggest("tes")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert statements == []
+    assert [(s["type"], s["text"]) for s in found] == [
+        ("user", "tester"),
+        ("note", "Test de álgebra"),
+        ("tag", "test"),
+        ("course", "Testing avanzado"),
+    ]
+
+
+def test_suggest_follows_committed_changes(db_session, test_user):
+    assert autocomplete.suggest("geo") == []
+
+    note = Note(title="Geometría", tags="geo", author=test_user)
+    db_session.add(note)
+    db_session.commit()
+    assert [s["text"] for s in autocomplete.suggest("geo")] == ["Geometría", "geo"]
+
+    note.title = "Trigonometría"
+    note.tags = "trigo"
+    db_session.commit()
+    assert autocomplete.suggest("geo") == []
+    assert [s["type"] for s in autocomplete.suggest("trig")] == ["note", "tag"]
+
+    db_session.delete(note)
+    db_session.commit()
+    assert autocomplete.suggest("trig") == []
+
+    rolled_back = Note(title="Geografía", author=test_user)
+    db_session.add(rolled_back)
+    db_session.flush()
+    db_session.rollback()
+    assert autocomplete.suggest("geo") == []
+
+
+def test_suggest_endpoints(client, db_session, test_user):
+    db_session.add(Note(title="Termodinámica", author=test_user))
+    db_session.commit()
+    login(client, test_user.username)
+
+    resp = client.get("/search/suggestions?q=ter")
+    assert [s["text"] for s in resp.get_json()] == ["Termodinámica"]
+
+    resp = client.get("/api/search/suggest?q=ter")
+    assert resp.get_json()["results"] == [
+        {"type": "note", "title": "Termodinámica", "url": "/notes/1"}
+    ]
+    # one letter is not enough to enumerate titles and usernames
+    assert client.get("/api/search/suggest?q=t").get_json()["results"] == []
+
+
+def test_suggest_api_requires_login(client, db_session, test_user):
+    resp = client.get("/api/search/suggest?q=te")
+    assert resp.status_code == 302
+
+
+def test_snapshot_round_trip(tmp_path, db_session, test_user):
+    db_session.add(Note(title="Biología", tags="bio", author=test_user))
+    db_session.commit()
+    path = str(tmp_path / "autocomplete.json")
+
+    autocomplete.save_snapshot(autocomplete.build(), path)
+    loaded = autocomplete.load_snapshot(path, max_age=60)
+
+    assert [s["text"] for s in loaded.suggest("bio")] == ["Biología", "bio"]
+    assert loaded.tag_counts["bio"] == 1
+    assert autocomplete.load_snapshot(path, max_age=-1) is None
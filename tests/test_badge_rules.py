@@ -0,0 +1,71 @@
+from crunevo.models.badge import ForumBadge, UserBadge
+from crunevo.services import badge_rules
+from crunevo.services.gamification import GamificationService
+
+
+def make_badge(db_session, name, requirements, points=0):
+    badge = ForumBadge(
+        name=name,
+        description=name,
+        icon="x",
+        category="participation",
+        requirements=requirements,
+        points_reward=points,
+    )
+    db_session.add(badge)
+    db_session.commit()
+    return badge
+
+
+def test_only_badges_on_changed_stats_are_evaluated(
+    app, db_session, test_user, count_queries
+):
+    answers = make_badge(db_session, "Respuesta", {"answers_given": 1})
+    questions = make_badge(db_session, "Pregunta", {"questions_asked": 1})
+    test_user.answers_given = test_user.questions_asked = 1
+    db_session.commit()
+
+    with app.test_request_context():
+        awarded = GamificationService.check_and_award_badges(
+            test_user, ("answers_given",)
+        )
+        assert [b.id for b in awarded] == [answers.id]
+
+        # already earned: answered from the in-memory bitset
+        db_session.refresh(test_user)
+        with count_queries() as statements:
+            assert badge_rules.evaluate(test_user, ("answers_given",)) == []
+        assert statements == []
+
+        awarded = GamificationService.check_and_award_badges(test_user)
+        assert [b.id for b in awarded] == [questions.id]
+
+
+def test_rewards_can_unlock_level_badges(app, db_session, test_user):
+    make_badge(db_session, "Primera", {"answers_given": 1}, points=150)
+    level = make_badge(db_session, "Nivel 2", {"forum_level": 2})
+    test_user.answers_given = 1
+    db_session.commit()
+
+    with app.test_request_context():
+        awarded = GamificationService.check_and_award_badges(
+            test_user, ("answers_given",)
+        )
+
+    assert level.id in [b.id for b in awarded]
+    assert test_user.forum_level == 2
+
+
+def test_backfill_awards_in_bulk_once(db_session, test_user, another_user):
+    test_user.helpful_votes = 60
+    another_user.helpful_votes = 10
+    db_session.commit()
+    useful = make_badge(db_session, "Útil", {"helpful_votes": 50}, points=150)
+    level = make_badge(db_session, "Nivel 2", {"forum_level": 2})
+
+    assert badge_rules.backfill() == {useful.id: 1, level.id: 1}
+    assert badge_rules.backfill() == {useful.id: 0, level.id: 0}
+
+    db_session.refresh(test_user)
+    assert (test_user.forum_experience, test_user.forum_level) == (150, 2)
+    assert UserBadge.query.filter_by(user_id=another_user.id).count() == 0
@@ -0,0 +1,91 @@
+from crunevo.extensions import redis_client
+from crunevo.services import cache_service
+from crunevo.services.cache_service import CacheInvalidator, CacheService
+
+
+def test_block_change_moves_user_keys_to_a_new_generation(app):
+    blocks_key = CacheService.get_user_blocks_cache_key(1)
+    dashboard_key = CacheService.get_dashboard_cache_key(1)
+    other_key = CacheService.get_dashboard_cache_key(2)
+    CacheService.set(dashboard_key, {"n": 1})
+
+    CacheInvalidator.on_block_change(1)
+
+    assert CacheService.get_user_blocks_cache_key(1) != blocks_key
+    assert CacheService.get_dashboard_cache_key(1) != dashboard_key
+    assert CacheService.get(CacheService.get_dashboard_cache_key(1)) is None
+    assert CacheService.get_dashboard_cache_key(2) == other_key
+
+
+def test_template_change_invalidates_public_listings(app):
+    own = CacheService.get_user_templates_cache_key(1, include_public=False)
+    public = CacheService.get_user_templates_cache_key(2)
+    private = CacheService.get_user_templates_cache_key(2, include_public=False)
+
+    CacheInvalidator.on_template_change(1)
+
+    assert CacheService.get_user_templates_cache_key(1, include_public=False) != own
+    assert CacheService.get_user_templates_cache_key(2) != public
+    assert CacheService.get_user_templates_cache_key(2, include_public=False) == private
+
+
+def test_purge_tag_and_scan_cleanup(app):
+    tag = CacheService.user_tag(1)
+    CacheService.set("analytics:1:x", 1, tags=[tag])
+    CacheService.set("analytics:1:y", 2, tags=[tag])
+    CacheService.set("analytics:2:x", 3)
+
+    assert CacheService.purge_tag(tag) == 2
+    assert CacheService.get("analytics:1:x") is None
+    assert not redis_client.exists(CacheService._tag_key(tag))
+
+    CacheService.set("analytics:1:z", 4)
+    CacheService.invalidate_user_cache(1)
+    assert CacheService.get("analytics:1:z") is None
+    assert CacheService.get("analytics:2:x") == 3
+
+
+def test_tiered_cache_serves_local_then_redis(app):
+    cache = cache_service.get_tiered_cache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    assert cache.fetch("tier:a", compute, 60) == {"n": 1}
+    assert cache.fetch("tier:a", compute, 60) == {"n": 1}
+    cache.local.delete("tier:a")
+    assert cache.fetch("tier:a", compute, 60) == {"n": 1}
+
+    stats = cache.stats()
+    assert calls == [1]
+    assert (stats["misses"], stats["local_hits"], stats["redis_hits"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == 0.667
+
+
+def test_concurrent_miss_waits_for_the_filler(app, monkeypatch):
+    cache = cache_service.get_tiered_cache()
+    redis_client.set("lock:tier:b", "other-worker")
+
+    def other_worker_finishes(seconds):
+        CacheService.set("tier:b", {"v": "theirs", "d": 0.1, "x": 9e12})
+
+    monkeypatch.setattr(cache_service.time, "sleep", other_worker_finishes)
+
+    def compute():
+        raise AssertionError("only the lock holder computes")
+
+    assert cache.fetch("tier:b", compute, 60) == "theirs"
+    assert cache.stats()["lock_waits"] == 1
+
+
+def test_hot_key_is_refreshed_before_expiry(app, monkeypatch):
+    cache = cache_service.get_tiered_cache()
+    expires = cache_service.time.time() + 1
+    CacheService.set("tier:c", {"v": "old", "d": 5.0, "x": expires})
+    monkeypatch.setattr(cache_service.random, "random", lambda: 0.5)
+
+    assert cache.fetch("tier:c", lambda: "new", 60) == "new"
+    assert cache.stats()["early_refreshes"] == 1
+    assert not redis_client.exists("lock:tier:c")
@@ -0,0 +1,95 @@
+import threading
+
+from sqlalchemy import create_engine, select
+
+from crunevo.models import Product, Purchase
+from crunevo.services import mission_progress
+from crunevo.services.checkout import reserve_stock
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def add_products(db_session, *stocks):
+    products = [
+        Product(name=f"producto {i}", price=10, stock=stock)
+        for i, stock in enumerate(stocks)
+    ]
+    db_session.add_all(products)
+    db_session.commit()
+    return products
+
+
+def test_checkout_skips_products_out_of_stock(
+    app, client, db_session, test_user, tmp_path
+):
+    app.config["INVOICE_FOLDER"] = str(tmp_path)
+    cuaderno, lapiz = add_products(db_session, 5, 1)
+    login(client, test_user.username)
+    with client.session_transaction() as sess:
+        sess["cart"] = {str(cuaderno.id): 2, str(lapiz.id): 3}
+
+    resp = client.post("/tienda/checkout", data={"shipping_option": "pickup"})
+    assert resp.status_code == 200
+    assert "producto 0" in resp.get_data(as_text=True)
+
+    purchases = Purchase.query.filter_by(user_id=test_user.id).all()
+    assert [(p.product_id, p.quantity) for p in purchases] == [(cuaderno.id, 2)]
+    db_session.refresh(cuaderno)
+    db_session.refresh(lapiz)
+    assert (cuaderno.stock, lapiz.stock) == (3, 1)
+    assert (tmp_path / f"invoice_{purchases[0].id}.pdf").exists()
+    counters = mission_progress.load([test_user.id])[test_user.id]
+    assert mission_progress.progress(counters, "comprar_producto_1") == 1
+    with client.session_transaction() as sess:
+        assert "cart" not in sess
+
+
+def test_checkout_is_one_update_and_one_insert(
+    app, client, db_session, test_user, tmp_path, count_queries
+):
+    app.config["INVOICE_FOLDER"] = str(tmp_path)
+    products = add_products(db_session, 10, 10, 10, 10)
+    login(client, test_user.username)
+    with client.session_transaction() as sess:
+        sess["cart"] = {str(p.id): 1 for p in products}
+    db_session.refresh(test_user)
+
+    with count_queries() as statements:
+        client.post("/tienda/checkout", data={"shipping_option": "pickup"})
+
+    updates = [s for s in statements if s.startswith("UPDATE product")]
+    inserts = [s for s in statements if s.startswith("INSERT INTO purchase")]
+    assert len(updates) == 1
+    assert len(inserts) == 1
+    assert Purchase.query.filter_by(user_id=test_user.id).count() == 4
+
+
+def test_concurrent_buyers_never_oversell(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shop.db'}?timeout=30")
+    Product.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            Product.__table__.insert().values(id=1, name="x", price=1, stock=7)
+        )
+
+    sold = []
+
+    def buyer():
+        for _ in range(5):
+            with engine.begin() as conn:
+                if reserve_stock(conn, {1: 1}):
+                    sold.append(1)
+
+    threads = [threading.Thread(target=buyer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with engine.connect() as conn:
+        stock = conn.execute(select(Product.__table__.c.stock)).scalar_one()
+    engine.dispose()
+    assert len(sold) == 7
+    assert stock == 0
@@ -1,79 +1,66 @@
 from datetime import datetime, timedelta
-from types import SimpleNamespace
 
-from crunevo.jobs import decay
-
-
-class FakeFeedItem:
-    def __init__(self, i):
-        self.id = i
-        self.ref_id = i
-        self.owner_id = 1
-        self.item_type = "apunte"
-        self.score = 0
-        self.created_at = datetime.utcnow() - timedelta(hours=2)
-
-    def to_dict(self):
-        return {"id": self.id}
-
-
-class FakeQuery:
-    def __init__(self, items):
-        self.items = items
-
-    def filter(self, *a, **k):
-        return self
-
-    def order_by(self, *a):
-        return self
-
-    def offset(self, val):
-        self.off = val
-        return self
-
-    def limit(self, val):
-        self.lim = val
-        return self
+import pytest
 
-    def all(self):
-        return self.items[self.off : self.off + self.lim]
-
-
-def test_decay_batches(monkeypatch):
-    items = [FakeFeedItem(i) for i in range(1500)]
-    q = FakeQuery(items)
-
-    class DummyAttr:
-        def __le__(self, other):
-            return True
-
-        def __eq__(self, other):
-            return True
-
-    class DummyFeedItem:
-        item_type = DummyAttr()
-        created_at = DummyAttr()
-        query = q
-
-    monkeypatch.setattr(decay, "FeedItem", DummyFeedItem)
-    monkeypatch.setattr(decay, "compute_score", lambda *a, **k: 0)
-    monkeypatch.setattr(
-        decay,
-        "Note",
-        SimpleNamespace(
-            query=SimpleNamespace(
-                get=lambda i: SimpleNamespace(
-                    likes=0,
-                    downloads=0,
-                    comments_count=0,
-                    created_at=datetime.utcnow() - timedelta(hours=2),
-                )
-            )
-        ),
+from crunevo.cache import feed_cache
+from crunevo.jobs import decay
+from crunevo.models import FeedItem, Note
+from crunevo.utils.scoring import compute_score
+
+
+def make_note(db_session, user, likes, hours_ago=2):
+    created = datetime.utcnow() - timedelta(hours=hours_ago)
+    note = Note(
+        title=f"n{likes}",
+        filename="f.pdf",
+        author=user,
+        likes=likes,
+        created_at=created,
     )
-    commits = []
-    monkeypatch.setattr(decay.db.session, "commit", lambda: commits.append(True))
-    monkeypatch.setattr(decay, "push_items", lambda *a, **k: None)
-
-    decay.decay_scores(batch_size=1000)
-    assert len(commits) == 2
+    db_session.add(note)
+    db_session.flush()
+    return note
+
+
+def test_decay_batches(db_session, test_user, another_user):
+    notes = [make_note(db_session, test_user, likes) for likes in range(1, 6)]
+    old = datetime.utcnow() - timedelta(hours=2)
+    for note in notes:
+        db_session.add(FeedItem(item_type="apunte", ref_id=note.id, created_at=old))
+        db_session.add(
+            FeedItem(
+                owner_id=another_user.id,
+                item_type="apunte",
+                ref_id=note.id,
+                created_at=old,
+            )
+        )
+    db_session.commit()
+
+    stats = decay.decay_scores(batch_size=2)
+
+    assert stats["batches"] == 3
+    assert stats["notes"] == 5
+    assert stats["rows"] == 10
+    for note in notes:
+        expected = compute_score(note.likes, 0, 0, note.created_at)
+        scores = {
+            fi.score
+            for fi in FeedItem.query.filter_by(item_type="apunte", ref_id=note.id)
+        }
+        assert len(scores) == 1
+        assert scores.pop() == pytest.approx(expected, rel=1e-3)
+    cached = feed_cache.fetch(another_user.id, 0, 9)
+    assert [c["ref_id"] for c in cached][0] == notes[-1].id
+    assert cached[0]["title"] == notes[-1].title
+
+
+def test_decay_skips_recent_items(db_session, test_user):
+    note = make_note(db_session, test_user, likes=3, hours_ago=0)
+    db_session.add(FeedItem(item_type="apunte", ref_id=note.id, score=0))
+    db_session.commit()
+
+    stats = decay.decay_scores()
+
+    assert stats["rows"] == 0
+    assert FeedItem.query.one().score == 0
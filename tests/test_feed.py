@@ -78,8 +78,72 @@ def test_feed_shows_post_for_other_user(client, db_session, test_user, another_u
     assert data["content"] == "Feed post"
 
 
+def test_broadcast_item_stored_once(client, db_session, test_user, another_user):
+    post = Post(content="Broadcast", author=test_user)
+    db_session.add(post)
+    db_session.commit()
+    create_feed_item_for_all("post", post.id)
+
+    rows = FeedItem.query.filter_by(item_type="post", ref_id=post.id).all()
+    assert len(rows) == 1
+    assert rows[0].owner_id is None
+    assert [i["ref_id"] for i in feed_cache.fetch(test_user.id)] == [post.id]
+    assert [i["ref_id"] for i in feed_cache.fetch(another_user.id)] == [post.id]
+
+
+def test_feed_cache_merges_user_and_broadcast_streams(reset_caches):
+    from datetime import datetime
+
+    now = datetime.utcnow()
+    feed_cache.push_items(
+        None, [{"score": 2, "created_at": now, "payload": {"ref_id": "shared"}}]
+    )
+    feed_cache.push_items(
+        7,
+        [
+            {"score": 3, "created_at": now, "payload": {"ref_id": "own-high"}},
+            {"score": 1, "created_at": now, "payload": {"ref_id": "own-low"}},
+        ],
+    )
+    assert [i["ref_id"] for i in feed_cache.fetch(7)] == [
+        "own-high",
+        "shared",
+        "own-low",
+    ]
+    assert [i["ref_id"] for i in feed_cache.fetch(8)] == ["shared"]
+
+
+def test_expired_user_stream_is_reloaded(reset_caches, client, db_session, test_user):
+    from datetime import datetime, timedelta
+
+    post = Post(content="para todos", author=test_user)
+    db_session.add(post)
+    db_session.commit()
+    create_feed_item_for_all("post", post.id)
+    create_feed_item_for_all("movimiento", 99, owner_ids=[test_user.id])
+    login(client, test_user.username, "secret")
+
+    def types():
+        return {d["item_type"] for d in client.get("/api/feed").get_json()}
+
+    assert types() == {"post", "movimiento"}
+
+    # only the user's own stream expires; the shared one keeps the post
+    later = datetime.utcnow() + timedelta(seconds=feed_cache.CACHE_TTL + 1)
+    feed_cache.cleanup_user(test_user.id, later)
+    assert [i["item_type"] for i in feed_cache.fetch(test_user.id)] == ["post"]
+    assert types() == {"post", "movimiento"}
+
+
 def test_feed_includes_achievement_event(client, db_session, test_user, another_user):
+    from datetime import datetime, timedelta
+
+    from crunevo.jobs.achievement_digest import publish_achievement_digests
+
+    test_user.career = another_user.career = "Medicina"
+    db_session.commit()
     unlock_achievement(test_user, "badge_test")
+    publish_achievement_digests(datetime.utcnow() + timedelta(hours=1))
     login(client, another_user.username, "secret")
     resp = client.get("/api/feed")
     assert resp.status_code == 200
@@ -125,13 +189,79 @@ def test_feed_cache_cleanup_removes_old_entries(reset_caches):
         1, [{"score": 0, "created_at": datetime.utcnow(), "payload": {"a": 1}}]
     )
 
-    feed_cache._cache[1][0]["cached_at"] = datetime.utcnow() - timedelta(
-        seconds=feed_cache.CACHE_TTL + 1
+    feed_cache.cleanup(datetime.utcnow() + timedelta(seconds=feed_cache.CACHE_TTL + 1))
+
+    assert feed_cache.fetch(1) == []
+    assert feed_cache.get_cache_stats()["expired"] == 1
+
+
+def test_feed_cache_dedups_by_type_and_ref(reset_caches):
+    from datetime import datetime
+
+    now = datetime.utcnow()
+    feed_cache.push_items(
+        1,
+        [
+            {
+                "score": 1,
+                "created_at": now,
+                "payload": {"item_type": "post", "ref_id": 1},
+            },
+            {
+                "score": 2,
+                "created_at": now,
+                "payload": {"item_type": "post", "ref_id": 2},
+            },
+        ],
     )
+    feed_cache.push_items(
+        1,
+        [
+            {
+                "score": 5,
+                "created_at": now,
+                "payload": {"item_type": "post", "ref_id": 1, "v": 2},
+            }
+        ],
+    )
+    assert feed_cache.fetch(1) == [
+        {"item_type": "post", "ref_id": 1, "v": 2},
+        {"item_type": "post", "ref_id": 2},
+    ]
+    feed_cache.remove_item(1, "post", 1)
+    assert feed_cache.fetch(1) == [{"item_type": "post", "ref_id": 2}]
 
-    feed_cache.cleanup()
 
-    assert feed_cache.fetch(1) == []
+def test_feed_cache_evicts_least_recently_used_stream(reset_caches, monkeypatch):
+    from datetime import datetime
+
+    monkeypatch.setattr(feed_cache, "MAX_TOTAL_ITEMS", 3)
+    now = datetime.utcnow()
+
+    def push(uid, n):
+        feed_cache.push_items(
+            uid,
+            [
+                {
+                    "score": i,
+                    "created_at": now,
+                    "payload": {"item_type": "post", "ref_id": i},
+                }
+                for i in range(n)
+            ],
+        )
+
+    push(1, 2)
+    push(2, 1)
+    feed_cache.fetch(1)
+    push(3, 1)
+
+    assert feed_cache.fetch(2) == []
+    assert len(feed_cache.fetch(1)) == 2
+    stats = feed_cache.get_cache_stats()
+    assert stats["evictions"] == 1
+    assert stats["items"] == 3
+    assert stats["misses"] == 1
 
 
 def test_feed_fetch_handles_error(monkeypatch, client, db_session, test_user):
@@ -376,3 +506,84 @@ def test_delete_comment_unauthorized(client, db_session, test_user, another_user
     resp = client.post(f"/feed/comment/delete/{comment.id}")
     assert resp.status_code == 403
     assert PostComment.query.get(comment.id) is not None
+
+
+def test_feed_cache_redis_backend_shared_between_workers(reset_caches, monkeypatch):
+    from datetime import datetime
+    from crunevo.extensions import MockRedis
+
+    backend = feed_cache.RedisFeedBackend(MockRedis())
+    monkeypatch.setattr(feed_cache, "_backend", backend)
+    now = datetime.utcnow()
+    feed_cache.push_items(
+        None,
+        [
+            {
+                "score": 1,
+                "created_at": now,
+                "payload": {"item_type": "post", "ref_id": 1},
+            }
+        ],
+    )
+    feed_cache.push_items(
+        5,
+        [
+            {
+                "score": 2,
+                "created_at": now,
+                "payload": {"item_type": "logro", "ref_id": 9},
+            }
+        ],
+    )
+
+    # a different worker starts with an empty local cache
+    feed_cache.clear()
+    assert feed_cache.fetch(5) == [
+        {"item_type": "logro", "ref_id": 9},
+        {"item_type": "post", "ref_id": 1},
+    ]
+    assert feed_cache.get_cache_stats()["backend_hits"] == 1
+
+    feed_cache.remove_item(None, "post", 1)
+    feed_cache.clear()
+    assert feed_cache.fetch(5) == [{"item_type": "logro", "ref_id": 9}]
+
+
+def test_mock_redis_ranges_follow_redis_semantics():
+    from crunevo.extensions import MockRedis
+
+    client = MockRedis()
+    client.zadd("z", {f"m{i}": i for i in range(300)})
+
+    # a stop before the first member selects nothing, as in Redis
+    assert client.zrange("z", 0, -501) == []
+    assert client.zremrangebyrank("z", 0, -501) == 0
+    assert client.zrange("z", 5, 2) == []
+    assert client.zrange("z", -2, -1) == ["m298", "m299"]
+    assert client.zremrangebyrank("z", 0, -251) == 50
+    assert client.zcard("z") == 250
+
+
+def test_feed_cache_redis_backend_trims_entries(reset_caches):
+    from datetime import datetime
+    from crunevo.extensions import MockRedis
+
+    client = MockRedis()
+    backend = feed_cache.RedisFeedBackend(client)
+    now = datetime.utcnow()
+    for i in range(feed_cache.MAX_CACHE + 20):
+        backend.push(
+            7,
+            [
+                {
+                    "score": i,
+                    "created_at": now,
+                    "payload": {"item_type": "post", "ref_id": i},
+                }
+            ],
+        )
+
+    zkey, hkey = backend._keys(7)
+    assert client.zcard(zkey) == feed_cache.MAX_CACHE
+    assert set(client._data[hkey]) == set(client.zrange(zkey, 0, -1))
+    assert "post:0" not in client._data[hkey]
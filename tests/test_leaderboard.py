@@ -0,0 +1,113 @@
+from sqlalchemy import update
+
+from crunevo.models import User
+from crunevo.services import leaderboard
+from crunevo.utils.credits import add_credit
+
+
+def make_user(db_session, name, **fields):
+    user = User(username=name, email=f"{name}@example.com", activated=True, **fields)
+    user.set_password("secret")
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def test_top_and_rank_follow_committed_changes(db_session, test_user):
+    ana = make_user(db_session, "ana", reputation_score=50)
+    beto = make_user(db_session, "beto", reputation_score=20)
+    assert [u.username for u in leaderboard.top("reputation")] == ["ana", "beto"]
+
+    test_user.reputation_score = 50
+    beto.reputation_score = 80
+    db_session.commit()
+
+    assert leaderboard.top_ids("reputation") == [
+        (beto.id, 80),
+        (ana.id, 50),
+        (test_user.id, 50),
+    ]
+    # ties share a rank; users without a score come last
+    assert leaderboard.rank("reputation", ana.id) == 2
+    assert leaderboard.rank("reputation", test_user.id) == 2
+    nobody = make_user(db_session, "nadie")
+    assert leaderboard.rank("reputation", nobody.id) == 4
+
+    db_session.delete(beto)
+    db_session.commit()
+    assert leaderboard.rank("reputation", ana.id) == 1
+
+
+def test_rank_lookups_skip_the_users_table(db_session, test_user, count_queries):
+    for i in range(5):
+        make_user(db_session, f"u{i}", points=i * 10)
+    leaderboard.rank("points", test_user.id)  # builds the board
+
+    with count_queries() as statements:
+        ranks = leaderboard.ranks(test_user.id, ["points"])
+        ids = leaderboard.top_ids("points", 3)
+
+    assert statements == []
+    assert ranks == {"points": 5}
+    assert [score for _, score in ids] == [40, 30, 20]
+
+
+def test_windows_count_gains(db_session, test_user, another_user):
+    add_credit(test_user, 30, "test")
+    add_credit(another_user, 10, "test")
+    add_credit(another_user, -5, "test")
+
+    assert leaderboard.top_ids("credits", window="week") == [
+        (test_user.id, 30),
+        (another_user.id, 10),
+    ]
+    assert leaderboard.rank("credits", another_user.id, window="month") == 2
+    assert leaderboard.top_ids("credits") == [(test_user.id, 30), (another_user.id, 5)]
+
+
+def test_bulk_updates_are_picked_up_by_a_rebuild(db_session, test_user):
+    make_user(db_session, "ana", forum_experience=300)
+    assert leaderboard.rank("level", test_user.id) == 2
+
+    db_session.execute(
+        update(User).where(User.id == test_user.id).values(forum_experience=500)
+    )
+    db_session.commit()
+    assert leaderboard.rank("level", test_user.id) == 2
+
+    leaderboard.invalidate("level")
+    assert leaderboard.rank("level", test_user.id) == 1
+    assert leaderboard.rebuild(["level", "credits"]) == {"level": 2, "credits": 0}
+
+
+def test_leaderboards_page(client, db_session, test_user):
+    make_user(db_session, "ana", forum_experience=300, forum_level=3)
+    login(client, test_user.username)
+
+    resp = client.get("/clasificaciones?periodo=semana")
+    assert resp.status_code == 200
+    resp = client.get("/clasificaciones")
+    assert resp.status_code == 200
+    assert "ana" in resp.get_data(as_text=True)
+
+
+def test_period_pages_show_window_scores(client, db_session, test_user):
+    ana = make_user(db_session, "ana")
+    # credits from before the week: a bulk update the windows never saw
+    db_session.execute(update(User).where(User.id == ana.id).values(credits=500))
+    db_session.commit()
+    leaderboard.invalidate("credits")
+    add_credit(ana, 7, "test")
+    login(client, test_user.username)
+
+    page = client.get("/clasificaciones").get_data(as_text=True)
+    assert ">507</div>" in page
+    assert "periodo=semana" in page
+
+    page = client.get("/clasificaciones?periodo=semana").get_data(as_text=True)
+    assert ">7</div>" in page
+    assert ">507</div>" not in page
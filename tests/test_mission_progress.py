@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+
+
+from crunevo.jobs.mission_progress import reconcile_mission_progress
+from crunevo.models import (
+    Mission,
+    MissionProgress,
+    Note,
+    Post,
+    PostComment,
+    PostReaction,
+    Referral,
+)
+from crunevo.routes.missions_routes import compute_mission_states
+from crunevo.services import mission_progress
+
+
+def counters(user):
+    return mission_progress.load([user.id])[user.id]
+
+
+def test_events_update_counters(db_session, test_user, another_user):
+    post = Post(content="hola", author_id=test_user.id)
+    db_session.add(post)
+    db_session.add(Note(title="n", filename="f.pdf", user_id=test_user.id))
+    db_session.commit()
+    db_session.add_all(
+        [
+            PostComment(body="c", author_id=test_user.id, post_id=post.id),
+            PostReaction(user_id=another_user.id, post_id=post.id, reaction_type="x"),
+            # reacting to your own post does not count
+            PostReaction(user_id=test_user.id, post_id=post.id, reaction_type="x"),
+        ]
+    )
+    db_session.commit()
+
+    found = counters(test_user)
+    assert found["notes", "total"] == 1
+    assert found["comments", "day"] == 1
+    assert found["likes", "total"] == 1
+
+    db_session.delete(PostReaction.query.filter_by(user_id=another_user.id).one())
+    db_session.commit()
+    assert counters(test_user)["likes", "total"] == 0
+
+
+def test_deleting_a_post_uncounts_its_reactions_and_comments(
+    client, db_session, test_user, another_user
+):
+    post = Post(content="hola", author_id=test_user.id)
+    db_session.add(post)
+    db_session.commit()
+    db_session.add_all(
+        [
+            PostComment(body="c", author_id=another_user.id, post_id=post.id),
+            PostReaction(user_id=another_user.id, post_id=post.id, reaction_type="x"),
+        ]
+    )
+    db_session.commit()
+    assert counters(test_user)["likes", "total"] == 1
+    assert counters(another_user)["comments", "day"] == 1
+
+    client.post("/login", data={"username": test_user.username, "password": "secret"})
+    assert client.post(f"/feed/post/eliminar/{post.id}").status_code == 302
+
+    assert counters(test_user)["likes", "total"] == 0
+    assert counters(another_user)["comments", "day"] == 0
+
+
+def test_referral_completion_and_windows(db_session, test_user, another_user):
+    referral = Referral(code="r1", invitador_id=test_user.id)
+    old = Referral(
+        code="r2",
+        invitador_id=test_user.id,
+        completado=True,
+        fecha_creacion=datetime.utcnow() - timedelta(days=10),
+    )
+    db_session.add_all([referral, old])
+    db_session.commit()
+    assert counters(test_user)["referrals", "total"] == 1
+
+    referral.completado = True
+    db_session.commit()
+
+    found = counters(test_user)
+    assert found["referrals", "total"] == 2
+    assert found["referrals", "week"] == 1
+    assert mission_progress.progress(found, "referido_maraton") == 1
+    assert mission_progress.progress(found, "referido_3") == 2
+
+
+def test_mission_page_reads_progress_in_one_query(db_session, test_user, count_queries):
+    db_session.add_all(
+        Mission(code=f"subir_apuntes_{i}", description="d", goal=i) for i in range(1, 6)
+    )
+    db_session.add_all(
+        [
+            Mission(code="comentar_1", description="d", goal=1),
+            Mission(code="referido_1", description="d", goal=1),
+        ]
+    )
+    db_session.add(Note(title="n", filename="f.pdf", user_id=test_user.id))
+    db_session.commit()
+    db_session.refresh(test_user)
+
+    with count_queries() as statements:
+        states = compute_mission_states(test_user)
+
+    assert len(statements) == 3  # missions, progress, claimed missions
+    assert [s["completada"] for s in states.values()] == [
+        True,
+        False,
+        False,
+        False,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_reconcile_repairs_drift_and_prunes(db_session, test_user):
+    db_session.add_all(
+        Note(title=f"n{i}", filename="f.pdf", user_id=test_user.id) for i in range(3)
+    )
+    db_session.commit()
+    # bulk deletes skip the hooks
+    Note.query.filter(Note.title == "n0").delete()
+    stale_day = datetime.utcnow().date() - timedelta(days=30)
+    db_session.add(
+        MissionProgress(
+            user_id=test_user.id, metric="comments", bucket=stale_day, count=4
+        )
+    )
+    db_session.commit()
+    assert counters(test_user)["notes", "total"] == 3
+
+    stats = reconcile_mission_progress()
+
+    assert stats == {"repaired": 2, "pruned": 1}
+    found = counters(test_user)
+    assert found["notes", "total"] == 2
+    assert found["notes", "day"] == 2
+    assert reconcile_mission_progress() == {"repaired": 0, "pruned": 0}
@@ -0,0 +1,243 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from crunevo import tasks
+from crunevo.models import FeedItem, Note, NoteHash, Report
+from crunevo.services import note_ingest
+from crunevo.utils import office
+
+
+@pytest.fixture
+def ingest_env(app, tmp_path, monkeypatch):
+    app.config.update(
+        UPLOAD_FOLDER=str(tmp_path / "uploads"),
+        INGEST_FOLDER=str(tmp_path / "ingest"),
+        TRANSLATIONS_FOLDER=str(tmp_path / "translations"),
+        CLOUDINARY_URL=None,
+    )
+    monkeypatch.setattr(
+        note_ingest,
+        "convert_from_path",
+        lambda *args, **kwargs: [Image.new("RGB", (40, 40), "white")],
+    )
+    translated = []
+    monkeypatch.setattr(
+        "crunevo.utils.translate_fields",
+        lambda note_id, *args: translated.append(note_id),
+    )
+    return tmp_path
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def upload(client, app, name, content=b"%PDF-1.4 demo"):
+    return client.post(
+        "/notes/upload",
+        data={
+            "title": "Apunte de prueba",
+            "category": app.config["NOTE_CATEGORIES"][0],
+            "file": (io.BytesIO(content), name),
+        },
+        content_type="multipart/form-data",
+    )
+
+
+def test_upload_runs_all_stages(client, app, test_user, ingest_env):
+    login(client, test_user.username)
+
+    resp = upload(client, app, "apunte.pdf")
+
+    assert resp.status_code == 302
+    note = Note.query.one()
+    assert note.processing_status == "ready"
+    assert set(note.processing_state["stages"].values()) == {"done"}
+    assert note.filename == os.path.join(app.config["UPLOAD_FOLDER"], "apunte.pdf")
+    assert note.thumbnail_url.endswith("apunte_thumb.png")
+    assert FeedItem.query.filter_by(item_type="apunte", ref_id=note.id).count() == 1
+    # the raw upload's work directory is removed once the note is ready
+    assert os.listdir(app.config["INGEST_FOLDER"]) == []
+
+
+def test_upload_returns_before_processing(client, app, test_user, ingest_env):
+    queue = tasks.WorkerQueue(
+        tasks.SQLiteBackend(str(ingest_env / "tasks.db")), retry_delay=0
+    )
+    original = tasks.task_queue
+    tasks.task_queue = queue
+    try:
+        login(client, test_user.username)
+        upload(client, app, "apunte.pdf")
+
+        note = Note.query.one()
+        assert note.processing_status == "pending"
+        assert FeedItem.query.filter_by(item_type="apunte").count() == 0
+        assert client.get("/notes/search?q=Apunte").get_json() == []
+
+        queue.run_pending()
+        assert queue.backend.counts() == {}
+        stats = queue.stats.snapshot()
+        assert stats["crunevo.services.note_ingest:run_stage"]["count"] == len(
+            note_ingest.STAGES
+        )
+    finally:
+        tasks.task_queue = original
+
+    note = Note.query.one()
+    assert note.processing_status == "ready"
+    assert FeedItem.query.filter_by(item_type="apunte").count() == 1
+
+
+def test_optional_stage_failure_does_not_block(
+    client, app, test_user, ingest_env, monkeypatch
+):
+    def broken(*args, **kwargs):
+        raise RuntimeError("poppler missing")
+
+    monkeypatch.setattr(note_ingest, "convert_from_path", broken)
+    login(client, test_user.username)
+
+    upload(client, app, "apunte.pdf")
+
+    note = Note.query.one()
+    assert note.processing_status == "ready"
+    assert note.processing_state["stages"]["thumbnail"] == "failed"
+    assert note.thumbnail_url == ""
+
+
+def test_failed_upload_can_be_retried(
+    client, app, db_session, test_user, ingest_env, monkeypatch
+):
+    def broken(note, state):
+        raise RuntimeError("storage down")
+
+    login(client, test_user.username)
+    points = test_user.points
+    with monkeypatch.context() as patched:
+        patched.setitem(note_ingest.STAGE_HANDLERS, "upload", broken)
+        resp = upload(client, app, "apunte.pdf")
+
+    assert resp.status_code == 302
+    assert Note.query.count() == 0
+    assert NoteHash.query.count() == 0
+    db_session.refresh(test_user)
+    assert test_user.points == points
+
+    upload(client, app, "apunte.pdf")
+
+    note = Note.query.one()
+    assert note.processing_status == "ready"
+    assert NoteHash.query.one().note_id == note.id
+    assert Report.query.count() == 0
+    db_session.refresh(test_user)
+    assert test_user.points == points + 10
+
+
+def test_docx_is_converted_by_office_pool(
+    client, app, test_user, ingest_env, monkeypatch
+):
+    converted = []
+
+    def fake_convert(src, outdir):
+        converted.append(src)
+        pdf = os.path.join(outdir, "apunte.pdf")
+        with open(pdf, "wb") as fh:
+            fh.write(b"%PDF")
+        return pdf
+
+    monkeypatch.setattr(note_ingest, "convert_to_pdf", fake_convert)
+    login(client, test_user.username)
+
+    upload(client, app, "apunte.docx", b"PK docx")
+
+    note = Note.query.one()
+    assert len(converted) == 1
+    assert note.processing_status == "ready"
+    assert note.filename.endswith("apunte.docx")
+    assert note.thumbnail_url.endswith("apunte_thumb.png")
+
+
+def test_office_pool_reuses_slot_profiles(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(office, "UNOSERVER_AVAILABLE", False)
+    monkeypatch.setattr(
+        office.subprocess, "run", lambda cmd, **kwargs: calls.append(cmd)
+    )
+    pool = office.OfficePool(size=1, profile_root=str(tmp_path))
+
+    first = pool.convert(str(tmp_path / "a.docx"), str(tmp_path))
+    pool.convert(str(tmp_path / "b.pptx"), str(tmp_path))
+
+    assert first == str(tmp_path / "a.pdf")
+    assert calls[0][1] == calls[1][1]
+    assert calls[0][1].startswith("-env:UserInstallation=file://")
+
+
+def test_office_pools_do_not_share_ports_or_profiles(tmp_path, monkeypatch):
+    started = []
+
+    class FakeServer:
+        def __init__(self, cmd, **kwargs):
+            started.append(cmd)
+
+        def poll(self):
+            return None
+
+    monkeypatch.setattr(office.subprocess, "Popen", FakeServer)
+    monkeypatch.setattr(
+        office.socket, "create_connection", lambda *a, **k: io.BytesIO()
+    )
+    monkeypatch.setattr(office.os, "getpid", lambda: 101)
+    first = office.OfficePool(size=1, profile_root=str(tmp_path))._slots[0]
+    monkeypatch.setattr(office.os, "getpid", lambda: 102)
+    second = office.OfficePool(size=1, profile_root=str(tmp_path))._slots[0]
+
+    first._ensure_server()
+    second._ensure_server()
+
+    assert first.profile != second.profile
+    assert first.port != second.port
+    assert started[0][started[0].index("--port") + 1] == str(first.port)
+
+
+def test_unprocessed_notes_stay_hidden(client, db_session, test_user, another_user):
+    from crunevo.cache import template_globals
+    from crunevo.routes.search_routes import search_notes
+    from crunevo.services import autocomplete
+    from crunevo.utils.jwt_utils import generate_token
+
+    note = Note(
+        title="Geometría pendiente", author=another_user, processing_status="pending"
+    )
+    db_session.add(note)
+    db_session.commit()
+    login(client, test_user.username)
+    headers = {"Authorization": f"Bearer {generate_token(test_user)}"}
+
+    def quickfeed_notes():
+        resp = client.get("/feed/api/quickfeed?filter=apuntes")
+        return resp.get_json()["html"]
+
+    def api_notes():
+        resp = client.get("/api/notes", headers=headers)
+        return [n["id"] for n in resp.get_json()["notes"]]
+
+    assert search_notes("Geometría")["results"] == []
+    assert autocomplete.suggest("geom") == []
+    assert template_globals.sidebar_notes() == []
+    assert client.get(f"/notes/{note.id}").status_code == 404
+    assert client.get(f"/notes/{note.id}/embed").status_code == 404
+    assert note.title not in quickfeed_notes()
+    assert api_notes() == []
+
+    note.processing_status = "ready"
+    db_session.commit()
+    assert note.title in quickfeed_notes()
+    assert api_notes() == [note.id]
+    assert [n["id"] for n in search_notes("Geometría")["results"]] == [note.id]
+    assert [s["text"] for s in autocomplete.suggest("geom")] == [note.title]
+    assert [n["id"] for n in template_globals.sidebar_notes()] == [note.id]
@@ -53,3 +53,42 @@ def test_send_notification_filter(db_session):
 
     assert Notification.query.filter_by(user_id=u1.id).count() == 1
     assert Notification.query.filter_by(user_id=u2.id).count() == 0
+
+
+def test_unread_counter_follows_notifications(client, db_session, test_user):
+    login(client, test_user.username)
+    assert send_notification(test_user.id, "Uno") == 1
+    send_notification(test_user.id, "Dos")
+    n = Notification(user_id=test_user.id, message="Tres")
+    db_session.add(n)
+    db_session.commit()
+
+    assert client.get("/notifications/api/count").get_json() == {"count": 3}
+
+    client.post(f"/notifications/delete/{n.id}")
+    assert client.get("/notifications/api/count").get_json() == {"count": 2}
+
+    client.post("/notifications/read_all")
+    assert client.get("/notifications/api/count").get_json() == {"count": 0}
+    assert db_session.get(User, test_user.id).unread_notifications == 0
+
+
+def test_notifications_page_by_keyset(client, db_session, test_user):
+    db_session.add_all(
+        Notification(user_id=test_user.id, message=f"Aviso {i:02d}") for i in range(35)
+    )
+    db_session.commit()
+    login(client, test_user.username)
+
+    first = client.get("/notificaciones").get_data(as_text=True)
+    assert "Aviso 34" in first and "Aviso 05" in first
+    assert "Aviso 04" not in first
+    newest_hidden = Notification.query.filter_by(message="Aviso 05").one().id
+    assert f"before={newest_hidden}" in first
+
+    second = client.get(f"/notificaciones?before={newest_hidden}").get_data(
+        as_text=True
+    )
+    assert "Aviso 04" in second and "Aviso 00" in second
+    assert "Aviso 05" not in second
+    assert "Ver anteriores" not in second
@@ -1,4 +1,8 @@
-from crunevo.models import PageView, User, SiteConfig
+from datetime import datetime
+
+from crunevo.models import PageView, PageViewHourly, User, SiteConfig
+from crunevo.services import pageviews
+from crunevo.services.pageviews import PageViewBuffer
 
 
 def login(client, username, password):
@@ -8,10 +12,49 @@ def login(client, username, password):
 def test_pageview_recorded(client, db_session):
     resp = client.get("/terms")
     assert resp.status_code == 200
+    # views are buffered; nothing is written on the request path
+    assert PageView.query.count() == 0
+
+    assert pageviews.get_buffer().flush() == 1
     view = PageView.query.one()
     assert view.path == "/terms"
 
 
+def test_pageview_buffer_batches_and_rolls_up(db_session):
+    buffer = PageViewBuffer(capacity=100, batch_size=10)
+    morning = datetime(2026, 1, 5, 9, 15)
+    for minute in (0, 20, 40):
+        buffer.record("/feed", now=morning.replace(minute=minute))
+    buffer.record("/feed", now=morning.replace(hour=10))
+    buffer.record("/notes", now=morning)
+
+    assert buffer.flush() == 5
+    assert buffer.flush() == 0
+    assert PageView.query.count() == 5
+    assert {(r.path, r.hour.hour, r.count) for r in PageViewHourly.query} == {
+        ("/feed", 9, 3),
+        ("/feed", 10, 1),
+        ("/notes", 9, 1),
+    }
+
+    buffer.record("/feed", now=morning)
+    buffer.flush()
+    assert (
+        PageViewHourly.query.filter_by(path="/feed", hour=morning.replace(minute=0))
+        .one()
+        .count
+        == 4
+    )
+
+
+def test_pageview_buffer_is_bounded():
+    buffer = PageViewBuffer(capacity=3, batch_size=100)
+    for i in range(5):
+        buffer.record(f"/p/{i}")
+
+    assert buffer.stats() == {"buffered": 3, "written": 0, "dropped": 2, "failed": 0}
+
+
 def test_admin_pageviews_route(client, db_session, test_user):
     admin = User(
         username="admin",
@@ -27,6 +70,7 @@ def test_admin_pageviews_route(client, db_session, test_user):
     # generate some page views
     client.get("/terms")
     client.get("/terms")
+    pageviews.get_buffer().flush()
 
     login(client, "admin", "pass")
     resp = client.get("/admin/pageviews")
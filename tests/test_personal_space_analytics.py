@@ -0,0 +1,54 @@
+from crunevo.models import PersonalSpaceBlock as Block
+from crunevo.services.analytics_service import AnalyticsService
+from crunevo.services.block_service import BlockService
+
+
+def test_metrics_are_aggregated_in_sql(db_session, test_user):
+    db_session.add_all(
+        [
+            Block(
+                user_id=test_user.id, type="tarea", metadata_json={"completed": True}
+            ),
+            Block(user_id=test_user.id, type="tarea", metadata_json={}),
+            Block(
+                user_id=test_user.id, type="objetivo", metadata_json={"progress": 40}
+            ),
+            Block(
+                user_id=test_user.id, type="objetivo", metadata_json={"progress": 80}
+            ),
+            Block(user_id=test_user.id, type="nota", status="archived"),
+        ]
+    )
+    db_session.commit()
+
+    metrics = AnalyticsService.get_dashboard_metrics(test_user.id)
+    assert metrics["active_blocks"] == 4
+    assert metrics["completed_tasks"] == 1
+    assert metrics["pending_tasks"] == 1
+    assert metrics["active_objectives"] == 2
+
+    analytics = BlockService.get_block_analytics(test_user.id)
+    assert analytics["blocks_by_type"] == {"tarea": 2, "objetivo": 2}
+    assert analytics["task_completion"]["percentage"] == 50
+    assert analytics["objective_progress"]["average_progress"] == 60.0
+    assert analytics["recent_activity"]["blocks_updated_this_week"] == 4
+
+    productivity = AnalyticsService.get_productivity_metrics(test_user.id)
+    assert productivity["objective_progress"]["average_progress"] == 60.0
+    assert sum(d["blocks_updated"] for d in productivity["weekly_activity"]) == 5
+
+
+def test_summary_is_cached_until_a_block_changes(db_session, test_user, count_queries):
+    task = Block(user_id=test_user.id, type="tarea", metadata_json={})
+    db_session.add(task)
+    db_session.commit()
+    assert AnalyticsService.get_dashboard_metrics(test_user.id)["completed_tasks"] == 0
+
+    with count_queries() as statements:
+        BlockService.get_block_analytics(test_user.id)
+        AnalyticsService.get_dashboard_metrics(test_user.id)
+    assert statements == []
+
+    task.metadata_json = {"completed": True}
+    db_session.commit()
+    assert AnalyticsService.get_dashboard_metrics(test_user.id)["completed_tasks"] == 1
@@ -116,3 +116,60 @@ def test_reorder_blocks(client, db_session, test_user):
         json={},
     )
     assert resp2.status_code == 400
+
+
+def test_reorder_writes_only_changed_blocks(client, db_session, test_user):
+    blocks = [Block(user_id=test_user.id, type="nota", order_index=i) for i in range(3)]
+    db_session.add_all(blocks)
+    db_session.commit()
+    before = {b.id: b.updated_at for b in blocks}
+
+    login(client, test_user.username)
+    resp = client.post(
+        "/api/personal-space/blocks/reorder",
+        json={
+            "blocks": [
+                {"id": blocks[0].id, "position": 0},
+                {"id": blocks[2].id, "position": 1, "x": 3, "y": 4},
+                {"id": blocks[1].id, "position": 2},
+            ]
+        },
+    )
+    assert resp.get_json()["success"] is True
+    for block in blocks:
+        db_session.refresh(block)
+    assert [b.order_index for b in blocks] == [0, 2, 1]
+    assert blocks[2].metadata_json["grid_position"] == {"x": 3, "y": 4}
+    assert blocks[0].updated_at == before[blocks[0].id]
+
+
+def test_move_block_between_neighbours(client, db_session, test_user):
+    blocks = [Block(user_id=test_user.id, type="nota", order_index=i) for i in range(4)]
+    db_session.add_all(blocks)
+    db_session.commit()
+    login(client, test_user.username)
+
+    def move(block, after, before):
+        resp = client.post(
+            f"/api/personal-space/blocks/{block.id}/position",
+            json={
+                "after_id": after and after.id,
+                "before_id": before and before.id,
+            },
+        )
+        assert resp.get_json()["success"] is True
+        return sorted(
+            Block.query.filter_by(user_id=test_user.id),
+            key=lambda b: b.order_index,
+        )
+
+    # no room between 0 and 1: the blocks are spaced out once
+    order = move(blocks[3], blocks[0], blocks[1])
+    assert [b.id for b in order] == [blocks[i].id for i in (0, 3, 1, 2)]
+
+    # afterwards a move only rewrites the moved block
+    before = {b.id: b.order_index for b in order}
+    order = move(blocks[2], None, blocks[0])
+    assert [b.id for b in order] == [blocks[i].id for i in (2, 0, 3, 1)]
+    changed = [b.id for b in order if b.order_index != before[b.id]]
+    assert changed == [blocks[2].id]
@@ -0,0 +1,129 @@
+import hashlib
+import io
+
+from PIL import Image, ImageDraw
+
+from crunevo.models import Note, NoteHash, NotePageHash, Report
+from crunevo.utils import plagiarism
+from crunevo.utils.plagiarism import BloomFilter
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def page(seed):
+    image = Image.new("L", (200, 280), 255)
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        x = (seed * 37 + i * 53) % 180
+        y = (seed * 11 + i * 23) % 260
+        draw.rectangle([x, y, x + 20 + i, y + 8], fill=(i * 20) % 200)
+    return image
+
+
+def recompressed(image):
+    buf = io.BytesIO()
+    image.convert("RGB").resize((180, 252)).save(buf, "JPEG", quality=40)
+    buf.seek(0)
+    return Image.open(buf)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000)
+    added = [digest(str(i)) for i in range(1000)]
+    for d in added:
+        bloom.add(d)
+
+    assert all(d in bloom for d in added)
+    misses = sum(digest(f"x{i}") in bloom for i in range(1000))
+    assert misses < 50
+
+
+def test_record_hash_detects_duplicates(db_session, test_user):
+    first = Note(title="a", author=test_user)
+    second = Note(title="b", author=test_user)
+    db_session.add_all([first, second])
+    db_session.commit()
+
+    assert plagiarism.get_duplicate(digest("file")) is None
+    assert plagiarism.record_hash(first.id, digest("file")) is None
+    assert plagiarism.get_duplicate(digest("file")) == first.id
+
+    # a concurrent upload of the same file loses on the unique index
+    assert plagiarism.record_hash(second.id, digest("file")) == first.id
+    assert NoteHash.query.count() == 1
+
+
+def test_record_hash_reports_copies_from_other_processes(db_session, test_user):
+    first = Note(title="a", author=test_user)
+    second = Note(title="b", author=test_user)
+    db_session.add_all([first, second])
+    db_session.commit()
+    assert plagiarism.get_duplicate(digest("file")) is None  # filter loaded
+
+    # another worker stored the hash; this process's filter never saw it
+    db_session.add(NoteHash(note_id=first.id, sha256=digest("file")))
+    db_session.commit()
+
+    assert plagiarism.record_hash(second.id, digest("file")) == first.id
+    assert plagiarism.get_duplicate(digest("file")) == first.id
+
+
+def test_near_duplicate_pages_are_matched(db_session, test_user):
+    original = Note(title="a", author=test_user)
+    db_session.add(original)
+    db_session.commit()
+    pages = [page(seed) for seed in range(4)]
+    plagiarism.record_page_hashes(original.id, [plagiarism.dhash(p) for p in pages])
+    db_session.commit()
+
+    copy = [plagiarism.dhash(recompressed(p)) for p in pages]
+    other = [plagiarism.dhash(page(seed)) for seed in range(10, 14)]
+
+    assert plagiarism.find_near_duplicate(copy) == original.id
+    assert plagiarism.find_near_duplicate(copy, exclude_note_id=original.id) is None
+    assert plagiarism.find_near_duplicate(other) is None
+
+
+def test_blank_pages_are_not_fingerprints(db_session, test_user):
+    blank = Note(title="en blanco", author=test_user)
+    db_session.add(blank)
+    db_session.commit()
+    scan = Image.new("L", (200, 280), 250)
+    ImageDraw.Draw(scan).point([(5, 5), (190, 270)], fill=200)
+    hashes = [plagiarism.dhash(scan), plagiarism.dhash(Image.new("L", (200, 280)))]
+    assert not any(plagiarism.informative(h) for h in hashes)
+
+    plagiarism.record_page_hashes(blank.id, hashes)
+    db_session.commit()
+
+    assert NotePageHash.query.count() == 0
+    assert plagiarism.find_near_duplicate(hashes) is None
+
+
+def test_duplicate_upload_is_reported(client, app, db_session, test_user, tmp_path):
+    app.config.update(
+        UPLOAD_FOLDER=str(tmp_path / "uploads"),
+        INGEST_FOLDER=str(tmp_path / "ingest"),
+        CLOUDINARY_URL=None,
+    )
+    note = Note(title="original", author=test_user)
+    db_session.add(note)
+    db_session.commit()
+    plagiarism.record_hash(note.id, digest("%PDF-1.4 demo"))
+    client.post("/login", data={"username": test_user.username, "password": "secret"})
+
+    resp = client.post(
+        "/notes/upload",
+        data={
+            "title": "copia",
+            "category": app.config["NOTE_CATEGORIES"][0],
+            "file": (io.BytesIO(b"%PDF-1.4 demo"), "copia.pdf"),
+        },
+        content_type="multipart/form-data",
+    )
+
+    assert resp.status_code == 302
+    assert Note.query.count() == 1
+    assert Report.query.one().description == f"Duplicate note attempt matches {note.id}"
@@ -14,3 +14,49 @@ def test_calculate_weekly_ranking(client, db_session, test_user):
     assert ranking is not None
     assert ranking.score >= 0
     assert any(a.badge_code == AchievementCodes.TOP_3 for a in test_user.achievements)
+
+
+def test_weekly_ranking_aggregates_per_user(db_session, test_user, another_user):
+    from datetime import datetime, timedelta
+
+    old = datetime.utcnow() - timedelta(days=10)
+    db_session.add_all(
+        [
+            Note(title="a", author=test_user, likes=3),
+            Note(title="b", author=test_user, likes=1),
+            Note(title="old", author=test_user, likes=50, created_at=old),
+            Credit(user_id=test_user.id, amount=2, reason="test"),
+            Credit(user_id=test_user.id, amount=-5, reason="test"),
+            Credit(user_id=another_user.id, amount=1, reason="test", timestamp=old),
+        ]
+    )
+    db_session.commit()
+
+    calculate_weekly_ranking()
+
+    scores = {r.user_id: r.score for r in RankingCache.query.all()}
+    assert scores == {test_user.id: 5 * 2 + 4 + 10 * 2}
+
+
+def test_weekly_ranking_incremental_only_touches_active_users(
+    db_session, test_user, another_user
+):
+    db_session.add_all(
+        [
+            Credit(user_id=test_user.id, amount=1, reason="test"),
+            Credit(user_id=another_user.id, amount=2, reason="test"),
+        ]
+    )
+    db_session.commit()
+    calculate_weekly_ranking()
+    untouched = RankingCache.query.filter_by(user_id=another_user.id).one()
+    first_run = untouched.calculated_at
+
+    db_session.add(Note(title="new", author=test_user))
+    db_session.commit()
+    calculate_weekly_ranking(incremental=True)
+
+    scores = {r.user_id: r.score for r in RankingCache.query.all()}
+    assert scores == {test_user.id: 15, another_user.id: 20}
+    untouched = RankingCache.query.filter_by(user_id=another_user.id).one()
+    assert untouched.calculated_at == first_run
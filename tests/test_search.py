@@ -0,0 +1,137 @@
+import threading
+import time
+
+from sqlalchemy import text
+
+from crunevo.extensions import db
+from crunevo.models import Message, Note
+from crunevo.routes import search_routes
+from crunevo.routes.search_routes import search_chats, search_notes
+from crunevo.services import search_index
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def test_search_ranks_title_matches_first(db_session, test_user):
+    body_hit = Note(title="Resumen", description="Apuntes de cálculo", author=test_user)
+    title_hit = Note(title="Cálculo integral", author=test_user)
+    db_session.add_all([body_hit, Note(title="Historia", author=test_user), title_hit])
+    db_session.commit()
+
+    # accents and word prefixes are matched through the index
+    found = search_notes("calcu")
+
+    assert found["total"] == 2
+    assert [r["id"] for r in found["results"]] == [title_hit.id, body_hit.id]
+
+
+def test_search_index_follows_updates_and_deletes(db_session, test_user):
+    note = Note(title="Álgebra lineal", author=test_user)
+    db_session.add(note)
+    db_session.commit()
+    assert search_notes("algebra")["total"] == 1
+
+    note.title = "Geometría"
+    db_session.commit()
+    assert search_notes("algebra")["total"] == 0
+    assert search_notes("geometria")["total"] == 1
+
+    db_session.delete(note)
+    db_session.commit()
+    assert search_notes("geometria")["total"] == 0
+
+
+def test_search_chats_only_indexes_visible_messages(db_session, test_user):
+    public = Message(sender_id=test_user.id, content="hola mundo", is_global=True)
+    private = Message(sender_id=test_user.id, content="hola privado")
+    db_session.add_all([public, private])
+    db_session.commit()
+    assert [r["id"] for r in search_chats("hola")["results"]] == [public.id]
+
+    public.is_deleted = True
+    db_session.commit()
+    assert search_chats("hola")["total"] == 0
+
+
+def test_search_falls_back_to_ilike(monkeypatch, db_session, test_user):
+    db_session.add(Note(title="Química orgánica", author=test_user))
+    db_session.commit()
+    monkeypatch.setattr(search_index, "match", lambda entity, query: None)
+
+    assert search_notes("orgánica")["total"] == 1
+
+
+def test_search_api_uses_index(client, db_session, test_user):
+    db_session.add(Note(title="Programación en Python", author=test_user))
+    db_session.commit()
+    login(client, test_user.username)
+
+    resp = client.get("/search/api?q=python&category=notes")
+
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["total"] == 1
+    assert data["results"]["notes"][0]["title"] == "Programación en Python"
+    assert set(data["timings"]) == {"notes"}
+    assert data["partial"] == []
+
+
+def test_search_rebuild(db_session, test_user):
+    db_session.add(Note(title="Física cuántica", author=test_user))
+    db_session.commit()
+
+    counts = search_index.rebuild(["note"])
+
+    assert counts == {"note": 1}
+    assert search_notes("fisica")["total"] == 1
+
+
+def test_missing_index_is_created_and_filled(db_session, test_user):
+    db_session.add(Note(title="Física cuántica", author=test_user))
+    db_session.add(Message(sender_id=test_user.id, content="privado"))
+    db_session.commit()
+    # a database upgraded from before the index existed
+    db_session.execute(text("DROP TABLE search_fts"))
+    db_session.commit()
+    search_index._ready.pop(db.engine, None)
+
+    assert search_index.prepare() == "sqlite"
+
+    assert search_notes("fisica")["total"] == 1
+    assert search_chats("privado")["total"] == 0
+
+
+def test_search_api_parallel_returns_partial_results(
+    monkeypatch, app, client, test_user
+):
+    app.config.update(SEARCH_PARALLEL=True, SEARCH_CATEGORY_BUDGET=0.3)
+    release = threading.Event()
+    threads = set()
+
+    def fast(query, page, per_page):
+        threads.add(threading.get_ident())
+        return {"results": [{"q": query}], "total": 1, "pages": 1}
+
+    def slow(query, page, per_page):
+        release.wait(5)
+        return {"results": [], "total": 0, "pages": 0}
+
+    for name in search_routes.CATEGORY_SEARCHES:
+        monkeypatch.setitem(search_routes.CATEGORY_SEARCHES, name, fast)
+    monkeypatch.setitem(search_routes.CATEGORY_SEARCHES, "chats", slow)
+    login(client, test_user.username)
+
+    started = time.perf_counter()
+    resp = client.get("/search/api?q=python")
+    elapsed = time.perf_counter() - started
+    release.set()
+
+    data = resp.get_json()
+    assert elapsed < 3
+    assert data["partial"] == ["chats"]
+    assert data["results"]["chats"] == []
+    assert data["total"] == len(search_routes.CATEGORY_SEARCHES) - 1
+    assert set(data["timings"]) == set(search_routes.CATEGORY_SEARCHES)
+    assert threading.get_ident() not in threads
@@ -0,0 +1,52 @@
+from crunevo import tasks
+from crunevo.models import FeedItem
+
+
+def make_queue(tmp_path, **kwargs):
+    return tasks.WorkerQueue(
+        tasks.SQLiteBackend(str(tmp_path / "tasks.db")), retry_delay=0, **kwargs
+    )
+
+
+def test_local_queue_runs_inline_and_records_timing():
+    queue = tasks._LocalQueue()
+    assert queue.enqueue(max, 1, 3) == 3
+    stats = queue.stats.snapshot()["builtins:max"]
+    assert stats["count"] == 1
+    assert stats["failures"] == 0
+
+
+def test_worker_queue_defers_until_worker_runs(app, tmp_path):
+    queue = make_queue(tmp_path)
+    queue.enqueue(tasks.insert_feed_items, "evento", 7, {"title": "x"})
+    assert FeedItem.query.count() == 0
+
+    assert queue.run_pending() == 1
+    item = FeedItem.query.one()
+    assert (item.item_type, item.ref_id, item.owner_id) == ("evento", 7, None)
+    assert queue.backend.counts() == {}
+    assert queue.stats.snapshot()["crunevo.tasks:insert_feed_items"]["count"] == 1
+
+
+def test_worker_queue_retries_then_fails(app, tmp_path, monkeypatch):
+    calls = []
+
+    def boom(*args, **kwargs):
+        calls.append(args)
+        raise RuntimeError("boom")
+
+    queue = make_queue(tmp_path, max_retries=2)
+    queue.enqueue(tasks.insert_feed_items, "evento", 1)
+    monkeypatch.setattr(tasks, "insert_feed_items", boom)
+
+    queue.run_pending()
+    assert len(calls) == 3
+    assert queue.backend.counts() == {"failed": 1}
+    assert queue.stats.snapshot()["crunevo.tasks:insert_feed_items"]["failures"] == 3
+
+
+def test_worker_queue_rejects_foreign_tasks(app, tmp_path):
+    queue = make_queue(tmp_path, max_retries=0)
+    queue.enqueue(max, 1, 2)
+    queue.run_pending()
+    assert queue.backend.counts() == {"failed": 1}
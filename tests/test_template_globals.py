@@ -0,0 +1,67 @@
+from crunevo.cache import template_globals
+from crunevo.models import Achievement, AchievementPopup, Note, Report
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def test_sidebar_notes_are_cached_until_a_note_is_created(
+    db_session, test_user, count_queries
+):
+    db_session.add(Note(title="Primero", author=test_user))
+    db_session.commit()
+    assert [n["title"] for n in template_globals.sidebar_notes()] == ["Primero"]
+
+    with count_queries() as statements:
+        assert template_globals.sidebar_notes()[0]["title"] == "Primero"
+    assert statements == []
+
+    db_session.add(Note(title="Segundo", author=test_user))
+    db_session.commit()
+    assert [n["title"] for n in template_globals.sidebar_notes()] == [
+        "Segundo",
+        "Primero",
+    ]
+
+
+def test_urgent_reports_follow_report_changes(db_session, test_user, count_queries):
+    reports = [Report(description=f"Post 7: spam {i}") for i in range(3)]
+    db_session.add_all(reports + [Report(description="Post 8: spam")])
+    db_session.commit()
+    assert template_globals.urgent_reports() == 1
+
+    db_session.add(Report(description="Post 8: otra vez"))
+    db_session.commit()
+    with count_queries() as statements:
+        assert template_globals.urgent_reports() == 1
+    assert statements == []
+
+    reports[0].status = "resolved"
+    db_session.commit()
+    assert template_globals.urgent_reports() == 0
+
+    # a failed transaction leaves the counters alone
+    db_session.add_all([Report(description="Post 8: x") for _ in range(2)])
+    db_session.flush()
+    db_session.rollback()
+    assert template_globals.urgent_reports() == 0
+
+    assert template_globals.rebuild_report_counts() == 0
+
+
+def test_popup_flag_tracks_pending_popups(client, db_session, test_user):
+    achievement = Achievement(code="TEST", title="Test", icon="x", credit_reward=1)
+    db_session.add(achievement)
+    db_session.commit()
+    assert template_globals.has_pending_popups(test_user.id) is False
+
+    db_session.add(
+        AchievementPopup(user_id=test_user.id, achievement_id=achievement.id)
+    )
+    db_session.commit()
+    assert template_globals.has_pending_popups(test_user.id) is True
+
+    login(client, test_user.username)
+    assert client.post("/api/achievement-popup/mark-shown").get_json()["success"]
+    assert template_globals.has_pending_popups(test_user.id) is False
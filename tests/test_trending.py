@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from crunevo.models import SearchTrend
+from crunevo.services import trending
+from crunevo.services.trending import TrendingSearches
+
+
+def login(client, username, password="secret"):
+    return client.post("/login", data={"username": username, "password": password})
+
+
+def test_trending_counts_normalized_queries():
+    trends = TrendingSearches()
+    for query in ["Cálculo  I", "cálculo i!", "física", "Cálculo I", "x"]:
+        trends.record(query)
+
+    assert trends.top(5) == [
+        {"query": "cálculo i", "count": 3},
+        {"query": "física", "count": 1},
+    ]
+
+
+def test_trending_flush_persists_window(db_session):
+    now = datetime.utcnow()
+    trends = TrendingSearches(window_hours=1)
+    for _ in range(3):
+        trends.record("historia", now=now)
+    trends.record("química", now=now - timedelta(hours=3))
+
+    assert trends.flush(now=now) == 2
+    assert {t.term: t.count for t in SearchTrend.query} == {"historia": 3}
+
+    # a new process picks the persisted counts up on its first flush
+    restarted = TrendingSearches(window_hours=1)
+    restarted.record("historia", now=now)
+    restarted.flush(now=now)
+    assert restarted.top(5) == [{"query": "historia", "count": 4}]
+    assert SearchTrend.query.one().count == 4
+
+
+def test_trending_record_is_cheap():
+    trends = TrendingSearches()
+    for i in range(5000):
+        trends.record(f"tema {i % 50}")
+    top = trends.top(3)
+    assert [t["count"] for t in top] == [100, 100, 100]
+
+
+def test_search_api_reports_trending(client, test_user):
+    login(client, test_user.username)
+    for _ in range(2):
+        client.get("/search/api?q=Python")
+    client.get("/search/api?q=python&page=2")
+
+    data = client.get("/search/api?q=java").get_json()
+
+    assert data["trending"] == [
+        {"query": "python", "count": 2},
+        {"query": "java", "count": 1},
+    ]
+    trending.get_trends().flush()
+    assert {t.term: t.count for t in SearchTrend.query} == {"python": 2, "java": 1}